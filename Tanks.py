@@ -6,6 +6,7 @@ from enum import Enum
 import arcade
 import numpy as np
 import random
+from timers import Timer, TimerHeap
 
 # Constants
 SCREEN_WIDTH = 1120
@@ -14,6 +15,11 @@ EXPLOSION_TEXTURE_COUNT = 60
 PLAYER_MOVE_FORCE = 1500
 ENEMY_MOVE_FORCE = 500
 BULLET_MOVE_FORCE = 8000
+BULLET_MASS = 0.5
+PHYSICS_TIME_STEP = 1 / 60
+BULLET_SPEED = BULLET_MOVE_FORCE / BULLET_MASS * PHYSICS_TIME_STEP
+BULLET_RADIUS = 8
+BULLET_START_OFFSET = 65
 PLAYER_SHOOT_COOLDOWN = 1
 PLAYER_MINE_COOLDOWN = 5
 EASY_ENEMY_SHOOT_COOLDOWN = 7
@@ -25,7 +31,56 @@ PLAYER_TRACK_COOLDOWN = 0.3
 MOVE_COOLDOWN = 1
 MINE_EXPLODE_TIME = 3
 MAX_RICOCHETS = 2
+BANK_SHOT_ANGLES = 72
+BANK_SHOT_STEPS_PER_FRAME = 8
+BANK_SHOT_TRACE_CHUNK = 2048
 END_LEVEL_TIME = 2
+AI_THINK_BUDGET = 4
+AI_NEAR_DISTANCE = 350
+AI_NEAR_THINK_INTERVAL = 0.1
+AI_FAR_THINK_INTERVAL = 0.4
+AI_OFFSCREEN_THINK_INTERVAL = 1
+PATHFINDING_WORKERS = 2
+PATHFINDING_GRID_SIZE = 56
+PATHFINDING_STALE_CELLS = 3
+SERVER_PORT = 5205
+SERVER_TICK_RATE = 60
+SERVER_MAX_MATCHES = 8
+SERVER_SNAPSHOT_HISTORY = 64
+SERVER_MAX_OUTBOX = 262144
+STATE_INITIAL_CAPACITY = 64
+TILE_SIZE = 56
+EXPLOSION_RADIUS = 65
+DANGER_BULLET_LOOKAHEAD = 224
+ASSET_BUNDLE = "assets.bundle"
+HIT_BOX_CACHE = "hitboxes.json"
+FRAME_BUDGET = 1 / 60
+QUALITY_WINDOW = 30
+QUALITY_DOWNGRADE_RATIO = 1
+QUALITY_RESTORE_RATIO = 0.6
+TELEMETRY_DIRECTORY = "telemetry"
+TELEMETRY_BUFFER_SIZE = 10000
+TELEMETRY_FLUSH_INTERVAL = 2
+TELEMETRY_MAX_BYTES = 1000000
+TELEMETRY_BACKUP_COUNT = 5
+MEMORY_TRACE_FRAMES = 10
+MEMORY_GROWTH_CHECKPOINTS = 3
+MEMORY_GROWTH_THRESHOLD = 5000000
+ENV_FRAME_SKIP = 4
+ENV_MAX_STEPS = 3000
+ENV_PLAYER_LIVES = 3
+ENV_MAX_TANKS = 16
+ENV_MAX_BULLETS = 32
+ENV_MAX_MINES = 8
+ENV_KILL_REWARD = 1
+ENV_DEATH_REWARD = -5
+ENV_WIN_REWARD = 5
+SURVIVAL_WAVE_TIME = 20
+SURVIVAL_MAX_ENEMIES = 300
+SURVIVAL_SPAWN_RADIUS = 3
+SIMULATION_TICK_RATE = 60
+SIMULATION_MAX_LAG = 5
+SIMULATION_COMPACT_TICKS = 60
 SCREEN_TITLE = "Tank Game"
 EXPLODED_TANK_IMAGE = "assets/barricadeMetal.png"
 ENEMY_TANK_BARREL = "assets/tankBlack_barrel_rotate.png"
@@ -48,13 +103,14 @@ class Direction(Enum):
 class PlayerTank(arcade.Sprite):
     """ Class for the Player's Tank
     """
-    def __init__(self, tank_image, turret_image, scale=1):
+    def __init__(self, tank_image, turret_image, scale=1, timers=None):
         """ Constructor for Player tank class
 
         Args:
             tank_image (str): Image path for the tank body
             turret_image (str): Image path for the tank turret
             scale (int, optional): Sprite scale factor. Defaults to 1.
+            timers (TimerHeap, optional): Clock the cooldowns run on. Defaults to a new clock.
         """
         super().__init__(tank_image, scale, hit_box_algorithm="Simple")
         self.turret = arcade.Sprite(turret_image, scale)
@@ -64,9 +120,57 @@ class PlayerTank(arcade.Sprite):
         self.can_shoot = True
         self.can_track = True
         self.can_mine = True
-        self.cooldown = PLAYER_SHOOT_COOLDOWN
-        self.track_cooldown = PLAYER_TRACK_COOLDOWN
-        self.mine_cooldown = PLAYER_MINE_COOLDOWN
+
+        # Cooldowns give the ability back when they expire
+        timers = timers if timers is not None else TimerHeap()
+        self.cooldown_timer = Timer(timers, self.reload, PLAYER_SHOOT_COOLDOWN)
+        self.track_timer = Timer(timers, self.allow_track, PLAYER_TRACK_COOLDOWN)
+        self.mine_timer = Timer(timers, self.allow_mine, PLAYER_MINE_COOLDOWN)
+
+    @property
+    def cooldown(self):
+        """ Seconds until the tank can shoot again
+        """
+        return self.cooldown_timer.remaining()
+
+    @cooldown.setter
+    def cooldown(self, value):
+        self.cooldown_timer.set(value)
+
+    @property
+    def track_cooldown(self):
+        """ Seconds until the tank lays its next track
+        """
+        return self.track_timer.remaining()
+
+    @track_cooldown.setter
+    def track_cooldown(self, value):
+        self.track_timer.set(value)
+
+    @property
+    def mine_cooldown(self):
+        """ Seconds until the tank can lay a mine again
+        """
+        return self.mine_timer.remaining()
+
+    @mine_cooldown.setter
+    def mine_cooldown(self, value):
+        self.mine_timer.set(value)
+
+    def reload(self):
+        """ Called when the shoot cooldown expires
+        """
+        self.can_shoot = True
+
+    def allow_track(self):
+        """ Called when the track cooldown expires
+        """
+        self.can_track = True
+
+    def allow_mine(self):
+        """ Called when the mine cooldown expires
+        """
+        self.can_mine = True
 
     def update(self):
         """
@@ -87,7 +191,7 @@ class PlayerTank(arcade.Sprite):
 class EnemyTank(arcade.Sprite):
     """  Class for all Enemy (computer) tanks
     """
-    def __init__(self, tank_image, difficulty, cooldown, scale=1):
+    def __init__(self, tank_image, difficulty, cooldown, scale=1, timers=None):
         """ Constructor for the Enemy tanks
 
         Args:
@@ -95,6 +199,7 @@ class EnemyTank(arcade.Sprite):
             difficulty (str): Image path for the tank turret
             cooldown (str): The cooldown for how often the tank can shoot
             scale (int, optional): Sprite scale factor. Defaults to 1.
+            timers (TimerHeap, optional): Clock the cooldowns run on. Defaults to a new clock.
         """
         super().__init__(tank_image + "1.png", scale, hit_box_algorithm="Simple")
         self.texture_list = [arcade.load_texture(f"{tank_image}{i}.png") for i in range(4)]
@@ -104,16 +209,69 @@ class EnemyTank(arcade.Sprite):
         self.player_y = 0
         self.path = []
         self.path_idx = 0
+        self.path_request = None
         self.difficulty = difficulty
         self.can_shoot = False
+        self.move_rand_int = 0
+        self.direction = 0
+        self.bank_angle = None
+        self.evading = False
+
+        # The shoot cooldown fires a callback. The move cooldown and reaction time are
+        # deadlines that are only checked when the tank decides, and the reaction time
+        # only runs while the tank sees the player.
+        timers = timers if timers is not None else TimerHeap()
+        self.cooldown_timer = Timer(timers, self.reload)
+        self.move_timer = Timer(timers)
+        self.reaction_timer = Timer(timers)
         self.cooldown = cooldown
         self.move_cooldown = MOVE_COOLDOWN
-        self.move_rand_int = 0
         if difficulty == Difficulty.HARD:
             self.reaction_time = HARD_ENEMY_REACTION_TIME
         else:
             self.reaction_time = ENEMY_REACTION_TIME
-        self.direction = 0
+
+        # AI scheduler bookkeeping
+        self.sees_player = False
+        self.think_time = 0
+        self.think_queued = False
+
+    @property
+    def cooldown(self):
+        """ Seconds until the tank can shoot again
+        """
+        return self.cooldown_timer.remaining()
+
+    @cooldown.setter
+    def cooldown(self, value):
+        self.cooldown_timer.set(value)
+
+    @property
+    def move_cooldown(self):
+        """ Seconds until the tank picks a new random direction, negative once it may
+        """
+        return self.move_timer.remaining()
+
+    @move_cooldown.setter
+    def move_cooldown(self, value):
+        self.move_timer.start(value)
+
+    @property
+    def reaction_time(self):
+        """ Seconds the tank has to see the player before it shoots, negative once it may
+        """
+        return self.reaction_timer.remaining()
+
+    @reaction_time.setter
+    def reaction_time(self, value):
+        # Stopped until the simulation sees the tank looking at the player
+        self.reaction_timer.stop()
+        self.reaction_timer.left = value
+
+    def reload(self):
+        """ Called when the shoot cooldown expires
+        """
+        self.can_shoot = True
 
     def update(self):
         """ Update the enemy tank
@@ -135,110 +293,163 @@ class EnemyTank(arcade.Sprite):
         elif width < 0:
             self.turret.angle = np.degrees(np.arctan(height / width)) + 270
     
-    def move(self, physics_engine, barrier_list, player_position, obstacle_list):
-        """ Moves the enemy tank based on its difficulty
+    def has_path(self):
+        """ Checks if the tank still has points left on its AStar path
+
+        Returns:
+            bool: True if the tank is following a path
+        """
+        return self.path is not None and self.path_idx < len(self.path)
+
+    def think(self, barrier_list, player_position, obstacle_list, breakable_obstacle_list, path_pool, bank_shots=None,
+              danger_map=None):
+        """ Makes the expensive decisions for the enemy tank (line of sight, path
+        replans and random walk choices). Called by the AI scheduler, not every frame.
 
         Args:
-            physics_engine: The PyMonk physics engine
             barrier_list: The AStar Barrier List of blocking objects
             player_position: The position of the player
             obstacle_list: List of blocking sprites
+            breakable_obstacle_list: List of breakable blocking sprites
+            path_pool (pathfinding.PathfindingPool): Worker pool for the AStar searches
+            bank_shots (bankshots.BankShotIndex, optional): Ricochet shots of the level. Defaults to None.
+            danger_map (dangermap.DangerMap, optional): Cells threatened by mines and bullets. Defaults to None.
+        """
+        # Check if the player tank is in sight of the enemy
+        self.sees_player = arcade.has_line_of_sight(self.position, player_position, walls=obstacle_list) and \
+            arcade.has_line_of_sight(self.position, player_position, walls=breakable_obstacle_list)
+
+        # Hard tanks that can not see the player look for a shot off the walls
+        self.bank_angle = None
+        if self.difficulty == Difficulty.HARD and not self.sees_player and bank_shots is not None:
+            self.bank_angle = bank_shots.best_angle(self.center_x, self.center_y, *player_position)
+
+        if self.difficulty == Difficulty.EASY:
+            # Easy tanks do not move
+            return
+
+        if self.difficulty == Difficulty.HARD:
+            # Pick up the path to the player tank once the worker pool has found it
+            if self.path_request is not None and self.path_request.done():
+                if not self.path_request.cancelled:
+                    self.path = self.path_request.result()
+                    self.path_idx = 0
+                self.path_request = None
+
+            # Request a new path in the background, keep moving on the old one meanwhile
+            if not self.has_path() and self.path_request is None:
+                self.path_request = path_pool.request_path(self.position, player_position, barrier_list)
+
+        if self.difficulty == Difficulty.MEDIUM or not self.has_path():
+            # Medium tanks move randomly always
+            # Hard tanks move randomly while they wait for a path or if they fail to find one
+            if self.move_cooldown < 0:
+                self.move_rand_int = random.randint(1,5)
+                self.move_cooldown = MOVE_COOLDOWN
+
+                if arcade.check_for_collision_with_list(self,obstacle_list):
+                    # Tank is most likely hitting wall, change x or y direction to move the opposite way
+                    self.move_rand_int = {1 : 2, 2 : 1, 3 : 4, 4 : 3, 5: 5}[self.move_rand_int]
+
+                # Do not walk into a mine's blast or a bullet's way
+                if danger_map is not None:
+                    self.move_rand_int = danger_map.safe_direction(self.center_x, self.center_y, self.move_rand_int)
+
+        # Step out of danger, and wait instead of following the path into it
+        self.evading = False
+        if danger_map is not None and self.difficulty != Difficulty.EASY:
+            path_blocked = self.has_path() and danger_map.danger_at(*self.path[self.path_idx]) > 0
+            if danger_map.danger_at(self.center_x, self.center_y) > 0 or path_blocked:
+                self.evading = True
+                # Staying is only safe if the tank is not in danger itself
+                in_danger = danger_map.danger_at(self.center_x, self.center_y) > 0
+                self.move_rand_int = danger_map.safe_direction(self.center_x, self.center_y, self.move_rand_int if in_danger else 5)
+
+    def move(self, physics_engine):
+        """ Moves the enemy tank based on its last decision. This is cheap steering
+        and runs every frame.
+
+        Args:
+            physics_engine: The PyMonk physics engine
         """
         if self.difficulty == Difficulty.EASY:
             # Easy tanks do not move
             pass
+        elif self.difficulty == Difficulty.MEDIUM or not self.has_path() or self.evading:
+            # Move up, down, left or right based on the random int
+            if self.move_rand_int == 1:
+                physics_engine.apply_force(self, (0, ENEMY_MOVE_FORCE))
+                self.texture = self.texture_list[Direction.UP.value]
+                self.direction = Direction.UP
+            elif self.move_rand_int == 2:
+                physics_engine.apply_force(self, (0, -ENEMY_MOVE_FORCE))
+                self.texture = self.texture_list[Direction.DOWN.value]
+                self.direction = Direction.DOWN
+            elif self.move_rand_int == 3:
+                physics_engine.apply_force(self, (-ENEMY_MOVE_FORCE, 0))
+                self.texture = self.texture_list[Direction.LEFT.value]
+                self.direction = Direction.LEFT
+            elif self.move_rand_int == 4:
+                physics_engine.apply_force(self, (ENEMY_MOVE_FORCE, 0))
+                self.texture = self.texture_list[Direction.RIGHT.value]
+                self.direction = Direction.RIGHT
+            else:
+                # Random chance to not move at all
+                pass
         else:
-            # Calculate path to player tank
-            if self.difficulty == Difficulty.HARD and (self.path is None or self.path == [] or self.path_idx > len(self.path) - 1):
-                self.path_idx = 0
-                self.path = arcade.astar_calculate_path(self.position,
-                                                player_position,
-                                                barrier_list,
-                                                diagonal_movement=False)
-            
-            if self.difficulty == Difficulty.MEDIUM or self.path is None:
-                # Medium tanks move randomly always
-                # Hard tanks move randomly if they fail to find a path to the player
-                if self.move_cooldown < 0:
-                    self.move_rand_int = random.randint(1,5)
-                    self.move_cooldown = MOVE_COOLDOWN
-                    
-                    if arcade.check_for_collision_with_list(self,obstacle_list):
-                        # Tank is most likely hitting wall, change x or y direction to move the opposite way
-                        self.move_rand_int = {1 : 2, 2 : 1, 3 : 4, 4 : 3, 5: 5}[self.move_rand_int]
-                    
-                # Move up, down, left or right based on the random int
-                if self.move_rand_int == 1:
-                    physics_engine.apply_force(self, (0, ENEMY_MOVE_FORCE))
-                    self.texture = self.texture_list[Direction.UP.value]
-                    self.direction = Direction.UP
-                elif self.move_rand_int == 2:
-                    physics_engine.apply_force(self, (0, -ENEMY_MOVE_FORCE))
-                    self.texture = self.texture_list[Direction.DOWN.value]
-                    self.direction = Direction.DOWN
-                elif self.move_rand_int == 3:
-                    physics_engine.apply_force(self, (-ENEMY_MOVE_FORCE, 0))
-                    self.texture = self.texture_list[Direction.LEFT.value]
-                    self.direction = Direction.LEFT
-                elif self.move_rand_int == 4:
-                    physics_engine.apply_force(self, (ENEMY_MOVE_FORCE, 0))
-                    self.texture = self.texture_list[Direction.RIGHT.value]
-                    self.direction = Direction.RIGHT
-                else:
-                    # Random chance to not move at all
-                    pass
+            # Hard tanks follow the AStar path
+            x, y = self.path[self.path_idx]
+
+            x_diff = self.center_x - x
+            y_diff = self.center_y - y
+
+            # If we are within 10 pixels of the destination, move to next point in the path
+            if abs(x_diff) < 10 and abs(y_diff) < 10:
+                self.path_idx += 1
             else:
-                # Hard tanks follow the AStar path
-                x, y = self.path[self.path_idx]
-                
-                x_diff = self.center_x - x
-                y_diff = self.center_y - y
-
-                # If we are within 10 pixels of the destination, move to next point in the path
-                if abs(x_diff) < 10 and abs(y_diff) < 10:
-                    self.path_idx += 1
+                # Move in the direction specified by the path
+                if abs(x_diff) >= 10:
+                    if x_diff > 0:
+                        physics_engine.apply_force(self, (-ENEMY_MOVE_FORCE, 0))
+                        self.texture = self.texture_list[Direction.LEFT.value]
+                        self.direction = Direction.LEFT
+                    else:
+                        physics_engine.apply_force(self, (ENEMY_MOVE_FORCE, 0))
+                        self.texture = self.texture_list[Direction.RIGHT.value]
+                        self.direction = Direction.RIGHT
                 else:
-                    # Move in the direction specified by the path
-                    if abs(x_diff) >= 10:
-                        if x_diff > 0:
-                            physics_engine.apply_force(self, (-ENEMY_MOVE_FORCE, 0))
-                            self.texture = self.texture_list[Direction.LEFT.value]
-                            self.direction = Direction.LEFT
-                        else:
-                            physics_engine.apply_force(self, (ENEMY_MOVE_FORCE, 0))
-                            self.texture = self.texture_list[Direction.RIGHT.value]
-                            self.direction = Direction.RIGHT
+                    if y_diff > 0:
+                        physics_engine.apply_force(self, (0, -ENEMY_MOVE_FORCE))
+                        self.texture = self.texture_list[Direction.DOWN.value]
+                        self.direction = Direction.DOWN
                     else:
-                        if y_diff > 0:
-                            physics_engine.apply_force(self, (0, -ENEMY_MOVE_FORCE))
-                            self.texture = self.texture_list[Direction.DOWN.value]
-                            self.direction = Direction.DOWN
-                        else:
-                            physics_engine.apply_force(self, (0, ENEMY_MOVE_FORCE))
-                            self.texture = self.texture_list[Direction.UP.value]
-                            self.direction = Direction.UP
-            
+                        physics_engine.apply_force(self, (0, ENEMY_MOVE_FORCE))
+                        self.texture = self.texture_list[Direction.UP.value]
+                        self.direction = Direction.UP
+
 class Explosion(arcade.Sprite):
     """ 
     Class for explosions 
     """
-    def __init__(self, texture_list):
+    def __init__(self, texture_list, frame_step=1):
         """ Constructor for the explosions
 
         Args:
             texture_list: List of textures for the explosion animation
+            frame_step (int, optional): Animation frames advanced per update. Defaults to 1.
         """
         super().__init__()
 
         # Start at the first frame of the animation
         self.current_texture = 0
         self.textures = texture_list
+        self.frame_step = frame_step
 
     def update(self):
         """ Updates the explosion sprite
         """
         # Move to the next frame of the animation. Remove the sprite once animation finishes
-        self.current_texture += 1
+        self.current_texture += self.frame_step
         if self.current_texture < len(self.textures):
             self.set_texture(self.current_texture)
         else:
@@ -257,6 +468,9 @@ class Bullet(arcade.Sprite):
         """
         super().__init__(bullet_image, scale, hit_box_algorithm=None)
         self.num_ricochets = 0
+        self.shooter_id = 0
+        self.vx = 0
+        self.vy = 0
 
     def update(self):
         """ Updates the Bullet sprite
@@ -270,25 +484,33 @@ class Mine(arcade.Sprite):
     Class for the mines.
     """
 
-    def __init__(self, image_source, scale=1):
+    def __init__(self, image_source, scale=1, timers=None, on_explode=None):
         """Constructor for the Mine class
 
         Args:
             image_source (str): Image path for the mine
             scale (int, optional): Sprite scale factor. Defaults to 1.
+            timers (TimerHeap, optional): Clock the fuse runs on. Defaults to a new clock.
+            on_explode (callable, optional): Called with the mine when the fuse runs out. Defaults to None.
         """
         super().__init__(image_source, scale)
-        self.total_time = 0
         self.end_time = MINE_EXPLODE_TIME
+        self.on_explode = on_explode
+        self.fuse = Timer(timers if timers is not None else TimerHeap(), self.explode)
+        self.fuse.start(self.end_time)
 
-    def timer(self, delta_time):
-        """ Updates the timer for the mine explosion
+    @property
+    def total_time(self):
+        """ Seconds since the mine was laid
+        """
+        return self.end_time - self.fuse.remaining()
 
-        Args:
-            delta_time (float): the amount of time passes since last update
+    @total_time.setter
+    def total_time(self, value):
+        self.fuse.set(self.end_time - value)
 
-        Returns:
-            float: the total time passed
+    def explode(self):
+        """ Called when the fuse runs out
         """
-        self.total_time += delta_time
-        return self.total_time
\ No newline at end of file
+        if self.on_explode is not None:
+            self.on_explode(self)
\ No newline at end of file
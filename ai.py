@@ -0,0 +1,74 @@
+"""
+ai.py contains the scheduler that spreads enemy tank decisions across frames
+"""
+
+from collections import deque
+import math
+import Tanks
+
+class AIScheduler:
+    """ Time-sliced scheduler for the enemy tanks' expensive decisions.
+
+    Every enemy has a think timer. Enemies whose timer has run out are queued,
+    and at most `budget` queued enemies get to think each frame. Enemies far
+    away from the player or off-screen think less often.
+    """
+    def __init__(self, budget=Tanks.AI_THINK_BUDGET):
+        """ Constructor for the AI scheduler
+
+        Args:
+            budget (int, optional): Max number of enemies that think per frame. Defaults to Tanks.AI_THINK_BUDGET.
+        """
+        self.budget = budget
+        self.queue = deque()
+
+    def think_interval(self, enemy, player_position):
+        """ Level of detail for an enemy's thinking
+
+        Args:
+            enemy (Tanks.EnemyTank): the enemy tank
+            player_position: The position of the player
+
+        Returns:
+            float: seconds until the enemy should think again
+        """
+        if not (0 <= enemy.center_x <= Tanks.SCREEN_WIDTH and 0 <= enemy.center_y <= Tanks.SCREEN_HEIGHT):
+            return Tanks.AI_OFFSCREEN_THINK_INTERVAL
+
+        distance = math.hypot(enemy.center_x - player_position[0], enemy.center_y - player_position[1])
+        if distance < Tanks.AI_NEAR_DISTANCE:
+            return Tanks.AI_NEAR_THINK_INTERVAL
+        return Tanks.AI_FAR_THINK_INTERVAL
+
+    def schedule(self, enemy_list, player_position, delta_time):
+        """ Picks the enemies that get to think this frame
+
+        Args:
+            enemy_list: List of enemy tanks
+            player_position: The position of the player
+            delta_time (float): time passed since last update
+
+        Returns:
+            list: the enemy tanks that should think this frame
+        """
+        # Queue every enemy whose think timer ran out
+        for enemy in enemy_list:
+            enemy.think_time -= delta_time
+            if enemy.think_time <= 0 and not enemy.think_queued:
+                enemy.think_queued = True
+                self.queue.append(enemy)
+
+        # Hand out at most `budget` decisions, oldest requests first
+        thinkers = []
+        while self.queue and len(thinkers) < self.budget:
+            enemy = self.queue.popleft()
+            enemy.think_queued = False
+
+            # Skip tanks that were destroyed while waiting in the queue
+            if len(enemy.sprite_lists) == 0:
+                continue
+
+            enemy.think_time = self.think_interval(enemy, player_position)
+            thinkers.append(enemy)
+
+        return thinkers
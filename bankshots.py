@@ -0,0 +1,217 @@
+"""
+bankshots.py contains the precomputed index of ricochet shots for the current level
+"""
+
+from collections import deque
+import math
+import numpy as np
+import Tanks
+from bullets import BulletEngine
+from tilegrid import EMPTY
+
+class BankShotIndex:
+    """ Every bank shot of the level, looked up by shooter tile and target tile.
+
+    Rays are fired from the center of every empty tile at a fixed set of
+    angles and moved through the tile grid by the bullet engine, so they
+    bounce exactly like bullets. Every tile a ray crosses after its first
+    ricochet, and before the bullet would be destroyed, is stored for its
+    (shooter tile, angle). Looking up the shots from one tile to another is
+    then a single array read.
+
+    Tracing is spread over the frames by update(), so building the index
+    or tracing again never stalls the game. When tiles change, only the rays
+    that passed next to them are traced again, and their shots are left out
+    until they are. Chunks that were being traced when tiles changed saw
+    both the old and the new tiles, so their results are thrown away and
+    they are traced again.
+    """
+    def __init__(self, tile_grid, angles=Tanks.BANK_SHOT_ANGLES, max_ricochets=Tanks.MAX_RICOCHETS):
+        """ Constructor for the bank shot index
+
+        Args:
+            tile_grid (TileGrid): obstacle tiles of the level
+            angles (int, optional): number of firing angles traced per tile. Defaults to Tanks.BANK_SHOT_ANGLES.
+            max_ricochets (int, optional): ricochets a bullet survives. Defaults to Tanks.MAX_RICOCHETS.
+        """
+        self.tile_grid = tile_grid
+        self.engine = BulletEngine(tile_grid)
+        self.max_ricochets = max_ricochets
+        self.angles = np.linspace(0, 2 * math.pi, angles, endpoint=False)
+        tiles = tile_grid.rows * tile_grid.columns
+
+        # [shooter tile, angle, tile] for the tiles a ray reaches after ricocheting, and for every tile it crosses
+        self.reach = np.zeros((tiles, angles, tiles), dtype=bool)
+        self.path = np.zeros((tiles, angles, tiles), dtype=bool)
+        self.cells = tile_grid.cells.copy()
+        # Counts the tile changes, every chunk is traced against one generation of tiles
+        self.generation = 0
+        self.tracers = deque()
+        self.queue(np.arange(tiles * angles))
+
+    def tile(self, x, y):
+        """ Gets the flat index of the tile that contains a point
+
+        Args:
+            x (float): x coordinate in pixels
+            y (float): y coordinate in pixels
+
+        Returns:
+            int: row * columns + column, or None outside of the level
+        """
+        row, column = self.tile_grid.cell(x, y)
+        if not self.tile_grid.in_bounds(row, column):
+            return None
+        return row * self.tile_grid.columns + column
+
+    def queue(self, rays):
+        """ Queues rays to be traced, in chunks so every substep stays cheap
+
+        Args:
+            rays (np.ndarray): flat ray indices, shooter tile * angles + angle
+        """
+        for first in range(0, len(rays), Tanks.BANK_SHOT_TRACE_CHUNK):
+            self.tracers.append(self.trace(rays[first:first + Tanks.BANK_SHOT_TRACE_CHUNK]))
+
+    def trace(self, rays):
+        """ Traces rays through the tile grid. Generator that moves the rays by one
+        substep at every next() and stores the tiles they reach once they all stopped.
+
+        Args:
+            rays (np.ndarray): flat ray indices, shooter tile * angles + angle
+        """
+        # Runs from the first next(), so chunks queued before a change start on the new tiles
+        generation = self.generation
+        grid = self.tile_grid
+        tile_size = grid.tile_size
+        shooters, angles = np.divmod(rays, len(self.angles))
+        rows, columns = np.divmod(shooters, grid.columns)
+        angle = self.angles[angles]
+
+        # Bullets start in front of the tank, and move one bullet radius per substep like in the bullet engine
+        x = (columns + 0.5) * tile_size + np.cos(angle) * Tanks.BULLET_START_OFFSET
+        y = (rows + 0.5) * tile_size + np.sin(angle) * Tanks.BULLET_START_OFFSET
+        vx = np.cos(angle) * self.engine.radius
+        vy = np.sin(angle) * self.engine.radius
+        start = grid.lookup(np.floor(y / tile_size).astype(int), np.floor(x / tile_size).astype(int))
+        ids = np.flatnonzero((grid.cells[rows, columns] == EMPTY) & (start == EMPTY))
+        x, y, vx, vy = x[ids], y[ids], vx[ids], vy[ids]
+        active = np.ones(len(ids), dtype=bool)
+        ricochets = np.zeros(len(ids), dtype=int)
+        hit_cells = np.full((len(ids), 2), -1)
+
+        reach = np.zeros((len(rays), grid.rows * grid.columns), dtype=bool)
+        path = np.zeros_like(reach)
+        diagonal = math.hypot(grid.columns, grid.rows) * tile_size
+        for _ in range(math.ceil((self.max_ricochets + 1) * diagonal / self.engine.radius)):
+            if len(ids) == 0:
+                break
+            tiles = (np.clip(np.floor(y / tile_size).astype(int), 0, grid.rows - 1) * grid.columns +
+                     np.clip(np.floor(x / tile_size).astype(int), 0, grid.columns - 1))
+            path[ids, tiles] = True
+            banked = ricochets > 0
+            reach[ids[banked], tiles[banked]] = True
+
+            x, vx = self.engine.move_axis(x, vx, y, 1, active, ricochets, hit_cells, horizontal=True)
+            y, vy = self.engine.move_axis(y, vy, x, 1, active, ricochets, hit_cells, horizontal=False)
+            # A bullet is destroyed by one ricochet too many. Rays that stopped are dropped from the arrays
+            active &= ricochets <= self.max_ricochets
+            if not active.all():
+                x, y, vx, vy, ids, ricochets, hit_cells = x[active], y[active], vx[active], vy[active], ids[active], ricochets[active], hit_cells[active]
+                active = np.ones(len(ids), dtype=bool)
+            yield
+
+        if generation != self.generation:
+            # Tiles changed while the rays were in flight, their reach is still cleared
+            self.queue(rays)
+            return
+        self.reach.reshape(-1, reach.shape[1])[rays] = reach
+        self.path.reshape(-1, path.shape[1])[rays] = path
+
+    def update(self, steps=Tanks.BANK_SHOT_STEPS_PER_FRAME):
+        """ Continues tracing. Called every update.
+
+        Args:
+            steps (int, optional): ray substeps traced. Defaults to Tanks.BANK_SHOT_STEPS_PER_FRAME.
+        """
+        while steps > 0 and len(self.tracers) > 0:
+            try:
+                next(self.tracers[0])
+                steps -= 1
+            except StopIteration:
+                self.tracers.popleft()
+
+    def ready(self):
+        """ Checks if every ray has been traced
+
+        Returns:
+            bool: True if no tracing is left
+        """
+        return len(self.tracers) == 0
+
+    def finish(self):
+        """ Traces everything that is left at once
+        """
+        while not self.ready():
+            self.update(math.inf)
+
+    def refresh(self):
+        """ Traces again the rays that passed next to a tile that changed since the last trace.
+        Called when obstacles are destroyed or come back.
+        """
+        changed = np.argwhere(self.cells != self.tile_grid.cells)
+        if len(changed) == 0:
+            return
+        self.cells = self.tile_grid.cells.copy()
+        self.generation += 1
+
+        # A ray can only bounce off or stop at a tile it got next to. Rays fired from close
+        # to the tile may also start in it, or fire from it now that it is empty
+        grid = self.tile_grid
+        near = np.zeros((grid.rows, grid.columns), dtype=bool)
+        shooters = np.zeros((grid.rows, grid.columns), dtype=bool)
+        reach = math.ceil(Tanks.BULLET_START_OFFSET / grid.tile_size)
+        for row, column in changed:
+            near[max(row - 1, 0):row + 2, max(column - 1, 0):column + 2] = True
+            shooters[max(row - reach, 0):row + reach + 1, max(column - reach, 0):column + reach + 1] = True
+        paths = self.path.reshape(-1, grid.rows * grid.columns)
+        rays = np.flatnonzero(paths[:, near.ravel()].any(axis=1) | np.repeat(shooters.ravel(), len(self.angles)))
+        self.reach.reshape(-1, grid.rows * grid.columns)[rays] = False
+        self.queue(rays)
+
+    def angles_between(self, shooter_x, shooter_y, target_x, target_y):
+        """ Gets the firing angles of the bank shots from one tile to another
+
+        Args:
+            shooter_x (float): x coordinate of the shooter
+            shooter_y (float): y coordinate of the shooter
+            target_x (float): x coordinate of the target
+            target_y (float): y coordinate of the target
+
+        Returns:
+            np.ndarray: the angles in radians. Shots that come back through the shooter's tile are left out.
+        """
+        shooter = self.tile(shooter_x, shooter_y)
+        target = self.tile(target_x, target_y)
+        if shooter is None or target is None:
+            return self.angles[:0]
+        return self.angles[self.reach[shooter, :, target] & ~self.reach[shooter, :, shooter]]
+
+    def best_angle(self, shooter_x, shooter_y, target_x, target_y):
+        """ Picks the bank shot closest to the direct line to the target
+
+        Args:
+            shooter_x (float): x coordinate of the shooter
+            shooter_y (float): y coordinate of the shooter
+            target_x (float): x coordinate of the target
+            target_y (float): y coordinate of the target
+
+        Returns:
+            float: the firing angle in radians, or None if there is no bank shot
+        """
+        angles = self.angles_between(shooter_x, shooter_y, target_x, target_y)
+        if len(angles) == 0:
+            return None
+        direct = math.atan2(target_y - shooter_y, target_x - shooter_x)
+        difference = np.abs((angles - direct + math.pi) % (2 * math.pi) - math.pi)
+        return float(angles[np.argmin(difference)])
@@ -0,0 +1,111 @@
+"""
+bullets.py contains the bullet engine that moves bullets through the level's tile grid
+"""
+
+import math
+import numpy as np
+import Tanks
+from tilegrid import EMPTY, EXPLODABLE
+
+class BulletEngine:
+    """ Moves every bullet with batched array math instead of the physics engine.
+
+    Bullets travel in straight lines and are tested against the tile grid in
+    substeps shorter than their radius, so fast bullets can not tunnel through
+    a tile. A bullet that hits a wall is mirrored about the wall's face, and
+    every reflection counts as exactly one ricochet.
+    """
+    def __init__(self, tile_grid, radius=Tanks.BULLET_RADIUS):
+        """ Constructor for the bullet engine
+
+        Args:
+            tile_grid (TileGrid): obstacle tiles of the level
+            radius (float, optional): collision radius of a bullet. Defaults to Tanks.BULLET_RADIUS.
+        """
+        self.tile_grid = tile_grid
+        self.radius = radius
+        self.ricochets = []
+
+    def step(self, bullet_list, delta_time):
+        """ Moves the bullets forward in time
+
+        Args:
+            bullet_list: List of bullets
+            delta_time (float): time to move the bullets by
+
+        Returns:
+            list: (bullet, explodable) pairs for every bullet that hit an explodable.
+                The bullets that ricocheted are left in self.ricochets with their number of ricochets.
+        """
+        bullets = list(bullet_list)
+        self.ricochets = []
+        if len(bullets) == 0:
+            return []
+
+        x, y, vx, vy = np.array([(bullet.center_x, bullet.center_y, bullet.vx, bullet.vy) for bullet in bullets]).T
+        ricochets = np.zeros(len(bullets), dtype=int)
+        hit_cells = np.full((len(bullets), 2), -1)
+        active = np.ones(len(bullets), dtype=bool)
+
+        # Split the step so no bullet moves further than its radius at once
+        distance = np.max(np.hypot(vx, vy)) * delta_time
+        substeps = max(1, math.ceil(distance / self.radius))
+        substep_time = delta_time / substeps
+
+        for _ in range(substeps):
+            x, vx = self.move_axis(x, vx, y, substep_time, active, ricochets, hit_cells, horizontal=True)
+            y, vy = self.move_axis(y, vy, x, substep_time, active, ricochets, hit_cells, horizontal=False)
+
+        hits = []
+        for i, bullet in enumerate(bullets):
+            bullet.position = (float(x[i]), float(y[i]))
+            if ricochets[i] > 0:
+                bullet.vx = float(vx[i])
+                bullet.vy = float(vy[i])
+                bullet.num_ricochets += int(ricochets[i])
+                self.ricochets.append((bullet, int(ricochets[i])))
+                bullet.angle = math.degrees(math.atan2(vy[i], vx[i])) - 90
+            if not active[i]:
+                hits.append((bullet, self.tile_grid.sprite_at(*hit_cells[i])))
+        return hits
+
+    def move_axis(self, position, velocity, other, delta_time, active, ricochets, hit_cells, horizontal):
+        """ Moves the bullets along one axis and reflects the ones that hit a tile
+
+        Args:
+            position (np.ndarray): bullet coordinates on the moving axis
+            velocity (np.ndarray): bullet velocities on the moving axis
+            other (np.ndarray): bullet coordinates on the other axis
+            delta_time (float): time to move the bullets by
+            active (np.ndarray): bullets that are still flying, cleared for bullets that hit an explodable
+            ricochets (np.ndarray): ricochet counter for every bullet
+            hit_cells (np.ndarray): tile hit by every bullet that hit an explodable
+            horizontal (bool): True for the x axis, False for the y axis
+
+        Returns:
+            tuple: the new positions and velocities
+        """
+        tile_size = self.tile_grid.tile_size
+        direction = np.sign(velocity)
+        moved = np.where(active, position + velocity * delta_time, position)
+
+        # Test the tile in front of the leading edge of every bullet
+        edge = moved + direction * self.radius
+        lead = np.floor(edge / tile_size).astype(int)
+        side = np.floor(other / tile_size).astype(int)
+        rows, columns = (side, lead) if horizontal else (lead, side)
+        cells = self.tile_grid.lookup(rows, columns)
+        hit = active & (direction != 0) & (cells != EMPTY)
+
+        # Bullets that hit an explodable stop and are reported
+        exploded = hit & (cells == EXPLODABLE)
+        hit_cells[exploded] = np.stack([rows[exploded], columns[exploded]], axis=1)
+        active &= ~exploded
+
+        # Everything else is mirrored about the face of the tile it hit
+        bounce = hit & ~exploded
+        face = np.where(direction > 0, lead * tile_size, (lead + 1) * tile_size)
+        moved = np.where(bounce, 2 * face - edge - direction * self.radius, moved)
+        velocity = np.where(bounce, -velocity, velocity)
+        ricochets += bounce
+        return moved, velocity
@@ -0,0 +1,270 @@
+"""
+bundle.py builds and reads the packed asset bundle.
+
+Run `python bundle.py` after changing assets to rebuild the bundle. The
+game ignores a bundle that is older than any of its asset files. The
+bundle holds the decoded RGBA pixels of every image and the PCM samples of
+every sound the game uses, so the game reads one memory-mapped file instead
+of opening and decoding each asset on its own.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import wave
+import xml.etree.ElementTree as ElementTree
+import arcade
+import PIL.Image
+import pyglet.media as media
+from pyglet.media.codecs.base import AudioFormat
+import Tanks
+import loading
+
+# Header: magic, format version, length of the json index
+HEADER = struct.Struct("!4sII")
+MAGIC = b"TNKB"
+VERSION = 2
+
+# Blobs start on aligned offsets
+ALIGNMENT = 16
+
+def bundled_files(level_num_max=10):
+    """ Lists the images and sounds the game loads at runtime
+
+    Args:
+        level_num_max (int, optional): the last level. Defaults to 10.
+
+    Returns:
+        tuple: (image paths, sound paths)
+    """
+    keys = loading.remaining_assets(level_num_max)
+    for level_num in range(1, level_num_max + 1):
+        keys += loading.level_assets(level_num, list(Tanks.Difficulty))
+    images = [key[1] for key in keys if key[0] in ("texture", "spritesheet")]
+    sounds = [key[1] for key in keys if key[0] == "sound"]
+
+    # Tiles of the tilemaps, relative to the maps folder
+    for image in ElementTree.parse("maps/tiles.tsx").getroot().iter("image"):
+        images.append(os.path.relpath(os.path.join("maps", image.get("source"))))
+
+    return list(dict.fromkeys(images)), list(dict.fromkeys(sounds))
+
+def source_stamp(file_name):
+    """ Gets what the bundle records about an asset file to tell when it has changed
+
+    Args:
+        file_name (str): path of the asset file
+
+    Returns:
+        list: modification time in nanoseconds and size in bytes, or None if the file is gone
+    """
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def build(path=Tanks.ASSET_BUNDLE, level_num_max=10):
+    """ Decodes the game's assets and packs them into a bundle
+
+    Args:
+        path (str, optional): bundle file to write. Defaults to Tanks.ASSET_BUNDLE.
+        level_num_max (int, optional): the last level. Defaults to 10.
+
+    Returns:
+        list: the files that were not found and are left out of the bundle
+    """
+    images, sounds = bundled_files(level_num_max)
+    index = {}
+    blobs = []
+    offset = 0
+    missing = []
+
+    def add(file_name, data, **entry):
+        nonlocal offset
+        index[file_name] = dict(entry, offset=offset, length=len(data), source=source_stamp(file_name))
+        padding = -len(data) % ALIGNMENT
+        blobs.append(data + bytes(padding))
+        offset += len(data) + padding
+
+    for file_name in images:
+        if not os.path.isfile(file_name):
+            missing.append(file_name)
+            continue
+        image = PIL.Image.open(file_name).convert("RGBA")
+        add(file_name, image.tobytes(), kind="image", width=image.width, height=image.height)
+
+    for file_name in sounds:
+        if not os.path.isfile(file_name):
+            missing.append(file_name)
+            continue
+        with wave.open(file_name) as sound:
+            add(file_name, sound.readframes(sound.getnframes()), kind="sound", channels=sound.getnchannels(),
+                sample_size=sound.getsampwidth() * 8, sample_rate=sound.getframerate())
+
+    index_bytes = json.dumps(index).encode()
+    index_bytes += b" " * (-(HEADER.size + len(index_bytes)) % ALIGNMENT)
+    with open(path, "wb") as bundle_file:
+        bundle_file.write(HEADER.pack(MAGIC, VERSION, len(index_bytes)))
+        bundle_file.write(index_bytes)
+        for blob in blobs:
+            bundle_file.write(blob)
+    return missing
+
+class BundledSource(media.StaticSource):
+    """ Static sound source over PCM samples that are already decoded
+    """
+    def __init__(self, data, audio_format):
+        """ Constructor for the bundled source
+
+        Args:
+            data (memoryview): the PCM samples
+            audio_format (AudioFormat): format of the samples
+        """
+        self.audio_format = audio_format
+        self._data = data
+        self._duration = len(data) / audio_format.bytes_per_second
+
+class BundledSound(arcade.Sound):
+    """ Sound played from the bundle instead of a file
+    """
+    def __init__(self, file_name, source):
+        """ Constructor for the bundled sound
+
+        Args:
+            file_name (str): path of the original sound file
+            source (BundledSource): the decoded samples
+        """
+        self.file_name = file_name
+        self.source = source
+        self.min_distance = 100000000
+
+class AssetBundle:
+    """ Memory-mapped asset bundle. Images and sounds are read straight out
+    of the mapped file without copying or decoding.
+    """
+    def __init__(self, path=Tanks.ASSET_BUNDLE):
+        """ Constructor for the asset bundle
+
+        Args:
+            path (str, optional): bundle file to open. Defaults to Tanks.ASSET_BUNDLE.
+
+        Raises:
+            ValueError: the file is not a bundle of this version, or an asset file
+                changed after the bundle was built
+        """
+        with open(path, "rb") as bundle_file:
+            self.data = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} asset bundle")
+        self.index = json.loads(bytes(self.data[HEADER.size:HEADER.size + index_length]))
+        self.start = HEADER.size + index_length
+
+        stale = self.stale()
+        if stale:
+            self.close()
+            raise ValueError(f"{path} is older than {stale[0]}")
+
+    def stale(self):
+        """ Lists the asset files that changed or were removed after the bundle was built
+
+        Returns:
+            list: paths of the changed files
+        """
+        return [file_name for file_name, entry in self.index.items() if source_stamp(file_name) != entry["source"]]
+
+    def close(self):
+        """ Unmaps the bundle file
+        """
+        self.data.close()
+
+    def __contains__(self, file_name):
+        return file_name in self.index
+
+    def blob(self, file_name):
+        """ Gets the bytes of an asset
+
+        Args:
+            file_name (str): path of the original asset file
+
+        Returns:
+            memoryview: view into the mapped file
+        """
+        entry = self.index[file_name]
+        start = self.start + entry["offset"]
+        return memoryview(self.data)[start:start + entry["length"]]
+
+    def image(self, file_name):
+        """ Gets an image
+
+        Args:
+            file_name (str): path of the original image file
+
+        Returns:
+            PIL.Image.Image: RGBA image backed by the mapped file
+        """
+        entry = self.index[file_name]
+        return PIL.Image.frombuffer("RGBA", (entry["width"], entry["height"]), self.blob(file_name), "raw", "RGBA", 0, 1)
+
+    def sound(self, file_name):
+        """ Gets a sound
+
+        Args:
+            file_name (str): path of the original sound file
+
+        Returns:
+            BundledSound: the sound
+        """
+        entry = self.index[file_name]
+        audio_format = AudioFormat(channels=entry["channels"], sample_size=entry["sample_size"], sample_rate=entry["sample_rate"])
+        return BundledSound(file_name, BundledSource(self.blob(file_name), audio_format))
+
+    def install(self):
+        """ Puts every image into arcade's texture cache, under both the relative
+        path the game uses and the absolute path the tilemaps use. Every
+        arcade.load_texture and arcade.Sprite for those files then takes its
+        pixels from the bundle.
+        """
+        for file_name, entry in self.index.items():
+            if entry["kind"] != "image":
+                continue
+            texture = arcade.Texture(file_name, self.image(file_name))
+            arcade.load_texture.texture_cache[file_name] = texture
+            arcade.load_texture.texture_cache[os.path.abspath(file_name)] = texture
+
+def open_bundle(path=Tanks.ASSET_BUNDLE):
+    """ Opens the asset bundle if it has been built
+
+    Args:
+        path (str, optional): bundle file to open. Defaults to Tanks.ASSET_BUNDLE.
+
+    Returns:
+        AssetBundle: the bundle, or None to load the asset files one by one
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        return AssetBundle(path)
+    except ValueError:
+        # Built by another version of the game or from older assets, ignore it until it is rebuilt
+        return None
+
+def main():
+    """
+    Main method. Builds the asset bundle.
+    """
+    parser = argparse.ArgumentParser(description="Pack the Tank Game's assets into one bundle file")
+    parser.add_argument("--output", default=Tanks.ASSET_BUNDLE)
+    args = parser.parse_args()
+
+    missing = build(args.output)
+    for file_name in missing:
+        print(f"Missing, left out of the bundle: {file_name}")
+    print(f"Wrote {args.output} ({os.path.getsize(args.output)} bytes)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+dangermap.py contains the shared map of the cells that mines and bullets threaten
+"""
+
+import math
+import numpy as np
+import Tanks
+from tilegrid import EMPTY
+
+# Cell offsets (row, column) of the enemies' random walk directions: up, down, left, right and stay.
+# 0 is a tank that has not picked a direction yet, and stays too
+DIRECTION_OFFSETS = {0: (0, 0), 1: (1, 0), 2: (-1, 0), 3: (0, -1), 4: (0, 1), 5: (0, 0)}
+
+class DangerMap:
+    """ Number of threats on every cell of the level, on the same 56 pixel grid
+    as the AStar searches.
+
+    Mines mark the cells their explosion reaches when they are laid and unmark
+    them when they go off. Bullets mark the cells on their way ahead, and are
+    only marked again when they enter a new cell or ricochet. Reading the
+    danger of a cell is a single array read however many threats there are.
+    """
+    def __init__(self, tile_grid, mine_radius=Tanks.EXPLOSION_RADIUS, lookahead=Tanks.DANGER_BULLET_LOOKAHEAD):
+        """ Constructor for the danger map
+
+        Args:
+            tile_grid (TileGrid): obstacle tiles of the level
+            mine_radius (float, optional): reach of a mine's explosion. Defaults to Tanks.EXPLOSION_RADIUS.
+            lookahead (float, optional): pixels ahead of a bullet that are marked. Defaults to Tanks.DANGER_BULLET_LOOKAHEAD.
+        """
+        self.tile_grid = tile_grid
+        self.mine_radius = mine_radius
+        self.lookahead = lookahead
+        self.mines = np.zeros((tile_grid.rows, tile_grid.columns), dtype=np.int16)
+        self.bullets = np.zeros((tile_grid.rows, tile_grid.columns), dtype=np.int16)
+        self.mine_cells = {}
+        self.bullet_cells = {}
+
+    def danger(self, row, column):
+        """ Gets the number of threats on a cell
+
+        Args:
+            row (int): cell row
+            column (int): cell column
+
+        Returns:
+            int: mines and bullets threatening the cell, 0 outside of the level
+        """
+        if not self.tile_grid.in_bounds(row, column):
+            return 0
+        return int(self.mines[row, column] + self.bullets[row, column])
+
+    def danger_at(self, x, y):
+        """ Gets the number of threats on the cell that contains a point
+
+        Args:
+            x (float): x coordinate in pixels
+            y (float): y coordinate in pixels
+
+        Returns:
+            int: mines and bullets threatening the cell
+        """
+        return self.danger(*self.tile_grid.cell(x, y))
+
+    def safe_direction(self, x, y, preferred):
+        """ Picks a random walk direction that does not lead into danger
+
+        Args:
+            x (float): x coordinate of the tank
+            y (float): y coordinate of the tank
+            preferred (int): the direction the tank wants to take, see DIRECTION_OFFSETS
+
+        Returns:
+            int: the preferred direction if it is safe, else the first safe one, staying last.
+                The preferred direction if nothing is safe.
+        """
+        row, column = self.tile_grid.cell(x, y)
+        for direction in (preferred, 1, 2, 3, 4, 5):
+            row_offset, column_offset = DIRECTION_OFFSETS[direction]
+            target = (row + row_offset, column + column_offset)
+            if self.tile_grid.in_bounds(*target) and self.tile_grid.cells[target] == EMPTY and self.danger(*target) == 0:
+                return direction
+        return preferred
+
+    def cells_in_radius(self, x, y, radius):
+        """ Finds the cells a circle reaches
+
+        Args:
+            x (float): x coordinate of the center
+            y (float): y coordinate of the center
+            radius (float): radius of the circle
+
+        Returns:
+            tuple: (rows, columns) arrays of the cells
+        """
+        grid = self.tile_grid
+        bottom, left = grid.cell(x - radius, y - radius)
+        top, right = grid.cell(x + radius, y + radius)
+        rows, columns = np.mgrid[max(bottom, 0):min(top, grid.rows - 1) + 1, max(left, 0):min(right, grid.columns - 1) + 1]
+        rows, columns = rows.ravel(), columns.ravel()
+        # Distance from the center to the closest point of each cell
+        dx = np.maximum(np.abs((columns + 0.5) * grid.tile_size - x) - grid.tile_size / 2, 0)
+        dy = np.maximum(np.abs((rows + 0.5) * grid.tile_size - y) - grid.tile_size / 2, 0)
+        inside = dx * dx + dy * dy <= radius * radius
+        return rows[inside], columns[inside]
+
+    def add_mine(self, mine):
+        """ Marks the cells a new mine's explosion will reach
+
+        Args:
+            mine (Tanks.Mine): the mine
+        """
+        if mine in self.mine_cells:
+            return
+        cells = self.cells_in_radius(mine.center_x, mine.center_y, self.mine_radius)
+        self.mines[cells] += 1
+        self.mine_cells[mine] = cells
+
+    def remove_mine(self, mine):
+        """ Unmarks the cells of a mine that went off
+
+        Args:
+            mine (Tanks.Mine): the mine
+        """
+        cells = self.mine_cells.pop(mine, None)
+        if cells is not None:
+            self.mines[cells] -= 1
+
+    def bullet_path(self, bullet):
+        """ Finds the cells on a bullet's way ahead, up to the first obstacle
+
+        Args:
+            bullet (Tanks.Bullet): the bullet
+
+        Returns:
+            tuple: (rows, columns) arrays of the cells
+        """
+        grid = self.tile_grid
+        speed = math.hypot(bullet.vx, bullet.vy)
+        if speed == 0:
+            return self.cells_in_radius(bullet.center_x, bullet.center_y, 0)
+
+        # Sample the line every half cell
+        distances = np.arange(0, self.lookahead + 1, grid.tile_size / 2)
+        rows = np.floor((bullet.center_y + bullet.vy / speed * distances) / grid.tile_size).astype(int)
+        columns = np.floor((bullet.center_x + bullet.vx / speed * distances) / grid.tile_size).astype(int)
+        blocked = np.flatnonzero(grid.lookup(rows, columns) != EMPTY)
+        if len(blocked) > 0:
+            rows, columns = rows[:blocked[0]], columns[:blocked[0]]
+        cells = np.unique(rows * grid.columns + columns)
+        return np.divmod(cells, grid.columns)
+
+    def update_bullets(self, bullet_list):
+        """ Marks the cells ahead of the bullets that moved into a new cell or
+        ricocheted, and unmarks the bullets that are gone. Called every update.
+
+        Args:
+            bullet_list: List of bullets
+        """
+        alive = set()
+        for bullet in bullet_list:
+            alive.add(bullet)
+            key = (self.tile_grid.cell(bullet.center_x, bullet.center_y), bullet.vx, bullet.vy)
+            marked = self.bullet_cells.get(bullet)
+            if marked is not None and marked[0] == key:
+                continue
+            if marked is not None:
+                self.bullets[marked[1]] -= 1
+            cells = self.bullet_path(bullet)
+            self.bullets[cells] += 1
+            self.bullet_cells[bullet] = (key, cells)
+
+        for bullet in [bullet for bullet in self.bullet_cells if bullet not in alive]:
+            self.bullets[self.bullet_cells.pop(bullet)[1]] -= 1
+
+    def reset(self, mine_list, bullet_list):
+        """ Marks the map again from scratch, e.g. after the state was restored
+
+        Args:
+            mine_list: List of mines
+            bullet_list: List of bullets
+        """
+        self.mines[:] = 0
+        self.bullets[:] = 0
+        self.mine_cells = {}
+        self.bullet_cells = {}
+        for mine in mine_list:
+            self.add_mine(mine)
+        self.update_bullets(bullet_list)
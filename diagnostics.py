@@ -0,0 +1,149 @@
+"""
+diagnostics.py contains the memory report taken at every level boundary
+"""
+
+from collections import namedtuple
+import gc
+import tracemalloc
+import arcade
+import pymunk
+import Tanks
+
+# Live objects counted at every checkpoint
+TRACKED_TYPES = {"sprites": arcade.Sprite,
+                 "sprite_lists": arcade.SpriteList,
+                 "textures": arcade.Texture,
+                 "sounds": arcade.Sound,
+                 "bodies": pymunk.Body,
+                 "shapes": pymunk.Shape,
+                 "physics_engines": arcade.PymunkPhysicsEngine,
+                 "barrier_lists": arcade.AStarBarrierList}
+
+# Memory state at one level boundary.
+#   label: name of the checkpoint
+#   traced_bytes: memory allocated by python and still alive
+#   counts: live objects of every tracked type
+#   top_growth: (source line, bytes grown) allocating the most since the previous checkpoint
+#   flagged: the tracked types and "traced_bytes" that look like they are leaking
+MemoryReport = namedtuple("MemoryReport", ["label", "traced_bytes", "counts", "top_growth", "flagged"])
+
+class MemoryDiagnostics:
+    """ Leak detector for long sessions.
+
+    checkpoint() is called once the next level is set up, when the objects of
+    the previous level should be gone. It takes a tracemalloc snapshot, counts
+    the live sprites, textures, physics bodies and sounds, and diffs both with
+    the previous checkpoint. A count that grew at every one of the last few
+    checkpoints, or traced memory that grew past a threshold since the first
+    one, is flagged as a suspected leak.
+    """
+    def __init__(self, frames=Tanks.MEMORY_TRACE_FRAMES, growth_checkpoints=Tanks.MEMORY_GROWTH_CHECKPOINTS,
+                 growth_threshold=Tanks.MEMORY_GROWTH_THRESHOLD):
+        """ Constructor for the memory diagnostics
+
+        Args:
+            frames (int, optional): stack frames kept per allocation. Defaults to Tanks.MEMORY_TRACE_FRAMES.
+            growth_checkpoints (int, optional): checkpoints in a row a count must grow at to be flagged.
+                Defaults to Tanks.MEMORY_GROWTH_CHECKPOINTS.
+            growth_threshold (int, optional): bytes traced memory may grow past the first checkpoint.
+                Defaults to Tanks.MEMORY_GROWTH_THRESHOLD.
+        """
+        self.frames = frames
+        self.growth_checkpoints = growth_checkpoints
+        self.growth_threshold = growth_threshold
+        self.snapshot = None
+        self.reports = []
+
+    def start(self):
+        """ Starts tracing allocations
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        """ Stops tracing allocations
+        """
+        tracemalloc.stop()
+        self.snapshot = None
+
+    def count_objects(self):
+        """ Counts the live objects of the tracked types
+
+        Returns:
+            dict: number of live objects for every tracked type
+        """
+        counts = dict.fromkeys(TRACKED_TYPES, 0)
+        for obj in gc.get_objects():
+            for name, tracked_type in TRACKED_TYPES.items():
+                if isinstance(obj, tracked_type):
+                    counts[name] += 1
+        return counts
+
+    def checkpoint(self, label, top=5):
+        """ Takes a memory report and compares it with the previous ones
+
+        Args:
+            label (str): name of the checkpoint
+            top (int, optional): number of source lines reported. Defaults to 5.
+
+        Returns:
+            MemoryReport: the report
+        """
+        # Only objects that are really unreachable should be gone
+        gc.collect()
+        counts = self.count_objects()
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        traced_bytes = sum(statistic.size for statistic in snapshot.statistics("filename"))
+
+        top_growth = []
+        if self.snapshot is not None:
+            for statistic in snapshot.compare_to(self.snapshot, "lineno")[:top]:
+                if statistic.size_diff > 0:
+                    frame = statistic.traceback[0]
+                    top_growth.append((f"{frame.filename}:{frame.lineno}", statistic.size_diff))
+        self.snapshot = snapshot
+
+        report = MemoryReport(label, traced_bytes, counts, top_growth, [])
+        self.reports.append(report)
+        report.flagged.extend(self.suspected_leaks())
+        return report
+
+    def suspected_leaks(self):
+        """ Finds what kept growing over the recent checkpoints
+
+        Returns:
+            list: names of the tracked types, and "traced_bytes", that look like they are leaking
+        """
+        flagged = []
+        recent = self.reports[-self.growth_checkpoints - 1:]
+        if len(recent) > self.growth_checkpoints:
+            for name in TRACKED_TYPES:
+                if all(later.counts[name] > earlier.counts[name] for earlier, later in zip(recent, recent[1:])):
+                    flagged.append(name)
+        if len(self.reports) > 1 and self.reports[-1].traced_bytes - self.reports[0].traced_bytes > self.growth_threshold:
+            flagged.append("traced_bytes")
+        return flagged
+
+    def format(self, report):
+        """ Formats a report, with the changes since the previous checkpoint
+
+        Args:
+            report (MemoryReport): the report
+
+        Returns:
+            str: readable report
+        """
+        index = self.reports.index(report)
+        previous = self.reports[index - 1] if index > 0 else None
+
+        lines = [f"Memory at {report.label}: {report.traced_bytes / 1e6:.2f} MB traced"]
+        counts = [f"{name} {count}" for name, count in report.counts.items()]
+        if previous is not None:
+            lines[0] += f" ({(report.traced_bytes - previous.traced_bytes) / 1e6:+.2f} MB)"
+            counts = [f"{text} ({count - previous.counts[name]:+})" for text, (name, count) in zip(counts, report.counts.items())]
+        lines.append("  " + ", ".join(counts))
+        for location, size in report.top_growth:
+            lines.append(f"  +{size / 1e3:.1f} kB {location}")
+        if report.flagged:
+            lines.append("  Suspected leak: " + ", ".join(report.flagged))
+        return "\n".join(lines)
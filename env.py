@@ -0,0 +1,342 @@
+"""
+env.py contains gym-style environments for training and evaluating bots against the Tanks Game.
+
+A TankEnv runs one headless TankSimulation. VecEnv steps several of them in
+one call and returns batched NumPy arrays, and ProcessVecEnv spreads them
+over worker processes so steps per second scale with the number of cores.
+
+Actions are (move, fire, aim_x, aim_y, mine):
+    move: 0 stop, 1 W, 2 S, 3 A, 4 D
+    fire: 1 to shoot at the aim
+    aim_x, aim_y: where the turret points, in pixels
+    mine: 1 to lay a mine
+"""
+
+import multiprocessing
+import random
+import arcade
+import numpy as np
+import Tanks
+from simulation import TankSimulation
+from pathfinding import PathfindingPool
+from loading import AssetLoader
+
+MOVE_KEYS = [None, arcade.key.W, arcade.key.S, arcade.key.A, arcade.key.D]
+
+# Kind of every tank in the observation
+TANK_KINDS = {None: 0, Tanks.Difficulty.EASY: 1, Tanks.Difficulty.MEDIUM: 2, Tanks.Difficulty.HARD: 3}
+
+# Columns of the entity arrays in an observation
+TANK_COLUMNS = ("alive", "x", "y", "angle", "kind", "can_shoot")
+BULLET_COLUMNS = ("alive", "x", "y", "vx", "vy", "from_player")
+MINE_COLUMNS = ("alive", "x", "y", "time_left")
+
+class TankEnv:
+    """ One headless game with a gym-style reset() and step().
+
+    An episode is one attempt at a level. It ends as soon as the level is won
+    or the player is destroyed, or after max_steps steps. Every step runs
+    frame_skip simulation frames with the same action.
+    """
+    def __init__(self, levels=(1,), frame_skip=Tanks.ENV_FRAME_SKIP, max_steps=Tanks.ENV_MAX_STEPS,
+                 path_pool=None, loader=None, seed=None):
+        """ Constructor for the environment
+
+        Args:
+            levels (tuple, optional): levels an episode is picked from. Defaults to (1,).
+            frame_skip (int, optional): simulation frames per step. Defaults to Tanks.ENV_FRAME_SKIP.
+            max_steps (int, optional): steps before an episode is cut off. Defaults to Tanks.ENV_MAX_STEPS.
+            path_pool (PathfindingPool, optional): Worker pool for the enemies' AStar searches. Defaults to a new pool.
+            loader (AssetLoader, optional): Texture cache. Defaults to a new loader.
+            seed (int, optional): seed for picking the levels. Defaults to None.
+        """
+        self.simulation = TankSimulation(path_pool, loader)
+        self.levels = list(levels)
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.random = random.Random(seed)
+        self.steps = 0
+
+    def reset(self):
+        """ Starts a new episode
+
+        Returns:
+            dict: the first observation
+        """
+        simulation = self.simulation
+        simulation.level_num = self.random.choice(self.levels)
+        simulation.player_lives = Tanks.ENV_PLAYER_LIVES
+        simulation.tanks_destroyed = 0
+        simulation.end_level_time = Tanks.END_LEVEL_TIME
+        simulation.game_over = simulation.game_lost = False
+        simulation.round_over = simulation.round_lost = False
+        simulation.up_pressed = simulation.down_pressed = simulation.left_pressed = simulation.right_pressed = False
+        simulation.setup()
+        self.steps = 0
+        return self.observe()
+
+    def apply(self, action):
+        """ Feeds an action to the simulation as player input
+
+        Args:
+            action: (move, fire, aim_x, aim_y, mine)
+        """
+        move, fire, aim_x, aim_y, mine = action
+        simulation = self.simulation
+        key = MOVE_KEYS[int(move)]
+        for other in MOVE_KEYS[1:]:
+            if other != key:
+                simulation.key_release(other)
+        if key is not None:
+            simulation.key_press(key)
+
+        simulation.mouse_motion(float(aim_x), float(aim_y))
+        if fire:
+            simulation.mouse_press(float(aim_x), float(aim_y))
+        if mine:
+            simulation.key_press(arcade.key.SPACE)
+
+    def step(self, action):
+        """ Runs the game for one step
+
+        Args:
+            action: (move, fire, aim_x, aim_y, mine)
+
+        Returns:
+            tuple: (observation, reward, done, info)
+        """
+        simulation = self.simulation
+        tanks_destroyed = simulation.tanks_destroyed
+        self.apply(action)
+        for _ in range(self.frame_skip):
+            simulation.update_simulation(Tanks.PHYSICS_TIME_STEP)
+            if self.finished():
+                break
+        self.steps += 1
+
+        won = len(simulation.enemy_list) == 0 and not simulation.round_lost
+        reward = (simulation.tanks_destroyed - tanks_destroyed) * Tanks.ENV_KILL_REWARD
+        if simulation.round_lost:
+            reward += Tanks.ENV_DEATH_REWARD
+        elif won:
+            reward += Tanks.ENV_WIN_REWARD
+
+        done = self.finished() or self.steps >= self.max_steps
+        info = {"level": simulation.level_num, "won": won, "tanks_destroyed": simulation.tanks_destroyed,
+                "steps": self.steps, "truncated": done and not self.finished()}
+        return self.observe(), reward, done, info
+
+    def finished(self):
+        """ Checks if the level has been decided
+
+        Returns:
+            bool: True once the player won or was destroyed
+        """
+        simulation = self.simulation
+        return simulation.round_lost or len(simulation.enemy_list) == 0 or simulation.game_over
+
+    def observe(self):
+        """ Builds the observation of the current frame
+
+        Returns:
+            dict: "tiles" grid of tilegrid cell types, and "tanks", "bullets" and "mines"
+                arrays with one row per entity (see TANK_COLUMNS, BULLET_COLUMNS, MINE_COLUMNS)
+        """
+        simulation = self.simulation
+        tanks = np.zeros((Tanks.ENV_MAX_TANKS, len(TANK_COLUMNS)), dtype=np.float32)
+        bullets = np.zeros((Tanks.ENV_MAX_BULLETS, len(BULLET_COLUMNS)), dtype=np.float32)
+        mines = np.zeros((Tanks.ENV_MAX_MINES, len(MINE_COLUMNS)), dtype=np.float32)
+
+        # The player always comes first
+        player = simulation.player_sprite
+        tanks[0] = (player in simulation.player_list, player.center_x, player.center_y, player.turret.angle,
+                    TANK_KINDS[None], player.can_shoot)
+        for row, enemy in zip(tanks[1:], simulation.enemy_list):
+            row[:] = (1, enemy.center_x, enemy.center_y, enemy.turret.angle, TANK_KINDS[enemy.difficulty], enemy.can_shoot)
+        for row, bullet in zip(bullets, simulation.bullet_list):
+            row[:] = (1, bullet.center_x, bullet.center_y, bullet.vx, bullet.vy, bullet.shooter_id == player.entity_id)
+        for row, mine in zip(mines, simulation.mine_list):
+            row[:] = (1, mine.center_x, mine.center_y, mine.end_time - mine.total_time)
+
+        return {"tiles": simulation.tile_grid.cells.copy(), "tanks": tanks, "bullets": bullets, "mines": mines}
+
+    def close(self):
+        """ Cancels the environment's path searches
+        """
+        self.simulation.path_pool.shutdown()
+
+def stack(observations):
+    """ Batches the observations of several environments
+
+    Args:
+        observations (list): observation dicts
+
+    Returns:
+        dict: the same keys, with arrays that have the environment as first axis
+    """
+    return {key: np.stack([observation[key] for observation in observations]) for key in observations[0]}
+
+def step_env(env, action):
+    """ Steps an environment and resets it when its episode is done
+
+    Args:
+        env (TankEnv): the environment
+        action: the action
+
+    Returns:
+        tuple: (observation, reward, done, info). When the episode is done the observation
+            is the first one of the next episode, and info["final_observation"] the last one.
+    """
+    observation, reward, done, info = env.step(action)
+    if done:
+        info["final_observation"] = observation
+        observation = env.reset()
+    return observation, reward, done, info
+
+class VecEnv:
+    """ K independent games stepped together in this process.
+
+    The worlds share one pathfinding pool and one texture cache.
+    """
+    def __init__(self, num_envs, **env_args):
+        """ Constructor for the vectorized environment
+
+        Args:
+            num_envs (int): number of games
+            **env_args: arguments for every TankEnv. A seed is offset per game.
+        """
+        self.path_pool = PathfindingPool()
+        loader = AssetLoader()
+        seed = env_args.pop("seed", None)
+        self.envs = [TankEnv(path_pool=self.path_pool.session(), loader=loader,
+                             seed=None if seed is None else seed + i, **env_args) for i in range(num_envs)]
+        self.num_envs = num_envs
+
+    def reset(self):
+        """ Starts a new episode in every game
+
+        Returns:
+            dict: batched observations
+        """
+        return stack([env.reset() for env in self.envs])
+
+    def step(self, actions):
+        """ Steps every game, resetting the ones whose episode ended
+
+        Args:
+            actions: one action per game, e.g. an array of shape (num_envs, 5)
+
+        Returns:
+            tuple: (batched observations, rewards, dones, list of infos)
+        """
+        results = [step_env(env, action) for env, action in zip(self.envs, actions)]
+        observations, rewards, dones, infos = zip(*results)
+        return stack(observations), np.array(rewards, dtype=np.float32), np.array(dones), list(infos)
+
+    def close(self):
+        """ Stops the pathfinding workers
+        """
+        self.path_pool.shutdown()
+
+def worker(connection, num_envs, env_args):
+    """ Worker process of a ProcessVecEnv. Runs a VecEnv and answers commands
+    until it is told to close.
+
+    Args:
+        connection (multiprocessing.connection.Connection): pipe to the parent process
+        num_envs (int): number of games in this worker
+        env_args (dict): arguments for every TankEnv
+    """
+    envs = VecEnv(num_envs, **env_args)
+    try:
+        while True:
+            command, data = connection.recv()
+            if command == "reset":
+                connection.send(envs.reset())
+            elif command == "step":
+                connection.send(envs.step(data))
+            elif command == "close":
+                break
+    finally:
+        envs.close()
+        connection.close()
+
+class ProcessVecEnv:
+    """ K independent games spread over worker processes.
+
+    Has the same interface as VecEnv. Each worker steps its share of the
+    games while the others do the same, so steps per second scale with the
+    number of cores.
+    """
+    def __init__(self, num_envs, workers=None, **env_args):
+        """ Constructor for the process-backed vectorized environment
+
+        Args:
+            num_envs (int): number of games
+            workers (int, optional): number of worker processes. Defaults to the number of cores, at most num_envs.
+            **env_args: arguments for every TankEnv. A seed is offset per game.
+        """
+        workers = min(workers or multiprocessing.cpu_count(), num_envs)
+        seed = env_args.pop("seed", None)
+        self.num_envs = num_envs
+        self.sizes = [num_envs // workers + (i < num_envs % workers) for i in range(workers)]
+        self.connections = []
+        self.processes = []
+        first = 0
+        for size in self.sizes:
+            args = dict(env_args, seed=None if seed is None else seed + first)
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=worker, args=(child, size, args), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+            first += size
+
+    def reset(self):
+        """ Starts a new episode in every game
+
+        Returns:
+            dict: batched observations
+        """
+        for connection in self.connections:
+            connection.send(("reset", None))
+        return self.concatenate([connection.recv() for connection in self.connections])
+
+    def step(self, actions):
+        """ Steps every game, resetting the ones whose episode ended
+
+        Args:
+            actions: one action per game, e.g. an array of shape (num_envs, 5)
+
+        Returns:
+            tuple: (batched observations, rewards, dones, list of infos)
+        """
+        first = 0
+        for connection, size in zip(self.connections, self.sizes):
+            connection.send(("step", actions[first:first + size]))
+            first += size
+        results = [connection.recv() for connection in self.connections]
+        observations, rewards, dones, infos = zip(*results)
+        return (self.concatenate(observations), np.concatenate(rewards), np.concatenate(dones),
+                [info for worker_infos in infos for info in worker_infos])
+
+    def concatenate(self, observations):
+        """ Joins the batched observations of the workers
+
+        Args:
+            observations (list): batched observations of every worker
+
+        Returns:
+            dict: batched observations of all games
+        """
+        return {key: np.concatenate([observation[key] for observation in observations]) for key in observations[0]}
+
+    def close(self):
+        """ Stops the worker processes
+        """
+        for connection in self.connections:
+            connection.send(("close", None))
+            connection.close()
+        for process in self.processes:
+            process.join()
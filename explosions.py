@@ -0,0 +1,114 @@
+"""
+explosions.py contains the resolver that applies explosion damage and chain reactions
+"""
+
+from collections import deque
+import math
+import numpy as np
+import Tanks
+from tilegrid import BREAKABLE, EXPLODABLE
+
+class ExplosionResolver:
+    """ Applies the damage of explosions once, when they go off.
+
+    Every explosion emits one radius-damage event. resolve() works through the
+    queued events in one pass: tanks, the player and breakable obstacles in
+    range are destroyed, and explodables and mines in range detonate and queue
+    their own events. The explosion sprites are only the animation.
+    """
+    def __init__(self, simulation, radius=Tanks.EXPLOSION_RADIUS):
+        """ Constructor for the explosion resolver
+
+        Args:
+            simulation (TankSimulation): the simulation the explosions happen in
+            radius (float, optional): damage radius of an explosion. Defaults to Tanks.EXPLOSION_RADIUS.
+        """
+        self.simulation = simulation
+        self.radius = radius
+        self.events = deque()
+
+    def emit(self, x, y):
+        """ Queues the damage event of an explosion
+
+        Args:
+            x (float): x coordinate of the explosion
+            y (float): y coordinate of the explosion
+        """
+        self.events.append((x, y))
+
+    def in_range(self, x, y, sprites):
+        """ Finds the sprites an explosion reaches
+
+        Args:
+            x (float): x coordinate of the explosion
+            y (float): y coordinate of the explosion
+            sprites (list): candidate sprites
+
+        Returns:
+            list: the sprites whose bounding box is within the radius
+        """
+        if len(sprites) == 0:
+            return []
+        centers = np.array([(sprite.center_x, sprite.center_y, sprite.width / 2, sprite.height / 2) for sprite in sprites]).T
+        # Distance from the explosion to the closest point of each bounding box
+        dx = np.maximum(np.abs(centers[0] - x) - centers[2], 0)
+        dy = np.maximum(np.abs(centers[1] - y) - centers[3], 0)
+        return [sprites[i] for i in np.flatnonzero(dx * dx + dy * dy <= self.radius * self.radius)]
+
+    def tiles_in_range(self, x, y):
+        """ Finds the destructible obstacles an explosion reaches
+
+        Args:
+            x (float): x coordinate of the explosion
+            y (float): y coordinate of the explosion
+
+        Returns:
+            list: (cell type, obstacle sprite) for every obstacle in range
+        """
+        tile_grid = self.simulation.tile_grid
+        tile_size = tile_grid.tile_size
+        bottom, left = tile_grid.cell(x - self.radius, y - self.radius)
+        top, right = tile_grid.cell(x + self.radius, y + self.radius)
+
+        obstacles = []
+        for row in range(max(bottom, 0), min(top, tile_grid.rows - 1) + 1):
+            for column in range(max(left, 0), min(right, tile_grid.columns - 1) + 1):
+                cell_type = tile_grid.cells[row, column]
+                if cell_type != BREAKABLE and cell_type != EXPLODABLE:
+                    continue
+                # Closest point of the tile to the explosion
+                closest_x = min(max(x, column * tile_size), (column + 1) * tile_size)
+                closest_y = min(max(y, row * tile_size), (row + 1) * tile_size)
+                if math.hypot(closest_x - x, closest_y - y) <= self.radius:
+                    obstacles.append((cell_type, tile_grid.sprite_at(row, column)))
+        return obstacles
+
+    def resolve(self):
+        """ Applies the damage of every queued explosion, including chain reactions
+        """
+        simulation = self.simulation
+        if len(self.events) == 0:
+            return
+
+        enemies = list(simulation.enemy_list)
+        mines = list(simulation.mine_list)
+        while self.events:
+            x, y = self.events.popleft()
+
+            for enemy in self.in_range(x, y, enemies):
+                simulation.destroy_enemy(enemy, "explosion")
+                enemies.remove(enemy)
+
+            if simulation.player_sprite in simulation.player_list and self.in_range(x, y, [simulation.player_sprite]):
+                simulation.destroy_player("explosion")
+
+            for cell_type, obstacle in self.tiles_in_range(x, y):
+                simulation.destroy_obstacle(obstacle)
+                if cell_type == EXPLODABLE:
+                    # Explodables go off and queue their own explosion
+                    simulation.explosion_animation(obstacle.center_x, obstacle.center_y)
+
+            for mine in self.in_range(x, y, mines):
+                # Mines in range detonate right away
+                mines.remove(mine)
+                simulation.detonate_mine(mine, "explosion")
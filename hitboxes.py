@@ -0,0 +1,130 @@
+"""
+hitboxes.py contains the on-disk cache of the hit boxes computed from the game's textures
+"""
+
+import hashlib
+import json
+import os
+import threading
+import arcade
+import Tanks
+
+# Format version of the cache file
+VERSION = 1
+
+# Detail arcade's "Detailed" hit box algorithm uses unless given another
+HIT_BOX_DETAIL = 4.5
+
+class CachedHitBoxTexture(arcade.Texture):
+    """ Texture with a hit box read from the cache instead of computed from its pixels
+    """
+    def __init__(self, texture, hit_box_algorithm, points):
+        """ Constructor for a texture with a cached hit box
+
+        Args:
+            texture (arcade.Texture): the texture loaded by arcade, which it stands in for
+            hit_box_algorithm (str): hit box algorithm of the texture
+            points (tuple): the hit box polygon
+        """
+        super().__init__(texture.name, texture.image, hit_box_algorithm=hit_box_algorithm)
+        self.cached_hit_box_points = points
+
+    @property
+    def hit_box_points(self):
+        """ The cached hit box polygon
+        """
+        return self.cached_hit_box_points
+
+class HitBoxCache:
+    """ Hit box polygons of the textures, kept on disk between runs.
+
+    arcade computes a texture's hit box from its pixels the first time a
+    sprite uses it, which is slow for the "Detailed" algorithm. The cache
+    stores every polygon under a hash of the texture's pixels, its hit box
+    algorithm and detail, so changed images are computed again and the
+    rest are read back. The polygon does not depend on the sprite scale,
+    arcade scales it for every sprite. A texture with a cached polygon is
+    replaced in arcade's texture cache by a CachedHitBoxTexture, so sprites
+    made from the file name get the polygon too.
+
+    The cache is thrown away when it was written by another version of arcade,
+    whose algorithms may give other polygons.
+    """
+    def __init__(self, path=Tanks.HIT_BOX_CACHE):
+        """ Constructor for the hit box cache. Loads the cache file if it exists.
+
+        Args:
+            path (str, optional): cache file. Defaults to Tanks.HIT_BOX_CACHE.
+        """
+        self.path = path
+        self.hit_boxes = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        try:
+            with open(path) as cache_file:
+                data = json.load(cache_file)
+            if data.get("version") == VERSION and data.get("arcade") == arcade.version.VERSION:
+                self.hit_boxes = data["hit_boxes"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            # Missing or unreadable, start empty and write it again
+            pass
+
+    def key(self, texture, hit_box_algorithm):
+        """ Gets the cache key of a texture
+
+        Args:
+            texture (arcade.Texture): the texture
+            hit_box_algorithm (str): hit box algorithm the texture was loaded with
+
+        Returns:
+            str: hash of the pixels with the algorithm and detail, or None if
+                the hit box is just the texture's rectangle
+        """
+        if hit_box_algorithm not in ("Simple", "Detailed") or texture.image is None:
+            return None
+        image = texture.image
+        digest = hashlib.sha1(image.tobytes()).hexdigest()
+        return f"{digest}-{image.width}x{image.height}-{hit_box_algorithm}-{HIT_BOX_DETAIL}"
+
+    def apply(self, texture, hit_box_algorithm="Simple"):
+        """ Gives a texture its hit box from the cache, or computes and caches it
+
+        Args:
+            texture (arcade.Texture): a texture just loaded with arcade.load_texture
+            hit_box_algorithm (str, optional): hit box algorithm the texture was loaded with. Defaults to "Simple".
+
+        Returns:
+            arcade.Texture: the texture to use, a CachedHitBoxTexture if the hit box was cached
+        """
+        # Textures are shared by every sprite of the same file, so this is done once per texture
+        if isinstance(texture, CachedHitBoxTexture):
+            return texture
+        key = self.key(texture, hit_box_algorithm)
+        if key is None:
+            return texture
+        with self.lock:
+            points = self.hit_boxes.get(key)
+        if points is not None:
+            cached = CachedHitBoxTexture(texture, hit_box_algorithm, tuple(tuple(point) for point in points))
+            arcade.load_texture.texture_cache[texture.name] = cached
+            return cached
+        points = texture.hit_box_points
+        with self.lock:
+            self.hit_boxes[key] = [list(point) for point in points]
+            self.dirty = True
+        return texture
+
+    def save(self):
+        """ Writes the cache file if hit boxes were computed since it was loaded
+        """
+        # The loader thread and the exit path both save, and share the temporary file
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"version": VERSION, "arcade": arcade.version.VERSION, "hit_boxes": self.hit_boxes}
+            self.dirty = False
+            # Written next to the cache and moved over it, so a crash never leaves half a file
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w") as cache_file:
+                json.dump(data, cache_file)
+            os.replace(temporary, self.path)
@@ -0,0 +1,293 @@
+"""
+loading.py contains the asset loader that streams textures and sounds in the background
+"""
+
+from collections import deque
+import threading
+import xml.etree.ElementTree as ElementTree
+import arcade
+import Tanks
+
+def texture(file_name, hit_box_algorithm="Simple"):
+    """ Asset key for a texture. Loading it also fills arcade's texture cache,
+    so sprites created from the same file afterwards do not touch the disk.
+
+    Args:
+        file_name (str): image path
+        hit_box_algorithm (str, optional): hit box algorithm the sprites use. Defaults to "Simple".
+
+    Returns:
+        tuple: the asset key
+    """
+    return ("texture", file_name, hit_box_algorithm)
+
+def spritesheet(file_name, sprite_width, sprite_height, columns, count):
+    """ Asset key for the textures of a sprite sheet
+
+    Args:
+        file_name (str): image path
+        sprite_width (int): width of a sprite in pixels
+        sprite_height (int): height of a sprite in pixels
+        columns (int): number of sprites per row
+        count (int): number of sprites
+
+    Returns:
+        tuple: the asset key
+    """
+    return ("spritesheet", file_name, sprite_width, sprite_height, columns, count)
+
+def sound(file_name):
+    """ Asset key for a sound
+
+    Args:
+        file_name (str): sound path
+
+    Returns:
+        tuple: the asset key
+    """
+    return ("sound", file_name)
+
+def music_file(level_num):
+    """ Gets the music played during a level
+
+    Args:
+        level_num (int): the level
+
+    Returns:
+        str: sound path of the level's music
+    """
+    return f"sounds/Variation {min(level_num, 9)}.wav"
+
+EXPLOSION_SHEET = spritesheet("assets/explosions_sheet.png", 130, 130, 5, 5)
+PLAYER_TEXTURES = [texture(f"assets/tankBody_blue{i}.png") for i in range(4)]
+ENEMY_IMAGES = {Tanks.Difficulty.EASY: "assets/tankBody_red",
+                Tanks.Difficulty.MEDIUM: "assets/tankBody_green",
+                Tanks.Difficulty.HARD: "assets/tankBody_dark"}
+SOUND_EFFECTS = ["sounds/shoot1.wav", "sounds/shoot2.wav", "sounds/explode1.wav", "sounds/explode2.wav",
+                 "sounds/move.wav", "sounds/Round Start.wav", "sounds/Round Win.wav",
+                 "sounds/Round Failure.wav", "sounds/Results.wav"]
+
+def level_difficulties(level_num):
+    """ Finds the enemy difficulties in a level without loading its tilemap
+
+    Args:
+        level_num (int): the level
+
+    Returns:
+        list: the difficulties with at least one enemy in the level
+    """
+    layers = {"Easy Enemies": Tanks.Difficulty.EASY,
+              "Medium Enemies": Tanks.Difficulty.MEDIUM,
+              "Hard Enemies": Tanks.Difficulty.HARD}
+    difficulties = []
+    for layer in ElementTree.parse(f"maps/level{level_num}.tmx").getroot().iter("layer"):
+        data = layer.find("data")
+        if layer.get("name") in layers and data is not None and any(gid.strip() not in ("", "0") for gid in data.text.split(",")):
+            difficulties.append(layers[layer.get("name")])
+    return difficulties
+
+def level_assets(level_num, difficulties):
+    """ Lists the assets needed to start playing a level
+
+    Args:
+        level_num (int): the level
+        difficulties (iterable): the enemy difficulties in the level
+
+    Returns:
+        list: asset keys, in the order they are needed
+    """
+    assets = [EXPLOSION_SHEET] + PLAYER_TEXTURES
+    assets += [texture("assets/tankBlue_barrel_rotate.png"), texture(Tanks.EXPLODED_TANK_IMAGE),
+               texture("assets/crosshair.png"), texture("assets/bullet.png", None),
+               texture("assets/barrelBlack_top.png"), texture("assets/tracksSmall.png")]
+    if difficulties:
+        assets.append(texture(Tanks.ENEMY_TANK_BARREL))
+    for difficulty in difficulties:
+        assets += [texture(f"{ENEMY_IMAGES[difficulty]}{i}.png") for i in range(4)]
+    assets += [sound(file_name) for file_name in SOUND_EFFECTS]
+    assets.append(sound(music_file(level_num)))
+    return assets
+
+def remaining_assets(level_num_max):
+    """ Lists every asset a game can need after its first level
+
+    Args:
+        level_num_max (int): the last level
+
+    Returns:
+        list: asset keys
+    """
+    assets = [texture("assets/tank_icon.png")]
+    for image in ENEMY_IMAGES.values():
+        assets += [texture(f"{image}{i}.png") for i in range(4)]
+    assets += [sound(music_file(level_num)) for level_num in range(1, level_num_max + 1)]
+    return assets
+
+class AssetLoader:
+    """ Loads and caches the game's textures and sounds.
+
+    Assets are loaded on first use. Assets queued with preload() are loaded
+    in order by a background thread instead, so the window can draw a loading
+    screen while they stream in. A failed background load is kept and raised
+    again when the asset is asked for.
+    """
+    def __init__(self, bundle=None, hit_boxes=None):
+        """ Constructor for the asset loader
+
+        Args:
+            bundle (AssetBundle, optional): packed assets to load from instead of the
+                asset files. Defaults to None.
+            hit_boxes (HitBoxCache, optional): hit boxes computed by earlier runs. Defaults to None.
+        """
+        self.bundle = bundle
+        self.hit_boxes = hit_boxes
+        if bundle is not None:
+            bundle.install()
+        self.assets = {}
+        self.errors = {}
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def texture(self, file_name, hit_box_algorithm="Simple"):
+        """ Gets a texture
+
+        Args:
+            file_name (str): image path
+            hit_box_algorithm (str, optional): hit box algorithm of the texture. Defaults to "Simple".
+
+        Returns:
+            arcade.Texture: the texture
+        """
+        return self.get(texture(file_name, hit_box_algorithm))
+
+    def spritesheet(self, file_name, sprite_width, sprite_height, columns, count):
+        """ Gets the textures of a sprite sheet
+
+        Args:
+            file_name (str): image path
+            sprite_width (int): width of a sprite in pixels
+            sprite_height (int): height of a sprite in pixels
+            columns (int): number of sprites per row
+            count (int): number of sprites
+
+        Returns:
+            list: the textures
+        """
+        return self.get(spritesheet(file_name, sprite_width, sprite_height, columns, count))
+
+    def sound(self, file_name):
+        """ Gets a sound
+
+        Args:
+            file_name (str): sound path
+
+        Returns:
+            arcade.Sound: the sound
+        """
+        return self.get(sound(file_name))
+
+    def get(self, key):
+        """ Gets an asset, loading it right away if the background thread has not yet
+
+        Args:
+            key (tuple): the asset key
+
+        Returns:
+            the asset
+        """
+        if key in self.assets:
+            return self.assets[key]
+        if key in self.errors:
+            raise self.errors[key]
+        return self.load(key)
+
+    def load(self, key):
+        """ Loads an asset into the cache
+
+        Args:
+            key (tuple): the asset key
+
+        Returns:
+            the asset
+        """
+        kind, *args = key
+        try:
+            if kind == "texture":
+                file_name, hit_box_algorithm = args
+                asset = arcade.load_texture(file_name, hit_box_algorithm=hit_box_algorithm)
+            elif kind == "spritesheet":
+                # Cut from arcade's cached copy of the sheet, which can come from the bundle
+                file_name, sprite_width, sprite_height, columns, count = args
+                asset = [arcade.load_texture(file_name, x=i % columns * sprite_width, y=i // columns * sprite_height,
+                                             width=sprite_width, height=sprite_height) for i in range(count)]
+            elif self.bundle is not None and args[0] in self.bundle:
+                asset = self.bundle.sound(args[0])
+            else:
+                asset = arcade.load_sound(args[0])
+        except Exception as error:
+            self.errors[key] = error
+            raise
+        if self.hit_boxes is not None and kind == "texture":
+            # Sprites of the texture then take the hit box instead of computing it
+            asset = self.hit_boxes.apply(asset, args[1])
+        elif self.hit_boxes is not None and kind == "spritesheet":
+            asset = [self.hit_boxes.apply(texture) for texture in asset]
+        self.assets[key] = asset
+        return asset
+
+    def preload(self, keys):
+        """ Queues assets for the background thread, which is started if it is not running
+
+        Args:
+            keys (list): asset keys, loaded in order
+        """
+        with self.lock:
+            self.pending.extend(keys)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def run(self):
+        """ Background thread. Loads the queued assets until the queue is empty
+        """
+        while True:
+            with self.lock:
+                if not self.pending:
+                    break
+                key = self.pending.popleft()
+            if key in self.assets or key in self.errors:
+                continue
+            try:
+                self.load(key)
+            except Exception:
+                # Kept in self.errors and raised when the asset is used
+                pass
+
+        # Keep the hit boxes computed for the queued textures for the next run
+        if self.hit_boxes is not None:
+            self.hit_boxes.save()
+
+    def ready(self, keys):
+        """ Checks if assets are done loading
+
+        Args:
+            keys (list): asset keys
+
+        Returns:
+            bool: True once every asset has been loaded or has failed
+        """
+        return all(key in self.assets or key in self.errors for key in keys)
+
+    def progress(self, keys):
+        """ Gets how many of some assets are done loading
+
+        Args:
+            keys (list): asset keys
+
+        Returns:
+            float: fraction between 0 and 1
+        """
+        if len(keys) == 0:
+            return 1.0
+        return sum(key in self.assets or key in self.errors for key in keys) / len(keys)
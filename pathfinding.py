@@ -0,0 +1,141 @@
+"""
+pathfinding.py contains the background worker pool used for enemy AStar searches
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import arcade
+import Tanks
+
+class PathRequest:
+    """ Handle for a path search that is running in the background
+    """
+    def __init__(self, future, goal_cell):
+        """ Constructor for a path request
+
+        Args:
+            future (concurrent.futures.Future): the future for the AStar search
+            goal_cell (tuple): grid cell of the goal when the request was made
+        """
+        self.future = future
+        self.goal_cell = goal_cell
+        self.cancelled = False
+
+    def cancel(self):
+        """ Cancels the request. A search that already started still runs,
+        but its result is thrown away.
+        """
+        self.cancelled = True
+        self.future.cancel()
+
+    def done(self):
+        """ Checks if the request has a result or was cancelled
+
+        Returns:
+            bool: True if the request is finished
+        """
+        return self.cancelled or self.future.done()
+
+    def result(self):
+        """ Gets the path found by the search
+
+        Returns:
+            list: the path, or None if no path was found or the request was cancelled
+        """
+        if self.cancelled or self.future.exception() is not None:
+            return None
+        return self.future.result()
+
+class PathfindingPool:
+    """ Pool of worker threads that run AStar searches off the game loop.
+
+    Enemies submit a request and keep moving on their old path (or randomly)
+    until a later tick picks up the result. Requests are cancelled once the
+    player is more than stale_cells cells away from the goal they were made
+    for, so moving about a little does not throw away searches that are
+    already running. Every search gets its own copy of the barriers, so the
+    game can change them while the workers run.
+
+    Several simulations can share the worker threads through session(), each
+    session only cancelling its own requests.
+    """
+    def __init__(self, workers=Tanks.PATHFINDING_WORKERS, grid_size=Tanks.PATHFINDING_GRID_SIZE, executor=None,
+                 stale_cells=Tanks.PATHFINDING_STALE_CELLS):
+        """ Constructor for the pathfinding pool
+
+        Args:
+            workers (int, optional): Number of worker threads. Defaults to Tanks.PATHFINDING_WORKERS.
+            grid_size (int, optional): Size of the AStar grid cells. Defaults to Tanks.PATHFINDING_GRID_SIZE.
+            executor (ThreadPoolExecutor, optional): Worker threads of another pool to share. Defaults to None.
+            stale_cells (int, optional): Cells the goal can move before a request is cancelled.
+                Defaults to Tanks.PATHFINDING_STALE_CELLS.
+        """
+        self.owns_executor = executor is None
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pathfinding")
+        self.grid_size = grid_size
+        self.stale_cells = stale_cells
+        self.pending = []
+
+    def session(self):
+        """ Creates a pool for one simulation that shares these worker threads
+
+        Returns:
+            PathfindingPool: pool with its own pending requests
+        """
+        return PathfindingPool(grid_size=self.grid_size, executor=self.executor, stale_cells=self.stale_cells)
+
+    def cell(self, position):
+        """ Gets the AStar grid cell of a position
+
+        Args:
+            position: (x, y) position in pixels
+
+        Returns:
+            tuple: the grid cell
+        """
+        return (int(position[0] // self.grid_size), int(position[1] // self.grid_size))
+
+    def request_path(self, start, goal, barrier_list):
+        """ Submits a path search to the worker pool
+
+        Args:
+            start: The position to search from
+            goal: The position to search to
+            barrier_list: The AStar Barrier List of blocking objects
+
+        Returns:
+            PathRequest: handle for the search
+        """
+        # The barriers are copied as they are now, the search never sees them change
+        barriers = copy.copy(barrier_list)
+        barriers.barrier_list = tuple(barrier_list.barrier_list)
+        future = self.executor.submit(arcade.astar_calculate_path, start, goal, barriers, diagonal_movement=False)
+        request = PathRequest(future, self.cell(goal))
+        self.pending.append(request)
+        return request
+
+    def cancel_stale(self, goal):
+        """ Cancels every request whose goal is more than stale_cells cells from the goal's current cell
+
+        Args:
+            goal: The current position of the goal (the player)
+        """
+        goal_x, goal_y = self.cell(goal)
+        for request in self.pending:
+            if max(abs(request.goal_cell[0] - goal_x), abs(request.goal_cell[1] - goal_y)) > self.stale_cells:
+                request.cancel()
+        self.pending = [request for request in self.pending if not request.done()]
+
+    def cancel_all(self):
+        """ Cancels every pending request, e.g. when a new level is loaded
+        """
+        for request in self.pending:
+            request.cancel()
+        self.pending = []
+
+    def shutdown(self):
+        """ Stops the worker threads, or only cancels the requests of a session
+        """
+        self.cancel_all()
+        if self.owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,105 @@
+"""
+quality.py contains the governor that sheds cosmetic work when frames run over budget
+"""
+
+from collections import deque, namedtuple
+import Tanks
+
+# Cosmetic settings of one quality stage.
+#   track_density: fraction of the tracks that are laid
+#   explosion_frame_step: explosion animation frames advanced per update
+#   sound_interval: seconds of game time before the same sound effect can play again
+#   hud_interval: frames between updates of the scoreboard text, which is laid out again on every change
+QualityStage = namedtuple("QualityStage", ["track_density", "explosion_frame_step", "sound_interval", "hud_interval"])
+
+QUALITY_STAGES = [QualityStage(1, 1, 0, 1),
+                  QualityStage(0.5, 1, 0.05, 1),
+                  QualityStage(0.5, 2, 0.1, 15),
+                  QualityStage(0.25, 2, 0.2, 30)]
+
+class QualityGovernor:
+    """ Watches the work done per frame and steps the cosmetic quality down
+    while it is over budget, and back up once there is headroom again.
+
+    Only cosmetic work is affected: how many tracks are laid, how many frames
+    an explosion animation shows, how often a sound effect can repeat and how
+    often the scoreboard text is updated. The simulation itself always runs the same.
+    """
+    def __init__(self, budget=Tanks.FRAME_BUDGET, window=Tanks.QUALITY_WINDOW, stages=QUALITY_STAGES):
+        """ Constructor for the quality governor
+
+        Args:
+            budget (float, optional): seconds of work per frame. Defaults to Tanks.FRAME_BUDGET.
+            window (int, optional): frames averaged before the stage can change. Defaults to Tanks.QUALITY_WINDOW.
+            stages (list, optional): QualityStage for every step, from full quality down. Defaults to QUALITY_STAGES.
+        """
+        self.budget = budget
+        self.stages = stages
+        self.stage = 0
+        self.frame_times = deque(maxlen=window)
+        self.frame = 0
+        self.sounds_played = {}
+
+    @property
+    def settings(self):
+        """ Settings of the current stage
+
+        Returns:
+            QualityStage: the settings
+        """
+        return self.stages[self.stage]
+
+    def record(self, frame_time):
+        """ Records the work done in a frame and changes the stage when needed
+
+        Args:
+            frame_time (float): seconds spent updating and drawing the frame
+        """
+        self.frame += 1
+        self.frame_times.append(frame_time)
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return
+
+        average = sum(self.frame_times) / len(self.frame_times)
+        if average > self.budget * Tanks.QUALITY_DOWNGRADE_RATIO and self.stage < len(self.stages) - 1:
+            self.stage += 1
+        elif average < self.budget * Tanks.QUALITY_RESTORE_RATIO and self.stage > 0:
+            self.stage -= 1
+        else:
+            return
+        # Judge the new stage on its own frames only
+        self.frame_times.clear()
+
+    def track_cooldown(self):
+        """ Time between two tracks of a tank
+
+        Returns:
+            float: seconds until the next track is laid
+        """
+        return Tanks.PLAYER_TRACK_COOLDOWN / self.settings.track_density
+
+    def allow_sound(self, sound, now):
+        """ Checks if a sound effect may play, and counts it as played if so
+
+        Args:
+            sound (arcade.Sound): the sound effect
+            now (float): the simulation clock, so the throttle follows the ticks and not the wall clock
+
+        Returns:
+            bool: False if the same sound played too recently
+        """
+        interval = self.settings.sound_interval
+        played = self.sounds_played.get(sound)
+        # A restored state can set the clock back, the sound then plays again
+        if interval > 0 and played is not None and 0 <= now - played < interval:
+            return False
+        self.sounds_played[sound] = now
+        return True
+
+    def update_hud(self):
+        """ Checks if the scoreboard text should be updated this frame
+
+        Returns:
+            bool: True on the frames the text is updated
+        """
+        return self.frame % self.settings.hud_interval == 0
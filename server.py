@@ -0,0 +1,656 @@
+"""
+server.py contains the authoritative game server for the Tanks Game.
+
+Clients connect over localhost sockets, join a match, send the same inputs the
+TankGame window handles (key presses, mouse motion and clicks) and get back
+per-tick snapshots of the tanks, bullets, mines and destroyed obstacles. Every
+snapshot is delta-compressed against the last state the client acknowledged.
+
+Run it with `python server.py`.
+"""
+
+import argparse
+from collections import deque
+import selectors
+import socket
+import struct
+import time
+import Tanks
+from simulation import TankSimulation
+from pathfinding import PathfindingPool
+from loading import AssetLoader
+
+# Message types
+MSG_JOIN = 1
+MSG_KEY_PRESS = 2
+MSG_KEY_RELEASE = 3
+MSG_MOUSE_MOTION = 4
+MSG_MOUSE_PRESS = 5
+MSG_ACK = 6
+MSG_WELCOME = 10
+MSG_SNAPSHOT = 11
+
+# Every message is prefixed with its length
+HEADER = struct.Struct("<I")
+JOIN = struct.Struct("<BH")
+KEY = struct.Struct("<Bi")
+MOUSE = struct.Struct("<Bhh")
+ACK = struct.Struct("<BI")
+WELCOME = struct.Struct("<BHI")
+SNAPSHOT_HEADER = struct.Struct("<BII")
+STATUS = struct.Struct("<BBHB")
+COUNT = struct.Struct("<H")
+ENTITY_ID = struct.Struct("<I")
+
+# Layout of every message a client can send. Anything else, or of another length, drops the client
+CLIENT_MESSAGES = {MSG_JOIN: JOIN, MSG_KEY_PRESS: KEY, MSG_KEY_RELEASE: KEY,
+                   MSG_MOUSE_MOTION: MOUSE, MSG_MOUSE_PRESS: MOUSE, MSG_ACK: ACK}
+MAX_CLIENT_MESSAGE = max(record.size for record in CLIENT_MESSAGES.values())
+
+# Base tick used for snapshots that are not a delta
+FULL_SNAPSHOT = 0xFFFFFFFF
+
+# Entity sections of a snapshot, in wire order, with the packed fields of each record
+TANKS = 0
+BULLETS = 1
+MINES = 2
+DESTROYED_OBSTACLES = 3
+SECTIONS = [struct.Struct("<Ihhhbb"),  # id, x, y, turret angle, direction, kind
+            struct.Struct("<Ihhh"),    # id, x, y, angle
+            struct.Struct("<Ihh"),     # id, x, y
+            struct.Struct("<I")]       # level * OBSTACLE_ID_LEVEL_STRIDE + obstacle id
+
+# Positions are sent in quarter pixels and angles in tenths of a degree
+POSITION_SCALE = 4
+ANGLE_SCALE = 10
+OBSTACLE_ID_LEVEL_STRIDE = 4096
+
+# Tank kinds
+KIND_PLAYER = 0
+KIND_ENEMY = {Tanks.Difficulty.EASY: 1, Tanks.Difficulty.MEDIUM: 2, Tanks.Difficulty.HARD: 3}
+
+def quantize_position(value):
+    """ Packs a pixel coordinate into an int16
+
+    Args:
+        value (float): the coordinate in pixels
+
+    Returns:
+        int: the coordinate in quarter pixels
+    """
+    return max(-32768, min(32767, round(value * POSITION_SCALE)))
+
+def quantize_angle(value):
+    """ Packs an angle into an int16
+
+    Args:
+        value (float): the angle in degrees
+
+    Returns:
+        int: the angle in tenths of a degree, between 0 and 3600
+    """
+    return round((value % 360) * ANGLE_SCALE) % (360 * ANGLE_SCALE)
+
+def direction_value(direction):
+    """ Gets the wire value of a tank direction
+
+    Args:
+        direction: a Tanks.Direction, or 0 if the tank has not moved yet
+
+    Returns:
+        int: the direction value
+    """
+    if isinstance(direction, Tanks.Direction):
+        return direction.value
+    return -1
+
+def capture_snapshot(simulation):
+    """ Captures the state of a simulation that is sent to the clients
+
+    Args:
+        simulation (TankSimulation): the simulation to capture
+
+    Returns:
+        tuple: (status, sections) where status is a tuple of ints and sections is a list
+            with one dict per entity section, mapping entity id to its packed fields
+    """
+    flags = (simulation.round_over << 0) | (simulation.round_lost << 1) | \
+            (simulation.game_over << 2) | (simulation.game_lost << 3)
+    status = (simulation.level_num, max(simulation.player_lives, 0), simulation.tanks_destroyed, flags)
+
+    tanks = {}
+    player = simulation.player_sprite
+    if player is not None and player in simulation.player_list:
+        tanks[player.entity_id] = (quantize_position(player.center_x), quantize_position(player.center_y),
+                                   quantize_angle(player.turret.angle), direction_value(simulation.direction), KIND_PLAYER)
+    for enemy in simulation.enemy_list:
+        tanks[enemy.entity_id] = (quantize_position(enemy.center_x), quantize_position(enemy.center_y),
+                                  quantize_angle(enemy.turret.angle), direction_value(enemy.direction), KIND_ENEMY[enemy.difficulty])
+
+    bullets = {bullet.entity_id: (quantize_position(bullet.center_x), quantize_position(bullet.center_y), quantize_angle(bullet.angle))
+               for bullet in simulation.bullet_list}
+    mines = {mine.entity_id: (quantize_position(mine.center_x), quantize_position(mine.center_y))
+             for mine in simulation.mine_list}
+
+    # Obstacles are static, so only the destroyed ones are sent
+    remaining = {obstacle.obstacle_id for obstacle in simulation.breakable_obstacle_list}
+    remaining.update(obstacle.obstacle_id for obstacle in simulation.explodables_list)
+    level_base = simulation.level_num * OBSTACLE_ID_LEVEL_STRIDE
+    destroyed = {level_base + obstacle_id: () for obstacle_id in range(simulation.obstacle_count) if obstacle_id not in remaining}
+
+    return status, [tanks, bullets, mines, destroyed]
+
+def encode_snapshot(tick, snapshot, base_tick=FULL_SNAPSHOT, base=None):
+    """ Packs a snapshot, as a delta against a base snapshot if one is given
+
+    Args:
+        tick (int): the tick of the snapshot
+        snapshot (tuple): snapshot from capture_snapshot
+        base_tick (int, optional): the tick of the base snapshot. Defaults to FULL_SNAPSHOT.
+        base (tuple, optional): snapshot the client already has. Defaults to None.
+
+    Returns:
+        bytes: the packed message
+    """
+    status, sections = snapshot
+    parts = [SNAPSHOT_HEADER.pack(MSG_SNAPSHOT, tick, base_tick if base is not None else FULL_SNAPSHOT),
+             STATUS.pack(*status)]
+
+    for section, entities in enumerate(sections):
+        record = SECTIONS[section]
+        base_entities = base[1][section] if base is not None else {}
+
+        # Entities that are new or changed since the base
+        changed = [(entity_id, fields) for entity_id, fields in entities.items() if base_entities.get(entity_id) != fields]
+        parts.append(COUNT.pack(len(changed)))
+        parts.extend(record.pack(entity_id, *fields) for entity_id, fields in changed)
+
+        # Entities that are gone since the base
+        removed = [entity_id for entity_id in base_entities if entity_id not in entities]
+        parts.append(COUNT.pack(len(removed)))
+        parts.extend(ENTITY_ID.pack(entity_id) for entity_id in removed)
+
+    return b"".join(parts)
+
+def decode_snapshot(data, base=None):
+    """ Unpacks a snapshot message and applies it to its base snapshot
+
+    Args:
+        data (bytes): the packed message
+        base (tuple, optional): the snapshot the delta was made against. Defaults to None.
+
+    Returns:
+        tuple: (tick, base_tick, snapshot)
+    """
+    _, tick, base_tick = SNAPSHOT_HEADER.unpack_from(data, 0)
+    offset = SNAPSHOT_HEADER.size
+    status = STATUS.unpack_from(data, offset)
+    offset += STATUS.size
+
+    sections = []
+    for section, record in enumerate(SECTIONS):
+        entities = dict(base[1][section]) if base_tick != FULL_SNAPSHOT else {}
+
+        (count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        for _ in range(count):
+            entity_id, *fields = record.unpack_from(data, offset)
+            entities[entity_id] = tuple(fields)
+            offset += record.size
+
+        (count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        for _ in range(count):
+            (entity_id,) = ENTITY_ID.unpack_from(data, offset)
+            entities.pop(entity_id, None)
+            offset += ENTITY_ID.size
+
+        sections.append(entities)
+
+    return tick, base_tick, (status, sections)
+
+def frame(message):
+    """ Prefixes a message with its length
+
+    Args:
+        message (bytes): the message
+
+    Returns:
+        bytes: the framed message
+    """
+    return HEADER.pack(len(message)) + message
+
+def read_frames(buffer, max_length=None):
+    """ Splits all complete messages off the front of a receive buffer
+
+    Args:
+        buffer (bytearray): received bytes, consumed messages are removed from it
+        max_length (int, optional): longest message allowed. Defaults to None, any length.
+
+    Raises:
+        ValueError: if a message is longer than max_length
+
+    Returns:
+        list: the complete messages
+    """
+    messages = []
+    while len(buffer) >= HEADER.size:
+        (length,) = HEADER.unpack_from(buffer, 0)
+        if max_length is not None and length > max_length:
+            raise ValueError(f"Message of {length} bytes is longer than {max_length}")
+        if len(buffer) < HEADER.size + length:
+            break
+        messages.append(bytes(buffer[HEADER.size:HEADER.size + length]))
+        del buffer[:HEADER.size + length]
+    return messages
+
+def valid_client_message(message):
+    """ Checks that a message from a client has a known type and the length of that type
+
+    Args:
+        message (bytes): the message
+
+    Returns:
+        bool: True if the message can be unpacked
+    """
+    return len(message) > 0 and message[0] in CLIENT_MESSAGES and len(message) == CLIENT_MESSAGES[message[0]].size
+
+class Match:
+    """ One authoritative game running on the server
+    """
+    def __init__(self, match_id, path_pool, loader=None):
+        """ Constructor for a match
+
+        Args:
+            match_id (int): id clients use to join the match
+            path_pool (PathfindingPool): Worker pool shared by all matches, each match gets its own session
+            loader (AssetLoader, optional): Texture cache shared by all matches. Defaults to a new loader.
+        """
+        self.match_id = match_id
+        self.simulation = TankSimulation(path_pool.session(), loader)
+        self.simulation.setup()
+        self.clients = []
+        self.inputs = []
+        self.tick = 0
+        self.history = {}
+        self.encoded = {}
+
+    def step(self, delta_time):
+        """ Applies the queued inputs and advances the match by one tick
+
+        Args:
+            delta_time (float): time passed since last tick
+        """
+        for message in self.inputs:
+            self.apply_input(message)
+        self.inputs = []
+
+        self.simulation.update_simulation(delta_time)
+
+        self.tick += 1
+        self.history[self.tick] = capture_snapshot(self.simulation)
+        self.history.pop(self.tick - Tanks.SERVER_SNAPSHOT_HISTORY, None)
+        self.encoded = {}
+
+    def apply_input(self, message):
+        """ Feeds one client input message to the simulation
+
+        Args:
+            message (bytes): the input message
+        """
+        simulation = self.simulation
+        if message[0] == MSG_KEY_PRESS:
+            simulation.key_press(KEY.unpack(message)[1])
+        elif message[0] == MSG_KEY_RELEASE:
+            simulation.key_release(KEY.unpack(message)[1])
+        elif message[0] == MSG_MOUSE_MOTION:
+            simulation.mouse_motion(*MOUSE.unpack(message)[1:])
+        elif message[0] == MSG_MOUSE_PRESS:
+            simulation.mouse_press(*MOUSE.unpack(message)[1:])
+
+    def snapshot_for(self, acked_tick):
+        """ Gets the packed snapshot for a client. Clients that acknowledged the
+        same tick share one encoding.
+
+        Args:
+            acked_tick (int): the last tick the client acknowledged, or None
+
+        Returns:
+            bytes: the packed snapshot
+        """
+        if acked_tick not in self.history:
+            acked_tick = None
+        if acked_tick not in self.encoded:
+            base = self.history[acked_tick] if acked_tick is not None else None
+            self.encoded[acked_tick] = frame(encode_snapshot(self.tick, self.history[self.tick],
+                                                             acked_tick if acked_tick is not None else FULL_SNAPSHOT, base))
+        return self.encoded[acked_tick]
+
+class ClientConnection:
+    """ Server side state for one connected client
+    """
+    def __init__(self, sock):
+        """ Constructor for a client connection
+
+        Args:
+            sock (socket.socket): the client's socket
+        """
+        self.sock = sock
+        self.match = None
+        self.acked_tick = None
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        # Length of every frame in the outbox, and how much of the first one was sent
+        self.frame_lengths = deque()
+        self.head_sent = 0
+
+    def queue(self, data):
+        """ Queues a framed message to be sent
+
+        Args:
+            data (bytes): the framed message
+        """
+        self.outbox.extend(data)
+        self.frame_lengths.append(len(data))
+
+    def drop_backlog(self):
+        """ Drops the queued frames, except the rest of a frame that was partly sent
+        """
+        if self.head_sent > 0:
+            del self.outbox[self.frame_lengths[0] - self.head_sent:]
+            self.frame_lengths = deque([self.frame_lengths[0]])
+        else:
+            self.outbox.clear()
+            self.frame_lengths.clear()
+
+    def flush(self):
+        """ Sends as much of the pending output as the socket will take
+
+        Returns:
+            bool: False if the connection is broken
+        """
+        if self.outbox:
+            try:
+                sent = self.sock.send(self.outbox)
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError:
+                # Reset by the peer or a broken pipe
+                return False
+            del self.outbox[:sent]
+            self.head_sent += sent
+            while self.frame_lengths and self.head_sent >= self.frame_lengths[0]:
+                self.head_sent -= self.frame_lengths.popleft()
+        return True
+
+class TankServer:
+    """ Authoritative server that hosts several matches in one process
+    """
+    def __init__(self, host="127.0.0.1", port=Tanks.SERVER_PORT, max_matches=Tanks.SERVER_MAX_MATCHES,
+                 tick_rate=Tanks.SERVER_TICK_RATE):
+        """ Constructor for the server
+
+        Args:
+            host (str, optional): address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): port to listen on. Defaults to Tanks.SERVER_PORT.
+            max_matches (int, optional): most matches hosted at once. Defaults to Tanks.SERVER_MAX_MATCHES.
+            tick_rate (int, optional): simulation ticks per second. Defaults to Tanks.SERVER_TICK_RATE.
+        """
+        self.max_matches = max_matches
+        self.tick_rate = tick_rate
+        self.selector = selectors.DefaultSelector()
+        self.listener = socket.create_server((host, port))
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.path_pool = PathfindingPool()
+        self.loader = AssetLoader()
+        self.matches = {}
+        self.clients = {}
+        self.running = False
+
+    def serve_forever(self):
+        """ Runs the network loop and ticks the matches at a fixed rate
+        """
+        self.running = True
+        tick_length = 1 / self.tick_rate
+        next_tick = time.perf_counter()
+        try:
+            while self.running:
+                timeout = max(0, next_tick - time.perf_counter())
+                for key, _ in self.selector.select(timeout):
+                    if key.fileobj is self.listener:
+                        self.accept()
+                    else:
+                        self.receive(self.clients[key.fileobj])
+
+                if time.perf_counter() >= next_tick:
+                    self.tick(tick_length)
+                    next_tick += tick_length
+        finally:
+            self.close()
+
+    def accept(self):
+        """ Accepts a new client connection
+        """
+        sock, _ = self.listener.accept()
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.clients[sock] = ClientConnection(sock)
+        self.selector.register(sock, selectors.EVENT_READ)
+
+    def receive(self, client):
+        """ Reads and handles the messages a client sent
+
+        Args:
+            client (ClientConnection): the client to read from
+        """
+        try:
+            data = client.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.disconnect(client)
+            return
+
+        client.inbox.extend(data)
+        try:
+            messages = read_frames(client.inbox, MAX_CLIENT_MESSAGE)
+        except ValueError:
+            # No client message is that long, don't buffer it
+            self.disconnect(client)
+            return
+
+        for message in messages:
+            # A broken or hostile client only drops itself, and never reaches the matches
+            if not valid_client_message(message):
+                self.disconnect(client)
+                return
+            if message[0] == MSG_JOIN:
+                self.join(client, JOIN.unpack(message)[1])
+                if client.sock not in self.clients:
+                    # The server was full and dropped the client
+                    return
+            elif message[0] == MSG_ACK:
+                client.acked_tick = ACK.unpack(message)[1]
+            elif client.match is not None:
+                client.match.inputs.append(message)
+
+    def join(self, client, match_id):
+        """ Adds a client to a match, creating the match if needed
+
+        Args:
+            client (ClientConnection): the client joining
+            match_id (int): the match to join
+        """
+        if client.match is not None and client.match.match_id != match_id:
+            # Only one match at a time, the previous one stops sending updates
+            self.leave(client)
+
+        if match_id not in self.matches:
+            if len(self.matches) >= self.max_matches:
+                self.disconnect(client)
+                return
+            self.matches[match_id] = Match(match_id, self.path_pool, self.loader)
+
+        match = self.matches[match_id]
+        if client.match is not match:
+            match.clients.append(client)
+            client.match = match
+        client.acked_tick = None
+        client.drop_backlog()
+        client.queue(frame(WELCOME.pack(MSG_WELCOME, match_id, match.tick)))
+
+    def disconnect(self, client):
+        """ Drops a client, and its match once no clients are left
+
+        Args:
+            client (ClientConnection): the client to drop
+        """
+        self.selector.unregister(client.sock)
+        client.sock.close()
+        del self.clients[client.sock]
+        self.leave(client)
+
+    def leave(self, client):
+        """ Takes a client out of its match, and drops the match once no clients are left
+
+        Args:
+            client (ClientConnection): the client leaving
+        """
+        if client.match is not None:
+            client.match.clients.remove(client)
+            if len(client.match.clients) == 0:
+                del self.matches[client.match.match_id]
+            client.match = None
+
+    def tick(self, delta_time):
+        """ Advances every match and sends the new snapshots
+
+        Args:
+            delta_time (float): time passed since last tick
+        """
+        for match in self.matches.values():
+            match.step(delta_time)
+            for client in match.clients:
+                if len(client.outbox) > Tanks.SERVER_MAX_OUTBOX:
+                    # The client fell behind, skip what it has not read and send it everything again
+                    client.drop_backlog()
+                    client.acked_tick = None
+                client.queue(match.snapshot_for(client.acked_tick))
+
+        # One broken connection only drops that client
+        for client in list(self.clients.values()):
+            if not client.flush():
+                self.disconnect(client)
+
+    def close(self):
+        """ Closes all sockets and stops the worker threads
+        """
+        for client in list(self.clients.values()):
+            self.disconnect(client)
+        self.selector.unregister(self.listener)
+        self.listener.close()
+        self.path_pool.shutdown()
+
+class TankClient:
+    """ Minimal client for the game server. Sends inputs and keeps the
+    latest snapshot up to date.
+    """
+    def __init__(self, host="127.0.0.1", port=Tanks.SERVER_PORT, match_id=0):
+        """ Constructor for the client, connects and joins a match
+
+        Args:
+            host (str, optional): address of the server. Defaults to "127.0.0.1".
+            port (int, optional): port of the server. Defaults to Tanks.SERVER_PORT.
+            match_id (int, optional): the match to join. Defaults to 0.
+        """
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setblocking(False)
+        self.inbox = bytearray()
+        self.snapshots = {}
+        self.tick = None
+        self.snapshot = None
+        self.send(JOIN.pack(MSG_JOIN, match_id))
+
+    def send(self, message):
+        """ Sends a message to the server
+
+        Args:
+            message (bytes): the message
+        """
+        self.sock.setblocking(True)
+        self.sock.sendall(frame(message))
+        self.sock.setblocking(False)
+
+    def key_press(self, key):
+        """ Sends a key press, same as TankGame.on_key_press """
+        self.send(KEY.pack(MSG_KEY_PRESS, key))
+
+    def key_release(self, key):
+        """ Sends a key release, same as TankGame.on_key_release """
+        self.send(KEY.pack(MSG_KEY_RELEASE, key))
+
+    def mouse_motion(self, x, y):
+        """ Sends the aim position, same as TankGame.on_mouse_motion """
+        self.send(MOUSE.pack(MSG_MOUSE_MOTION, int(x), int(y)))
+
+    def mouse_press(self, x, y):
+        """ Fires at a target, same as TankGame.on_mouse_press """
+        self.send(MOUSE.pack(MSG_MOUSE_PRESS, int(x), int(y)))
+
+    def poll(self):
+        """ Applies every snapshot that has arrived and acknowledges the newest one
+
+        Returns:
+            tuple: the latest snapshot, or None if none has arrived yet
+        """
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                self.inbox.extend(data)
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        for message in read_frames(self.inbox):
+            if message[0] != MSG_SNAPSHOT:
+                continue
+            _, _, base_tick = SNAPSHOT_HEADER.unpack_from(message, 0)
+            tick, _, snapshot = decode_snapshot(message, self.snapshots.get(base_tick))
+            self.snapshots[tick] = snapshot
+            for old_tick in [old_tick for old_tick in self.snapshots if old_tick <= tick - Tanks.SERVER_SNAPSHOT_HISTORY]:
+                del self.snapshots[old_tick]
+            self.tick = tick
+            self.snapshot = snapshot
+
+        if self.tick is not None:
+            self.send(ACK.pack(MSG_ACK, self.tick))
+        return self.snapshot
+
+    def close(self):
+        """ Disconnects from the server
+        """
+        self.sock.close()
+
+def main():
+    """
+    Main method. Starts the game server.
+    """
+    parser = argparse.ArgumentParser(description="Authoritative server for the Tanks Game")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=Tanks.SERVER_PORT)
+    parser.add_argument("--matches", type=int, default=Tanks.SERVER_MAX_MATCHES)
+    args = parser.parse_args()
+
+    server = TankServer(args.host, args.port, args.matches)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+simthread.py contains the thread that runs the simulation at a fixed tick rate, and the
+renderer that draws the snapshots it publishes
+"""
+
+from collections import deque, namedtuple
+import threading
+import time
+import arcade
+import Tanks
+
+# Sprite lists of the simulation that are drawn, from the bottom up
+LAYERS = ["tracks_list", "exploded_tank_list", "mine_list", "enemy_list", "enemy_turret_list", "bullet_list",
+          "player_list", "obstacle_list", "explodables_list", "breakable_obstacle_list", "explosions_list"]
+
+# Lazy sprite lists of the simulation that sprites are taken out of during a level
+COMPACTED = ["bullet_list", "mine_list", "explosions_list", "enemy_list", "enemy_turret_list", "player_list"]
+
+# State of the drawn sprites after a tick.
+#   tick: number of the tick
+#   time: perf_counter time the snapshot was published at
+#   layers: for every name in LAYERS, a dict from each simulation sprite to its
+#       (x, y, angle, texture, scale, alpha). Never changed once published.
+RenderSnapshot = namedtuple("RenderSnapshot", ["tick", "time", "layers"])
+
+def capture(simulation, tick):
+    """ Copies what is needed to draw the simulation's sprites
+
+    Args:
+        simulation (TankSimulation): the simulation
+        tick (int): number of the tick
+
+    Returns:
+        RenderSnapshot: the snapshot, with time set to when it was captured
+    """
+    layers = {}
+    for name in LAYERS:
+        sprite_list = getattr(simulation, name)
+        layers[name] = {sprite: (sprite.center_x, sprite.center_y, sprite.angle, sprite.texture, sprite.scale, sprite.alpha)
+                        for sprite in sprite_list}
+    return RenderSnapshot(tick, time.perf_counter(), layers)
+
+def compact(simulation):
+    """ Rebuilds the simulation's lazy sprite lists with only the sprites that are in them.
+
+    Lazy lists remember every sprite added or retextured, to upload its texture on
+    their first draw. The simulation's lists are never drawn, so the sprites taken
+    out of them would be kept forever. Clearing a list forgets them.
+
+    Args:
+        simulation (TankSimulation): the simulation
+    """
+    for name in COMPACTED:
+        sprite_list = getattr(simulation, name)
+        sprites = list(sprite_list)
+        sprite_list.clear()
+        sprite_list.extend(sprites)
+
+class SimulationThread:
+    """ Runs a simulation on its own thread at a fixed tick rate.
+
+    After every tick a RenderSnapshot of the sprites is published. The two
+    latest are kept, and the window draws in between them, so drawing never
+    waits on a tick and a slow frame never slows the simulation down.
+
+    The simulation's sprite lists must be lazy, as OpenGL can only be used from
+    the window's thread. Anything else that changes the simulation, like input
+    or loading a level, has to hold the lock.
+    """
+    def __init__(self, simulation, tick_rate=Tanks.SIMULATION_TICK_RATE):
+        """ Constructor for the simulation thread
+
+        Args:
+            simulation (TankSimulation): the simulation to run
+            tick_rate (int, optional): ticks per second. Defaults to Tanks.SIMULATION_TICK_RATE.
+        """
+        self.simulation = simulation
+        self.tick_time = 1 / tick_rate
+        self.lock = threading.RLock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.tick = 0
+        self.error = None
+        self.last_tick_start = None
+        snapshot = capture(simulation, 0)
+        self.buffers = (snapshot, snapshot)
+
+    def start(self):
+        """ Starts running the simulation
+        """
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """ Stops running the simulation, after the tick in progress
+        """
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        """ Thread loop. Runs a tick every tick_time seconds until stopped
+        """
+        next_tick = time.perf_counter()
+        while not self.stopping.is_set():
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                self.stopping.wait(delay)
+                continue
+            try:
+                self.step()
+            except Exception as error:
+                # Raised again on the window's thread by check()
+                self.error = error
+                return
+            next_tick += self.tick_time
+
+            # Drop the ticks that are too far behind instead of running them in a burst
+            if time.perf_counter() - next_tick > Tanks.SIMULATION_MAX_LAG * self.tick_time:
+                next_tick = time.perf_counter()
+
+    def step(self):
+        """ Runs one tick and publishes its snapshot
+        """
+        simulation = self.simulation
+        with self.lock:
+            update_start = time.perf_counter()
+            # The simulation always advances by a whole tick, the frame times get how long it really took
+            interval = update_start - self.last_tick_start if self.last_tick_start is not None else self.tick_time
+            self.last_tick_start = update_start
+            simulation.update_simulation(self.tick_time, interval)
+            self.tick += 1
+            if self.tick % Tanks.SIMULATION_COMPACT_TICKS == 0:
+                compact(simulation)
+            snapshot = capture(simulation, self.tick)
+
+        # Swapping the tuple publishes both buffers at once
+        self.buffers = (self.buffers[1], snapshot)
+
+    def interpolation(self):
+        """ Gets the two latest snapshots and how far to draw in between them
+
+        Returns:
+            tuple: (previous RenderSnapshot, current RenderSnapshot, fraction between 0 and 1)
+        """
+        previous, current = self.buffers
+        blend = (time.perf_counter() - current.time) / self.tick_time
+        return previous, current, min(max(blend, 0), 1)
+
+    def check(self):
+        """ Raises the error the simulation failed with, if it did
+        """
+        if self.error is not None:
+            raise self.error
+
+class SnapshotRenderer:
+    """ Draws RenderSnapshots with sprites of its own.
+
+    Every simulation sprite in a snapshot has a copy in the renderer's sprite
+    list for its layer. Copies are moved in between their previous and current
+    positions, made when a sprite appears and removed when it disappears.
+    """
+    def __init__(self, layers=LAYERS):
+        """ Constructor for the snapshot renderer
+
+        Args:
+            layers (list, optional): names of the layers, from the bottom up. Defaults to LAYERS.
+        """
+        self.layers = layers
+        self.sprite_lists = {name: arcade.SpriteList() for name in layers}
+        self.copies = {name: {} for name in layers}
+
+    def draw(self, previous, current, blend):
+        """ Draws the sprites in between two snapshots
+
+        Args:
+            previous (RenderSnapshot): the older snapshot
+            current (RenderSnapshot): the newer snapshot
+            blend (float): 0 draws the previous snapshot, 1 the current one
+        """
+        for name in self.layers:
+            self.sync(name, previous.layers[name], current.layers[name], blend)
+            self.sprite_lists[name].draw()
+
+    def sync(self, name, previous, current, blend):
+        """ Moves the copies of one layer in between two snapshots
+
+        Args:
+            name (str): name of the layer
+            previous (dict): the layer in the older snapshot
+            current (dict): the layer in the newer snapshot
+            blend (float): 0 for the previous positions, 1 for the current ones
+        """
+        copies = self.copies[name]
+        for sprite in [sprite for sprite in copies if sprite not in current]:
+            copies.pop(sprite).remove_from_sprite_lists()
+
+        for sprite, (x, y, angle, texture, scale, alpha) in current.items():
+            copy = copies.get(sprite)
+            if copy is None:
+                copy = arcade.Sprite(texture=texture, scale=scale)
+                self.sprite_lists[name].append(copy)
+                copies[sprite] = copy
+
+            # Sprites that just appeared are drawn where they are
+            before = previous.get(sprite)
+            if before is not None:
+                x = before[0] + (x - before[0]) * blend
+                y = before[1] + (y - before[1]) * blend
+                angle = before[2] + ((angle - before[2] + 180) % 360 - 180) * blend
+
+            # Only what changed is written, so still sprites cost a few comparisons
+            if copy.texture is not texture:
+                copy.texture = texture
+            if copy.scale != scale:
+                copy.scale = scale
+            if copy.alpha != alpha:
+                copy.alpha = alpha
+            if copy.position != (x, y):
+                copy.position = (x, y)
+            if copy.angle != angle:
+                copy.angle = angle
+
+class QueuedSound:
+    """ Sound effect played through a SoundQueue
+    """
+    def __init__(self, sound, volume):
+        """ Constructor for a queued sound
+
+        Args:
+            sound (arcade.Sound): the sound to play
+            volume (float): volume to play the sound at
+        """
+        self.sound = sound
+        self.volume = volume
+        # Media player of the sound once it has started
+        self.player = None
+
+class SoundQueue:
+    """ Sounds to start and stop on the window's thread.
+
+    pyglet schedules its media players on the window's clock, so sounds
+    played by the simulation thread are queued and started by flush().
+    """
+    def __init__(self):
+        """ Constructor for the sound queue
+        """
+        self.requests = deque()
+
+    def play(self, sound, volume):
+        """ Queues a sound to play
+
+        Args:
+            sound (arcade.Sound): the sound to play
+            volume (float): volume to play the sound at
+
+        Returns:
+            QueuedSound: the sound, which can be given to stop()
+        """
+        queued = QueuedSound(sound, volume)
+        self.requests.append((True, queued))
+        return queued
+
+    def stop(self, player):
+        """ Queues a sound to stop
+
+        Args:
+            player: a QueuedSound, or the media player of a sound started elsewhere
+        """
+        self.requests.append((False, player))
+
+    def flush(self):
+        """ Starts and stops the queued sounds. Called from the window's thread
+        """
+        while self.requests:
+            play, request = self.requests.popleft()
+            if play:
+                request.player = arcade.play_sound(request.sound, volume=request.volume)
+                continue
+            player = request.player if isinstance(request, QueuedSound) else request
+            if player is not None:
+                arcade.stop_sound(player)
@@ -0,0 +1,836 @@
+"""
+simulation.py contains the window independent game state and rules for the Tanks Game.
+The TankGame window and the game server both run on top of it.
+"""
+
+import arcade
+import Tanks
+import math
+import numpy as np
+from ai import AIScheduler
+from pathfinding import PathfindingPool
+from state import GameState
+from tilegrid import TileGrid
+from bullets import BulletEngine
+from bankshots import BankShotIndex
+from dangermap import DangerMap
+from explosions import ExplosionResolver
+from loading import AssetLoader
+from quality import QualityGovernor
+from telemetry import Telemetry
+from timers import Timer, TimerHeap
+
+class TankSimulation:
+    """
+    Game state and rules for one match. Contains all sprites and the update
+    functions, but no drawing, so it can run without a window.
+    """
+
+    def __init__(self, path_pool=None, loader=None, telemetry=None):
+        """Constructor for TankSimulation class
+
+        Args:
+            path_pool (PathfindingPool, optional): Worker pool for the enemies' AStar searches.
+                Defaults to a new pool owned by this simulation.
+            loader (AssetLoader, optional): Cache the textures are loaded through.
+                Defaults to a new loader that loads on first use.
+            telemetry (Telemetry, optional): Stream the gameplay events are emitted to.
+                Defaults to a new stream that keeps them in memory.
+        """
+        # Initialize sprite lists
+        self.player_list = None
+        self.bullet_list = None
+        self.enemy_list = None
+        self.enemy_turret_list = None
+        self.obstacle_list = None
+        self.exploded_tank_list = None
+        self.mine_list = None
+        self.tracks_list = None
+        self.all_obstacles = None
+
+        # Initialize instance variables
+        self.tanks_destroyed = 0
+        self.timers = TimerHeap()
+        self.end_level_timer = Timer(self.timers, self.end_level, Tanks.END_LEVEL_TIME)
+        self.transition_time = 2
+        self.physics_engine = None
+        self.explosion_texture_list = []
+        self.astar_barrier_list = None
+        self.ai_scheduler = None
+        self.path_pool = path_pool if path_pool is not None else PathfindingPool()
+        self.loader = loader if loader is not None else AssetLoader()
+        self.quality = QualityGovernor()
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        self.frame_times = []
+        self.memory_diagnostics = None
+        self.survival = None
+        self.next_entity_id = 1
+        self.obstacle_count = 0
+        self.state = GameState(self)
+        self.tile_grid = None
+        self.bullet_engine = None
+        self.bank_shots = None
+        self.danger_map = None
+        self.bullet_hits = []
+        self.explosion_resolver = None
+
+        # Lazy sprite lists make no OpenGL calls until they are drawn, so the
+        # simulation can run on a thread of its own while the window draws copies
+        self.lazy_sprite_lists = False
+
+        # status variables
+        self.game_lost = False
+        self.game_over = False
+        self.round_over = False
+        self.round_lost = False
+        self.level_num = 1
+        self.level_num_max = 10
+        self.player_lives = 3
+        self.max_player_lives = 5
+
+        # Keypress tracking variables
+        self.left_pressed: bool = False
+        self.right_pressed: bool = False
+        self.up_pressed: bool = False
+        self.down_pressed: bool = False
+        self.direction = 0
+
+        self.player_texture_list = []
+
+        self.total_moves = 0
+        self.player_sprite = None
+
+        # Sounds are only loaded by the window, the simulation stays silent without them
+        self.player = None
+        self.shoot2 = None
+        self.explode1 = None
+        self.move = None
+        self.round_start = None
+        self.round_win = None
+        self.round_fail = None
+        self.results = None
+        self.music = None
+
+    @property
+    def end_level_time(self):
+        """ Seconds left of the transition to the next level, Tanks.END_LEVEL_TIME before it starts
+        """
+        return self.end_level_timer.remaining()
+
+    @end_level_time.setter
+    def end_level_time(self, value):
+        if value >= Tanks.END_LEVEL_TIME:
+            self.end_level_timer.stop()
+            self.end_level_timer.left = Tanks.END_LEVEL_TIME
+        else:
+            self.end_level_timer.set(value)
+
+    def new_entity_id(self):
+        """ Hands out a unique id for a tank, bullet or mine
+
+        Returns:
+            int: the entity id
+        """
+        entity_id = self.next_entity_id
+        self.next_entity_id += 1
+        return entity_id
+
+    def play_sound(self, sound, volume):
+        """ Plays a sound effect if sounds have been loaded
+
+        Args:
+            sound (arcade.Sound): the sound to play, or None when running silent
+            volume (float): volume to play the sound at
+
+        Returns:
+            the media player for the sound, or None when running silent or throttled
+        """
+        if sound is None or not self.quality.allow_sound(sound, self.timers.now):
+            return None
+        return arcade.play_sound(sound, volume=volume)
+
+    def stop_sound(self, player):
+        """ Stops a sound started by play_sound
+
+        Args:
+            player: the media player returned by play_sound
+        """
+        if player is not None:
+            arcade.stop_sound(player)
+
+    def new_sprite_list(self):
+        """ Creates a sprite list for the simulation's sprites
+
+        Returns:
+            arcade.SpriteList: the sprite list, lazy if lazy_sprite_lists is set
+        """
+        return arcade.SpriteList(lazy=self.lazy_sprite_lists)
+
+    def setup(self):
+        """
+        Initialize sprite lists, load next tilemap, and place the sprites on the screen.
+        """
+        # Load the explosions from the sprite sheet, cached by the loader after the first level
+        self.explosion_texture_list = self.loader.spritesheet(file_name="assets/explosions_sheet.png", sprite_width=130, sprite_height=130, columns=5, count=5)
+        self.player_texture_list = [self.loader.texture(f"assets/tankBody_blue{i}.png") for i in range(4)]
+
+        # The cooldowns of the previous level's sprites never fire
+        self.timers.clear()
+
+        # Load the sprites for the level
+        self.bullet_list = self.new_sprite_list()
+        self.enemy_list = self.new_sprite_list()
+        self.enemy_turret_list = self.new_sprite_list()
+        self.player_list = self.new_sprite_list()
+        self.explosions_list = self.new_sprite_list()
+        self.obstacle_list = self.new_sprite_list()
+        self.breakable_obstacle_list = self.new_sprite_list()
+        self.explodables_list = self.new_sprite_list()
+        self.exploded_tank_list = self.new_sprite_list()
+        self.mine_list = self.new_sprite_list()
+        self.tracks_list = self.new_sprite_list()
+        self.all_obstacles = self.new_sprite_list()
+
+        # Load level from the tilemap
+        layer_options = {"Obstacles" : {"use_spatial_hash": True},
+                        "Breakable Obstacles" : {"use_spatial_hash": True},
+                        "Explodables" : {"use_spatial_hash": True},
+                        "Easy Enemies" : {"use_spatial_hash": True},
+                        "Medium Enemies" : {"use_spatial_hash": True},
+                        "Hard Enemies" : {"use_spatial_hash": True}}
+
+        tile_map = arcade.load_tilemap(f"maps/level{self.level_num}.tmx", layer_options=layer_options, hit_box_algorithm="None")
+
+        # Load data from tilemap layers
+        self.obstacle_list = tile_map.sprite_lists["Obstacles"]
+        self.breakable_obstacle_list = tile_map.sprite_lists["Breakable Obstacles"]
+        self.explodables_list = tile_map.sprite_lists["Explodables"]
+        easy_enemy_tiles = tile_map.sprite_lists["Easy Enemies"]
+        medium_enemy_tiles = tile_map.sprite_lists["Medium Enemies"]
+        hard_enemy_tiles = tile_map.sprite_lists["Hard Enemies"]
+        player_tile = tile_map.sprite_lists["Player"][0]
+
+        # Bullets fly through the tile grid instead of the physics engine
+        self.tile_grid = TileGrid(self.obstacle_list, self.breakable_obstacle_list, self.explodables_list)
+        self.bullet_engine = BulletEngine(self.tile_grid)
+        self.bullet_hits = []
+
+        # Hard tanks look up their bank shots, traced in the background over the first frames
+        if len(hard_enemy_tiles) > 0 or self.survival is not None:
+            self.bank_shots = BankShotIndex(self.tile_grid)
+            if self.survival is not None:
+                # Survival times every wave from its start, so the index is built before the first one
+                self.bank_shots.finish()
+        else:
+            self.bank_shots = None
+
+        # Enemies keep clear of the cells mines and bullets threaten
+        self.danger_map = DangerMap(self.tile_grid)
+
+        # Explosions deal their damage once, when they go off
+        self.explosion_resolver = ExplosionResolver(self)
+
+        # Number the destructible obstacles in tilemap order so remote clients can match them to their tiles
+        for obstacle_id, obstacle in enumerate(list(self.breakable_obstacle_list) + list(self.explodables_list)):
+            obstacle.obstacle_id = obstacle_id
+        self.obstacle_count = len(self.breakable_obstacle_list) + len(self.explodables_list)
+
+        if self.survival is not None:
+            # Survival waves spawn where the level's enemies would start
+            self.survival.start([(tile.center_x, tile.center_y)
+                                 for tiles in (easy_enemy_tiles, medium_enemy_tiles, hard_enemy_tiles) for tile in tiles])
+        else:
+            # Create enemy tank objects with locations from the tilemap
+            for tile in easy_enemy_tiles:
+                self.add_enemy_tank(tile.center_x, tile.center_y, Tanks.Difficulty.EASY)
+
+            for tile in medium_enemy_tiles:
+                self.add_enemy_tank(tile.center_x, tile.center_y, Tanks.Difficulty.MEDIUM)
+
+            for tile in hard_enemy_tiles:
+                self.add_enemy_tank(tile.center_x, tile.center_y, Tanks.Difficulty.HARD)
+
+        # Create the player tank object and set its coordinates
+        self.player_sprite = Tanks.PlayerTank("assets/tankBody_blue1.png", "assets/tankBlue_barrel_rotate.png", .8, self.timers)
+        self.player_sprite.cooldown_timer.callback = self.player_reloaded
+        self.player_sprite.entity_id = self.new_entity_id()
+        self.player_sprite.center_x = player_tile.center_x
+        self.player_sprite.center_y = player_tile.center_y
+        self.player_sprite.angle = 180
+        self.player_list.append(self.player_sprite)
+        self.player_list.append(self.player_sprite.turret)
+
+        # Create the physics engine and add the player and obstacles sprites to it
+        self.physics_engine = arcade.PymunkPhysicsEngine(damping=0.0001,
+                                                         gravity=(0,0))
+
+        self.physics_engine.add_sprite(self.player_sprite,
+                                       mass=1.0,
+                                       friction=1.0,
+                                       moment=arcade.PymunkPhysicsEngine.MOMENT_INF,
+                                       collision_type="player")
+
+        self.physics_engine.add_sprite_list(self.obstacle_list,
+                                            friction = 0,
+                                            collision_type="wall",
+                                            elasticity = 1.0,
+                                            body_type=arcade.PymunkPhysicsEngine.STATIC)
+
+        self.physics_engine.add_sprite_list(self.breakable_obstacle_list,
+                                            friction = 0,
+                                            collision_type="breakable wall",
+                                            elasticity = 1.0,
+                                            body_type=arcade.PymunkPhysicsEngine.STATIC)
+
+        self.physics_engine.add_sprite_list(self.explodables_list,
+                                            friction = 0,
+                                            collision_type="explodables",
+                                            elasticity = 1.0,
+                                            body_type=arcade.PymunkPhysicsEngine.STATIC)
+
+        # Barrier list for AStar search
+        for barrier in self.obstacle_list:
+            self.all_obstacles.append(barrier)
+        for barrier in self.breakable_obstacle_list:
+            self.all_obstacles.append(barrier)
+        for barrier in self.explodables_list:
+            self.all_obstacles.append(barrier)
+
+        self.astar_barrier_list = arcade.AStarBarrierList(moving_sprite=self.player_sprite,
+                                                          blocking_sprites=self.all_obstacles,
+                                                          grid_size=56,
+                                                          left=-112,
+                                                          right=Tanks.SCREEN_WIDTH,
+                                                          bottom=-112,
+                                                          top=Tanks.SCREEN_HEIGHT)
+
+        # Spread the enemies' expensive decisions across frames
+        self.ai_scheduler = AIScheduler()
+
+        # Paths searched for the last level are no longer valid
+        self.path_pool.cancel_all()
+
+        for enemy in self.enemy_list:
+            self.add_enemy_body(enemy)
+
+        self.frame_times = []
+        self.telemetry.emit("level_start", level=self.level_num, enemies=len(self.enemy_list), lives=self.player_lives)
+
+        # The previous level's objects are unreachable now, so this is where leaks show up
+        if self.memory_diagnostics is not None:
+            report = self.memory_diagnostics.checkpoint(f"level {self.level_num} setup")
+            print(self.memory_diagnostics.format(report))
+            self.telemetry.emit("memory", level=self.level_num, traced_bytes=report.traced_bytes,
+                                flagged=report.flagged, **report.counts)
+
+    def update_player(self, delta_time):
+        """ Moves the player according to keys pressed
+
+        Args:
+            delta_time (float): the amount of time passes since last update
+        """
+        # Apply forces to push player in direction of keys
+        # Set friction to 0 temporarily to make the player move faster
+        if self.player_sprite in self.player_list and not self.round_over:
+            if self.direction == Tanks.Direction.UP and self.up_pressed:
+                self.physics_engine.apply_force(self.player_sprite, (0, -Tanks.PLAYER_MOVE_FORCE))
+                self.physics_engine.set_friction(self.player_sprite, 0)
+                self.player_sprite.texture = self.player_texture_list[self.direction.value]
+                self.lay_tracks(180, self.player_sprite.center_x, self.player_sprite.center_y - 10, self.player_sprite)
+
+            if self.direction == Tanks.Direction.DOWN and self.down_pressed:
+                self.physics_engine.apply_force(self.player_sprite, (0, Tanks.PLAYER_MOVE_FORCE))
+                self.physics_engine.set_friction(self.player_sprite, 0)
+                self.player_sprite.texture = self.player_texture_list[self.direction.value]
+                self.lay_tracks(180, self.player_sprite.center_x, self.player_sprite.center_y + 10, self.player_sprite)
+
+            if self.direction == Tanks.Direction.LEFT and self.left_pressed:
+                self.physics_engine.apply_force(self.player_sprite, (Tanks.PLAYER_MOVE_FORCE, 0))
+                self.physics_engine.set_friction(self.player_sprite, 0)
+                self.player_sprite.texture = self.player_texture_list[self.direction.value]
+                self.lay_tracks(90, self.player_sprite.center_x + 10, self.player_sprite.center_y, self.player_sprite)
+
+            if self.direction == Tanks.Direction.RIGHT and self.right_pressed:
+                self.physics_engine.apply_force(self.player_sprite, (-Tanks.PLAYER_MOVE_FORCE, 0))
+                self.physics_engine.set_friction(self.player_sprite, 0)
+                self.player_sprite.texture = self.player_texture_list[self.direction.value]
+                self.lay_tracks(90, self.player_sprite.center_x - 10, self.player_sprite.center_y, self.player_sprite)
+
+            # If no keys are pressed, set the friction to 1 to slow the tank down
+            if not self.right_pressed and not self.left_pressed and not self.up_pressed and not self.down_pressed:
+                self.physics_engine.set_friction(self.player_sprite, 1.0)
+
+    def update_enemies(self, delta_time):
+        """ Updates enemies and causes them to shoot bullets
+
+        Args:
+            delta_time (float): time passed since last update
+        """
+        # Drop path searches aimed at a cell the player has already left
+        self.path_pool.cancel_stale(self.player_sprite.position)
+
+        # Only the enemies picked by the scheduler make expensive decisions this frame
+        for enemy in self.ai_scheduler.schedule(self.enemy_list, self.player_sprite.position, delta_time):
+            enemy.think(self.astar_barrier_list, self.player_sprite.position, self.obstacle_list, self.breakable_obstacle_list,
+                        self.path_pool, self.bank_shots, self.danger_map)
+
+        for enemy in self.enemy_list:
+            enemy.player_x = self.player_sprite.center_x
+            enemy.player_y = self.player_sprite.center_y
+
+            enemy.move(self.physics_engine)
+
+            # The reaction time only runs while the enemy has a shot at the player tank
+            has_shot = enemy.sees_player or enemy.bank_angle is not None
+            if has_shot != enemy.reaction_timer.running:
+                if has_shot:
+                    enemy.reaction_timer.resume()
+                else:
+                    enemy.reaction_timer.stop()
+
+            # Shoot bullet if the enemy has had a shot for long enough, off the walls or straight at the player.
+            # The shot may be gone by the time the reaction time runs out, then it is fired at the player anyway
+            if enemy.can_shoot and enemy.reaction_time < 0:
+                if enemy.sees_player or enemy.bank_angle is None:
+                    self.shoot_bullet(enemy.center_x, enemy.center_y, enemy.player_x, enemy.player_y, enemy)
+                else:
+                    self.shoot_bullet(enemy.center_x, enemy.center_y, enemy.center_x + math.cos(enemy.bank_angle),
+                                      enemy.center_y + math.sin(enemy.bank_angle), enemy)
+                if enemy.difficulty == Tanks.Difficulty.HARD:
+                    enemy.reaction_time = Tanks.HARD_ENEMY_REACTION_TIME
+                else:
+                    enemy.reaction_time = Tanks.ENEMY_REACTION_TIME
+
+                # Reset the shoot cooldown
+                if(enemy.difficulty == Tanks.Difficulty.EASY):
+                    enemy.cooldown = Tanks.EASY_ENEMY_SHOOT_COOLDOWN
+                elif(enemy.difficulty == Tanks.Difficulty.MEDIUM):
+                    enemy.cooldown = Tanks.MEDIUM_ENEMY_SHOOT_COOLDOWN
+                elif(enemy.difficulty == Tanks.Difficulty.HARD):
+                    enemy.cooldown = Tanks.HARD_ENEMY_SHOOT_COOLDOWN
+
+                enemy.can_shoot = False
+
+    def update_mines(self, delta_time):
+        """ Updates the mine objects
+
+        Args:
+            delta_time (float): time passed since last update
+        """
+        # Mines whose fuse ran out already went off in detonate_mine(), explode the ones hit by a bullet
+        for mine in self.mine_list:
+            hit_list = arcade.check_for_collision_with_list(mine, self.bullet_list)
+            if len(hit_list) > 0:
+                hit_list[0].remove_from_sprite_lists()
+                self.detonate_mine(mine, "bullet")
+
+        # Apply the damage of every explosion that went off since the last update, chain reactions included
+        self.explosion_resolver.resolve()
+
+    def detonate_mine(self, mine, cause="timer"):
+        """ Explodes a mine. Called by the mine's fuse when it runs out, and when
+        a bullet or another explosion sets it off.
+
+        Args:
+            mine (Tanks.Mine): the mine
+            cause (str, optional): what set the mine off. Defaults to "timer".
+        """
+        # The fuse of a mine from a previous level or a rewound frame may still run out
+        if self.mine_list not in mine.sprite_lists:
+            return
+        self.explosion_animation(mine.center_x, mine.center_y)
+        mine.remove_from_sprite_lists()
+        self.danger_map.remove_mine(mine)
+        self.telemetry.emit("mine_exploded", mine=mine.entity_id, cause=cause)
+
+    def update_bullets(self):
+        """ Checks all of the bullets to see if they have collided with tanks or walls
+        """
+        for bullet, count in self.bullet_engine.ricochets:
+            self.telemetry.emit("ricochet", bullet=bullet.entity_id, count=count, total=bullet.num_ricochets)
+
+        for bullet in self.bullet_list:
+            hit_list = arcade.check_for_collision_with_list(bullet, self.enemy_list)
+            cause = "player_bullet" if bullet.shooter_id == self.player_sprite.entity_id else "enemy_bullet"
+
+            # For every enemy that the player has hit, explode them
+            for enemy in hit_list:
+                self.explosion_animation(enemy.center_x, enemy.center_y)
+                self.destroy_enemy(enemy, cause)
+                bullet.remove_from_sprite_lists()
+
+            # Lose if player gets hit
+            if arcade.check_for_collision(bullet, self.player_sprite) and (self.player_sprite in self.player_list):
+                self.destroy_player(cause)
+                bullet.remove_from_sprite_lists()
+                self.player_sprite.can_shoot = False
+                self.explosion_animation(self.player_sprite.center_x, self.player_sprite.center_y)
+
+        # Explode the explodables that bullets ran into (ricochets are counted by the bullet engine)
+        for bullet, explodable in self.bullet_hits:
+            bullet.remove_from_sprite_lists()
+            if explodable is not None and len(explodable.sprite_lists) > 0:
+                self.explosion_animation(explodable.center_x, explodable.center_y)
+                self.destroy_obstacle(explodable)
+        self.bullet_hits = []
+
+        # Remove bullets if they collide with eachother
+        for bullet in self.bullet_list:
+            hit_list = arcade.check_for_collision_with_list(bullet, self.bullet_list)
+            for b in hit_list:
+                self.explosion_animation(b.center_x, b.center_y)
+                b.remove_from_sprite_lists()
+                bullet.remove_from_sprite_lists()
+
+    def update_delta_time(self, delta_time, frame_time=None):
+        """ Updates all time based functionality
+
+        Args:
+            delta_time (float): time passed since last update
+            frame_time (float, optional): measured time since the last update. Defaults to delta_time.
+        """
+        self.frame_times.append(delta_time if frame_time is None else frame_time)
+
+        # Survival runs only end when the player dies
+        if self.survival is not None:
+            self.survival.update()
+        level_cleared = len(self.enemy_list) == 0 and self.survival is None
+
+        # If all enemy tanks are destroyed OR the player dies, start transition timer
+        if not self.round_over and (level_cleared or self.round_lost) and not self.end_level_timer.running:
+            # only play round win/lose jingle once
+            self.stop_sound(self.player)
+            if self.round_lost:
+                self.player = self.play_sound(self.round_fail, .5)
+            else:
+                self.player = self.play_sound(self.round_win, .5)
+
+            # The transition counts this frame too
+            self.end_level_timer.start(Tanks.END_LEVEL_TIME - delta_time)
+
+        if self.level_num > self.level_num_max and self.player_lives > 0:
+            self.game_over = True
+            self.game_lost = False
+
+        if self.player_lives <= 0:
+            self.game_over = True
+            self.game_lost = True
+
+    def end_level(self):
+        """ Ends the round. Called when the transition timer runs out.
+        """
+        self.round_over = True
+        self.telemetry.emit("level_end", level=self.level_num, won=not self.round_lost,
+                            tanks_destroyed=self.tanks_destroyed, lives=self.player_lives)
+        self.emit_frame_times()
+        if not self.round_lost and not self.game_over:
+            self.level_num += 1
+            if self.level_num > self.level_num_max:
+                self.game_over = True
+                self.game_lost = False
+        self.end_level_time = Tanks.END_LEVEL_TIME
+
+        if self.game_over or self.level_num > self.level_num_max:
+            self.player = self.play_sound(self.results, .5)
+        else:
+            self.player = self.play_sound(self.round_start, .5)
+
+        # Clear the screen
+        self.bullet_list = self.new_sprite_list()
+        self.enemy_list = self.new_sprite_list()
+        self.mine_list = self.new_sprite_list()
+
+    def player_reloaded(self):
+        """ Gives the player the shot back. Called when the player's shoot cooldown runs out.
+        """
+        # Stops player from shooting after death and during the transition
+        if not self.end_level_timer.running:
+            self.player_sprite.can_shoot = True
+
+    def update_simulation(self, delta_time, frame_time=None):
+        """
+        Updates all sprite lists and removes unnecessary sprites
+        Partially from https://api.arcade.academy/en/2.6.0/examples/sprite_explosion_bitmapped.html
+
+        Args:
+            delta_time (float): time passed since last update
+            frame_time (float, optional): measured time since the last update, recorded in the
+                frame times. Defaults to delta_time.
+        """
+        # Iterate the physics engine
+        self.physics_engine.step(Tanks.PHYSICS_TIME_STEP)
+
+        # Move the bullets through the tile grid in step with the physics engine
+        self.bullet_hits = self.bullet_engine.step(self.bullet_list, Tanks.PHYSICS_TIME_STEP)
+        if self.bank_shots is not None:
+            self.bank_shots.update()
+        self.danger_map.update_bullets(self.bullet_list)
+
+        # Update the sprite lists
+        self.player_list.update()
+        self.bullet_list.update()
+        self.enemy_list.update()
+        self.explosions_list.update()
+        self.exploded_tank_list.update()
+        self.mine_list.update()
+
+        # Fire the cooldowns that ran out
+        self.timers.advance(delta_time)
+
+        # Call all custom update functions
+        self.update_player(delta_time)
+        self.update_enemies(delta_time)
+        self.update_mines(delta_time)
+        self.update_delta_time(delta_time, frame_time)
+        self.update_bullets()
+
+    def key_press(self, key):
+        """ Handles a key press from the player
+        List of keys: http://arcade.academy/arcade.key.html
+
+        Args:
+            key (int): the key that was pressed
+        """
+        # Keys for movement
+        if key == arcade.key.W:
+            self.up_pressed = True
+            self.direction = Tanks.Direction.UP
+        elif key == arcade.key.S:
+            self.down_pressed = True
+            self.direction = Tanks.Direction.DOWN
+        elif key == arcade.key.A:
+            self.left_pressed = True
+            self.direction = Tanks.Direction.LEFT
+        elif key == arcade.key.D:
+            self.right_pressed = True
+            self.direction = Tanks.Direction.RIGHT
+        elif key == arcade.key.SPACE and not self.round_over:
+            # Create the mine that is dropped
+            if self.player_sprite.can_mine:
+                self.mine = Tanks.Mine("assets/barrelBlack_top.png", 1, self.timers, self.detonate_mine)
+                self.mine.entity_id = self.new_entity_id()
+                self.mine.center_x = self.player_sprite.center_x
+                self.mine.center_y = self.player_sprite.center_y
+                self.mine_list.append(self.mine)
+                self.danger_map.add_mine(self.mine)
+                self.telemetry.emit("mine_laid", mine=self.mine.entity_id, x=self.mine.center_x, y=self.mine.center_y)
+                self.player_sprite.can_mine = False
+                self.player_sprite.mine_cooldown = Tanks.PLAYER_MINE_COOLDOWN
+        elif self.round_over and key == arcade.key.ENTER and not self.game_over:
+            self.setup()
+            self.round_lost = False
+            self.round_over = False
+            # play level music
+            self.player = self.play_sound(self.music, 1)
+
+    def key_release(self, key):
+        """ Handles the player letting off a previously pressed key
+
+        Args:
+            key (int): the key that was released
+        """
+        # If a player releases a key, unset the keypress toggle variable
+        if key == arcade.key.W:
+            self.up_pressed = False
+        elif key == arcade.key.S:
+            self.down_pressed = False
+        elif key == arcade.key.A:
+            self.left_pressed = False
+        elif key == arcade.key.D:
+            self.right_pressed = False
+
+    def mouse_motion(self, x, y):
+        """ Handles the player moving the aim
+
+        Args:
+            x (int): x coordinate of the aim
+            y (int): y coordinate of the aim
+        """
+        # Set the target of the player's turret to the mouse location
+        self.player_sprite.target_x = x
+        self.player_sprite.target_y = y
+
+    def mouse_press(self, x, y):
+        """ Handles the player firing at a target
+
+        Args:
+            x (int): x coordinate of the target
+            y (int): y coordinate of the target
+        """
+        # If the turret is in a obstacle, don't shoot a bullet
+        if not self.round_over:
+            hit_list = arcade.check_for_collision_with_list(self.player_sprite.turret, self.obstacle_list)
+            if len(hit_list) == 0:
+                if self.player_sprite.can_shoot:
+                    self.shoot_bullet(start_x = self.player_sprite.center_x,
+                                    start_y = self.player_sprite.center_y,
+                                    target_x = x,
+                                    target_y = y,
+                                    shooter = self.player_sprite)
+
+                    # Reset the players cooldown
+                    self.player_sprite.cooldown = Tanks.PLAYER_SHOOT_COOLDOWN
+                    self.player_sprite.can_shoot = False
+
+    def destroy_enemy(self, enemy, cause):
+        """ Removes a destroyed enemy tank and leaves its wreck behind
+
+        Args:
+            enemy (Tanks.EnemyTank): the destroyed enemy
+            cause (str): what destroyed it, "player_bullet", "enemy_bullet" or "explosion"
+        """
+        self.telemetry.emit("kill", enemy=enemy.entity_id, difficulty=enemy.difficulty.name, cause=cause)
+        self.exploded_tank_list.append(enemy.exploded)
+        enemy.remove_from_sprite_lists()
+        enemy.turret.remove_from_sprite_lists()
+        self.tanks_destroyed += 1
+
+    def destroy_player(self, cause):
+        """ Removes the player's tank and loses the round
+
+        Args:
+            cause (str): what destroyed it, "player_bullet", "enemy_bullet" or "explosion"
+        """
+        self.telemetry.emit("player_death", level=self.level_num, cause=cause)
+        self.player_sprite.remove_from_sprite_lists()
+        self.player_sprite.turret.remove_from_sprite_lists()
+        if len(self.enemy_list) != 0:
+            self.round_lost = True
+            self.player_lives -= 1
+
+    def destroy_obstacle(self, obstacle):
+        """ Removes a destroyed breakable obstacle or explodable
+
+        Args:
+            obstacle (arcade.Sprite): the destroyed obstacle
+        """
+        obstacle.remove_from_sprite_lists()
+        self.tile_grid.remove(obstacle)
+        if self.bank_shots is not None:
+            self.bank_shots.refresh()
+
+    def explosion_animation(self, x, y):
+        """ Creates an explosion animation based on the x and y coordinates,
+        and queues the explosion's damage.
+
+        Args:
+            x (int): the x coordinate for the animation
+            y (int): the y coordinate for the animation
+        """
+        explosion = Tanks.Explosion(self.explosion_texture_list, self.quality.settings.explosion_frame_step)
+        explosion.center_x = x
+        explosion.center_y = y
+        self.explosions_list.append(explosion)
+        self.explosion_resolver.emit(x, y)
+        self.play_sound(self.explode1, .5)
+        explosion.update()
+
+    def shoot_bullet(self, start_x, start_y, target_x, target_y, shooter=None):
+        """ Creates a Bullet sprite and launches it towards the targer
+
+        Args:
+            start_x (int): starting x coordinate
+            start_y (int): starting y coordinate
+            target_x (int): target x coordinate
+            target_y (int): target y coordinate
+            shooter (arcade.Sprite, optional): the tank that fired. Defaults to None.
+        """
+        bullet = Tanks.Bullet("assets/bullet.png", 0.35)
+        bullet.entity_id = self.new_entity_id()
+        bullet.shooter_id = shooter.entity_id if shooter is not None else 0
+
+        # Angle the bullet travels
+        x_diff = target_x - start_x
+        y_diff = target_y - start_y
+        angle = math.atan2(y_diff, x_diff)
+        bullet.angle = math.degrees(angle) - 90
+
+        # Offset so the bullet doesn't start inside the tank
+        bullet.center_x = start_x + math.cos(angle) * Tanks.BULLET_START_OFFSET
+        bullet.center_y = start_y + math.sin(angle) * Tanks.BULLET_START_OFFSET
+
+        # Launch the bullet, the bullet engine moves it from here on
+        bullet.vx = math.cos(angle) * Tanks.BULLET_SPEED
+        bullet.vy = math.sin(angle) * Tanks.BULLET_SPEED
+        self.bullet_list.append(bullet)
+        self.play_sound(self.shoot2, .8)
+        self.telemetry.emit("shot", bullet=bullet.entity_id, shooter=bullet.shooter_id,
+                            x=bullet.center_x, y=bullet.center_y, angle=math.degrees(angle))
+
+    def emit_frame_times(self, **fields):
+        """ Emits a summary of the frame times since the last one, at the end of a level
+        or of a survival wave, and starts over
+
+        Args:
+            **fields: more fields for the event, like the wave number
+        """
+        if len(self.frame_times) == 0:
+            return
+        frame_times = np.array(self.frame_times) * 1000
+        self.telemetry.emit("frame_times", level=self.level_num, frames=len(frame_times),
+                            mean_ms=float(frame_times.mean()), p95_ms=float(np.percentile(frame_times, 95)),
+                            max_ms=float(frame_times.max()), **fields)
+        self.frame_times = []
+
+    def add_enemy_tank(self, x, y, difficulty):
+        """ Adds an enemy tank to the board
+
+        Args:
+            x (int): the x coordinate for the tank
+            y (int): the y coordinate for the tank
+            difficulty (Tanks.difficulty): The difficulty of the tank
+        """
+        if(difficulty == Tanks.Difficulty.EASY):
+            image = "assets/tankBody_red"
+            cooldown = Tanks.EASY_ENEMY_SHOOT_COOLDOWN
+        elif(difficulty == Tanks.Difficulty.MEDIUM):
+            image = "assets/tankBody_green"
+            cooldown = Tanks.MEDIUM_ENEMY_SHOOT_COOLDOWN
+        elif(difficulty == Tanks.Difficulty.HARD):
+            image = "assets/tankBody_dark"
+            cooldown = Tanks.HARD_ENEMY_SHOOT_COOLDOWN
+
+        self.enemy_sprite = Tanks.EnemyTank(image, difficulty, cooldown, 0.8, self.timers)
+        self.enemy_sprite.entity_id = self.new_entity_id()
+        self.enemy_sprite.center_x = x
+        self.enemy_sprite.center_y = y
+        self.enemy_list.append(self.enemy_sprite)
+        self.enemy_turret_list.append(self.enemy_sprite.turret)
+
+    def add_enemy_body(self, enemy):
+        """ Adds an enemy tank to the physics engine
+
+        Args:
+            enemy (Tanks.EnemyTank): the enemy tank
+        """
+        self.physics_engine.add_sprite(enemy,
+                                       mass=1.0,
+                                       friction=1.0,
+                                       moment=arcade.PymunkPhysicsEngine.MOMENT_INF,
+                                       collision_type="player")
+
+    def lay_tracks(self, angle_value, center_x, center_y, sprite):
+        """ Lays a track sprite at the given location and given angle
+
+        Args:
+            angle_value (float): the angle of the track
+            center_x (int): the x coordinate for the track
+            center_y (int): the y coordinate for the track
+            sprite (Tanks.PlayerTank): the tank laying the track
+        """
+
+        # Add tracks sprite at the correct angle and behind the player or enemy sprite
+        if sprite.can_track:
+            # Add tracks sprite at the correct angle and behind the player or enemy sprite
+            self.tracks_sprite = arcade.Sprite("assets/tracksSmall.png", 0.5)
+            self.tracks_sprite.angle = angle_value
+            self.tracks_sprite.center_x = center_x
+            self.tracks_sprite.center_y = center_y
+            self.tracks_list.append(self.tracks_sprite)
+
+            if isinstance(sprite, Tanks.PlayerTank):
+                self.play_sound(self.move, .2)
+
+            # Start the track cooldown, longer when the quality governor thins out the tracks
+            sprite.track_cooldown = self.quality.track_cooldown()
+            sprite.can_track = False
@@ -0,0 +1,533 @@
+"""
+state.py contains the struct-of-arrays state store used to snapshot and restore a TankSimulation
+"""
+
+from collections import deque
+import numpy as np
+import Tanks
+
+# Columns stored for every kind of entity. Every table ends with the sprite lists
+# the entity is in, as a bitmask of LIST_ATTRIBUTES, and whether it has a physics body
+TANK_FIELDS = ("alive", "x", "y", "vx", "vy", "turret_angle", "direction", "target_x", "target_y",
+               "cooldown", "can_shoot", "reaction_time", "move_cooldown", "move_rand_int", "path_idx",
+               "think_time", "sees_player", "bank_angle", "evading", "mine_cooldown", "can_mine", "track_cooldown", "can_track",
+               "turret_lists", "exploded_lists", "lists", "body")
+BULLET_FIELDS = ("alive", "x", "y", "vx", "vy", "angle", "num_ricochets", "lists", "body")
+MINE_FIELDS = ("alive", "x", "y", "total_time", "lists", "body")
+EXPLOSION_FIELDS = ("alive", "x", "y", "current_texture", "lists", "body")
+OBSTACLE_FIELDS = ("alive", "lists", "body")
+
+# Game wide values stored next to the entity tables
+SCALAR_FIELDS = ("tanks_destroyed", "end_level_time", "player_lives", "level_num", "next_entity_id",
+                 "game_lost", "game_over", "round_over", "round_lost",
+                 "left_pressed", "right_pressed", "up_pressed", "down_pressed", "direction")
+
+# State of the survival mode, next to its queue of tanks and its random state
+SURVIVAL_FIELDS = ("wave", "spawned", "peak_alive", "wave_due", "wave_timer_running", "wave_time_left")
+
+# Sprite lists of the simulation the entities can be in. Some are swapped out mid-level
+LIST_ATTRIBUTES = ("player_list", "bullet_list", "enemy_list", "enemy_turret_list", "explosions_list", "obstacle_list",
+                   "breakable_obstacle_list", "explodables_list", "exploded_tank_list", "mine_list", "all_obstacles")
+
+def direction_to_value(direction):
+    """ Converts a tank direction to a number that fits in a state array
+
+    Args:
+        direction: a Tanks.Direction, or 0 if the tank has not moved yet
+
+    Returns:
+        int: the direction value, -1 if the tank has not moved yet
+    """
+    if isinstance(direction, Tanks.Direction):
+        return direction.value
+    return -1
+
+def value_to_direction(value):
+    """ Converts a number from a state array back to a tank direction
+
+    Args:
+        value (float): the direction value
+
+    Returns:
+        the Tanks.Direction, or 0 if the tank has not moved yet
+    """
+    if value < 0:
+        return 0
+    return Tanks.Direction(int(value))
+
+def angle_to_value(angle):
+    """ Converts an optional angle to a number that fits in a state array
+
+    Args:
+        angle (float): the angle, or None
+
+    Returns:
+        float: the angle, or NaN for None
+    """
+    return np.nan if angle is None else angle
+
+def value_to_angle(value):
+    """ Converts a number from a state array back to an optional angle
+
+    Args:
+        value (float): the angle value
+
+    Returns:
+        float: the angle, or None for NaN
+    """
+    return None if np.isnan(value) else float(value)
+
+class EntityTable:
+    """ Struct-of-arrays storage for one kind of entity. Column `i` of every
+    field array belongs to the sprite in slot `i`, and so do sprites[i] and
+    bodies[i], its physics object.
+    """
+    def __init__(self, fields):
+        """ Constructor for an entity table
+
+        Args:
+            fields (tuple): names of the stored fields
+        """
+        self.fields = fields
+        self.columns = {name: row for row, name in enumerate(fields)}
+        self.data = np.zeros((len(fields), Tanks.STATE_INITIAL_CAPACITY))
+        self.sprites = []
+        self.bodies = []
+
+    def __len__(self):
+        """ Number of entities in the table """
+        return len(self.sprites)
+
+    def column(self, name):
+        """ Gets a view of one field for every entity
+
+        Args:
+            name (str): the field name
+
+        Returns:
+            np.ndarray: view into the table, one value per slot
+        """
+        return self.data[self.columns[name], :len(self.sprites)]
+
+    def add(self, sprite):
+        """ Gives a sprite a slot in the table
+
+        Args:
+            sprite (arcade.Sprite): the sprite to add
+        """
+        if len(self.sprites) == self.data.shape[1]:
+            self.data = np.concatenate([self.data, np.zeros_like(self.data)], axis=1)
+        sprite.state_slot = len(self.sprites)
+        self.sprites.append(sprite)
+        self.bodies.append(None)
+
+    def track(self, sprites):
+        """ Adds the sprites that do not have a slot yet
+
+        Args:
+            sprites: iterable of sprites
+        """
+        for sprite in sprites:
+            slot = getattr(sprite, "state_slot", None)
+            if slot is None or slot >= len(self.sprites) or self.sprites[slot] is not sprite:
+                self.add(sprite)
+
+    def truncate(self, count):
+        """ Drops every slot from `count` on
+
+        Args:
+            count (int): number of slots to keep
+        """
+        for sprite in self.sprites[count:]:
+            sprite.state_slot = None
+        del self.sprites[count:]
+        del self.bodies[count:]
+
+class StateSnapshot:
+    """ Copy of the state store at one point in time
+    """
+    def __init__(self, physics_engine, tables, paths, scalars, lists, tracks, survival):
+        """ Constructor for a snapshot
+
+        Args:
+            physics_engine: the physics engine of the level the snapshot belongs to
+            tables (dict): table name to (copied field array, list of sprites, list of physics objects)
+            paths (list): AStar path of every tank slot
+            scalars (np.ndarray): the game wide values
+            lists (dict): simulation attribute name to sprite list
+            tracks (int): number of tracks laid
+            survival (tuple): the survival mode's (SURVIVAL_FIELDS values, queued difficulties, random state),
+                or None outside of survival mode
+        """
+        self.physics_engine = physics_engine
+        self.tables = tables
+        self.paths = paths
+        self.scalars = scalars
+        self.lists = lists
+        self.tracks = tracks
+        self.survival = survival
+
+class GameState:
+    """ Struct-of-arrays store for the state of a TankSimulation.
+
+    The sprites stay the live objects that the physics engine, the sprite lists
+    and the renderer work with. The store mirrors them into one NumPy array per
+    entity kind in a single pass, including the sprite lists they are in and
+    whether they have a physics body, so a snapshot is a handful of array and
+    list copies and a restore writes the arrays back onto the same sprites.
+    """
+    def __init__(self, simulation):
+        """ Constructor for the state store
+
+        Args:
+            simulation (TankSimulation): the simulation to store
+        """
+        self.simulation = simulation
+        self.physics_engine = None
+        self.reset()
+
+    def reset(self):
+        """ Empties the store, e.g. when a new level is loaded
+        """
+        self.tanks = EntityTable(TANK_FIELDS)
+        self.bullets = EntityTable(BULLET_FIELDS)
+        self.mines = EntityTable(MINE_FIELDS)
+        self.explosions = EntityTable(EXPLOSION_FIELDS)
+        self.obstacles = EntityTable(OBSTACLE_FIELDS)
+        self.tables = {"tanks": self.tanks, "bullets": self.bullets, "mines": self.mines,
+                       "explosions": self.explosions, "obstacles": self.obstacles}
+        self.scalars = np.zeros(len(SCALAR_FIELDS))
+        self.survival = np.zeros(len(SURVIVAL_FIELDS))
+        self.paths = []
+        self.list_bits = {}
+        self.physics_engine = self.simulation.physics_engine
+
+    def velocity(self, sprite):
+        """ Gets the velocity of a sprite from the physics engine
+
+        Args:
+            sprite (arcade.Sprite): the sprite
+
+        Returns:
+            tuple: (vx, vy), zero for sprites without a physics body
+        """
+        physics_object = self.physics_engine.sprites.get(sprite)
+        if physics_object is None:
+            return 0, 0
+        return physics_object.body.velocity
+
+    def lists_value(self, sprite):
+        """ Gets the sprite lists a sprite is in as a bitmask of LIST_ATTRIBUTES
+
+        Args:
+            sprite (arcade.Sprite): the sprite
+
+        Returns:
+            int: the bitmask
+        """
+        list_bits = self.list_bits
+        return sum(list_bits.get(id(sprite_list), 0) for sprite_list in sprite.sprite_lists)
+
+    def body_value(self, table, sprite):
+        """ Remembers the physics object of a sprite in its slot
+
+        Args:
+            table (EntityTable): the table the sprite is in
+            sprite (arcade.Sprite): the sprite
+
+        Returns:
+            bool: True if the sprite is in the physics engine
+        """
+        physics_object = self.physics_engine.sprites.get(sprite)
+        if physics_object is None:
+            return False
+        table.bodies[sprite.state_slot] = physics_object
+        return True
+
+    def sync(self):
+        """ Copies the current state of every sprite into the arrays
+        """
+        simulation = self.simulation
+        if self.physics_engine is not simulation.physics_engine:
+            self.reset()
+
+        # Give slots to the entities created since the last sync
+        self.tanks.track([simulation.player_sprite])
+        self.tanks.track(simulation.enemy_list)
+        self.bullets.track(simulation.bullet_list)
+        self.mines.track(simulation.mine_list)
+        self.explosions.track(simulation.explosions_list)
+        self.obstacles.track(simulation.breakable_obstacle_list)
+        self.obstacles.track(simulation.explodables_list)
+        self.list_bits = {id(getattr(simulation, name)): 1 << bit for bit, name in enumerate(LIST_ATTRIBUTES)}
+
+        rows = []
+        for tank in self.tanks.sprites:
+            vx, vy = self.velocity(tank)
+            rows.append((len(tank.sprite_lists) > 0, tank.center_x, tank.center_y, vx, vy, tank.turret.angle,
+                         direction_to_value(tank.direction) if hasattr(tank, "difficulty") else direction_to_value(simulation.direction),
+                         getattr(tank, "target_x", 0), getattr(tank, "target_y", 0),
+                         tank.cooldown, tank.can_shoot, getattr(tank, "reaction_time", 0), getattr(tank, "move_cooldown", 0),
+                         getattr(tank, "move_rand_int", 0), getattr(tank, "path_idx", 0), getattr(tank, "think_time", 0),
+                         getattr(tank, "sees_player", False), angle_to_value(getattr(tank, "bank_angle", None)),
+                         getattr(tank, "evading", False), getattr(tank, "mine_cooldown", 0), getattr(tank, "can_mine", False),
+                         getattr(tank, "track_cooldown", 0), getattr(tank, "can_track", False),
+                         self.lists_value(tank.turret), self.lists_value(tank.exploded), self.lists_value(tank), self.body_value(self.tanks, tank)))
+        self.store(self.tanks, rows)
+        self.paths = [getattr(tank, "path", None) for tank in self.tanks.sprites]
+
+        self.store(self.bullets, [(len(bullet.sprite_lists) > 0, bullet.center_x, bullet.center_y, bullet.vx, bullet.vy, bullet.angle, bullet.num_ricochets,
+                                   self.lists_value(bullet), self.body_value(self.bullets, bullet))
+                                  for bullet in self.bullets.sprites])
+
+        self.store(self.mines, [(len(mine.sprite_lists) > 0, mine.center_x, mine.center_y, mine.total_time,
+                                 self.lists_value(mine), self.body_value(self.mines, mine))
+                                for mine in self.mines.sprites])
+        self.store(self.explosions, [(len(explosion.sprite_lists) > 0, explosion.center_x, explosion.center_y, explosion.current_texture,
+                                      self.lists_value(explosion), self.body_value(self.explosions, explosion))
+                                     for explosion in self.explosions.sprites])
+        self.store(self.obstacles, [(len(obstacle.sprite_lists) > 0, self.lists_value(obstacle), self.body_value(self.obstacles, obstacle))
+                                    for obstacle in self.obstacles.sprites])
+
+        self.scalars[:] = [getattr(simulation, name) for name in SCALAR_FIELDS[:-1]] + [direction_to_value(simulation.direction)]
+
+        survival = simulation.survival
+        if survival is not None:
+            self.survival[:] = (survival.wave, survival.spawned, survival.peak_alive, survival.wave_due,
+                                survival.wave_timer.running, survival.wave_timer.remaining())
+
+    def store(self, table, rows):
+        """ Writes rows of field values into a table
+
+        Args:
+            table (EntityTable): the table to write to
+            rows (list): one tuple of field values per slot
+        """
+        if rows:
+            table.data[:, :len(rows)] = np.array(rows, dtype=float).T
+
+    def parts(self, sprite):
+        """ Gets every sprite that belongs to an entity
+
+        Args:
+            sprite (arcade.Sprite): the entity's main sprite
+
+        Returns:
+            list: the sprite plus its turret and exploded sprites, if it has them
+        """
+        parts = [sprite]
+        if hasattr(sprite, "turret"):
+            parts.append(sprite.turret)
+            parts.append(sprite.exploded)
+        return parts
+
+    def snapshot(self):
+        """ Takes a snapshot of the simulation
+
+        Returns:
+            StateSnapshot: the snapshot
+        """
+        self.sync()
+        simulation = self.simulation
+        tables = {name: (table.data[:, :len(table)].copy(), list(table.sprites), list(table.bodies)) for name, table in self.tables.items()}
+        lists = {name: getattr(simulation, name) for name in LIST_ATTRIBUTES}
+        survival = None
+        if simulation.survival is not None:
+            survival = (self.survival.copy(), tuple(simulation.survival.queued), simulation.survival.random.getstate())
+        return StateSnapshot(self.physics_engine, tables, list(self.paths), self.scalars.copy(), lists,
+                             len(simulation.tracks_list), survival)
+
+    def restore(self, snapshot):
+        """ Puts the simulation back into the state of a snapshot
+
+        Args:
+            snapshot (StateSnapshot): a snapshot taken in the current level
+        """
+        simulation = self.simulation
+        if snapshot.physics_engine is not simulation.physics_engine:
+            raise ValueError("State snapshots can only be restored in the level they were taken in")
+
+        # Entities created after the snapshot are removed for good
+        self.sync()
+        for name, table in self.tables.items():
+            data, sprites, bodies = snapshot.tables[name]
+            for sprite in table.sprites[len(sprites):]:
+                for part in self.parts(sprite):
+                    part.remove_from_sprite_lists()
+                if sprite in self.physics_engine.sprites:
+                    self.physics_engine.remove_sprite(sprite)
+            table.truncate(len(sprites))
+            table.data[:, :len(sprites)] = data
+            table.bodies[:] = bodies
+
+        # Tracks are only ever laid during a level, so the ones after the snapshot's count are new
+        for track in list(simulation.tracks_list)[snapshot.tracks:]:
+            track.remove_from_sprite_lists()
+
+        # Put every sprite back into the lists it was in, and sprites that left the
+        # physics engine when they were destroyed back into it
+        for name, sprite_list in snapshot.lists.items():
+            setattr(simulation, name, sprite_list)
+        for table in self.tables.values():
+            columns = table.columns
+            for sprite, physics_object, row in zip(table.sprites, table.bodies, table.data[:, :len(table)].T):
+                self.write_lists(sprite, row[columns["lists"]], snapshot.lists)
+                if "turret_lists" in columns:
+                    self.write_lists(sprite.turret, row[columns["turret_lists"]], snapshot.lists)
+                    self.write_lists(sprite.exploded, row[columns["exploded_lists"]], snapshot.lists)
+                if row[columns["body"]] and sprite not in self.physics_engine.sprites:
+                    self.attach(sprite, physics_object)
+                elif not row[columns["body"]] and sprite in self.physics_engine.sprites:
+                    self.physics_engine.remove_sprite(sprite)
+
+        self.write_tanks(snapshot.paths)
+        self.write_bullets()
+        for mine, (x, y, total_time) in zip(self.mines.sprites, self.mines.data[1:4, :len(self.mines)].T):
+            mine.center_x, mine.center_y, mine.total_time = x, y, total_time
+        for explosion, (x, y, current_texture) in zip(self.explosions.sprites, self.explosions.data[1:4, :len(self.explosions)].T):
+            explosion.center_x, explosion.center_y = x, y
+            explosion.current_texture = int(current_texture)
+            explosion.set_texture(min(explosion.current_texture, len(explosion.textures) - 1))
+
+        self.scalars[:] = snapshot.scalars
+        for name, value in zip(SCALAR_FIELDS[:-1], self.scalars[:-1]):
+            current = getattr(simulation, name)
+            if isinstance(current, bool):
+                value = bool(value)
+            elif value.is_integer():
+                value = int(value)
+            setattr(simulation, name, value)
+        simulation.direction = value_to_direction(self.scalars[-1])
+        if snapshot.survival is not None:
+            self.write_survival(*snapshot.survival)
+
+        # Obstacles may have come back
+        simulation.tile_grid.fill(simulation.obstacle_list, simulation.breakable_obstacle_list, simulation.explodables_list)
+        if simulation.bank_shots is not None:
+            simulation.bank_shots.refresh()
+        simulation.danger_map.reset(simulation.mine_list, simulation.bullet_list)
+        simulation.bullet_hits = []
+        simulation.explosion_resolver.events.clear()
+
+        # Decisions in flight were made for a different state
+        simulation.ai_scheduler.queue.clear()
+
+    def write_lists(self, sprite, value, lists):
+        """ Puts a sprite into the sprite lists of a bitmask, and takes it out of every other list
+
+        Args:
+            sprite (arcade.Sprite): the sprite
+            value (float): bitmask of LIST_ATTRIBUTES
+            lists (dict): simulation attribute name to sprite list
+        """
+        wanted = [lists[name] for bit, name in enumerate(LIST_ATTRIBUTES) if int(value) >> bit & 1]
+        for sprite_list in list(sprite.sprite_lists):
+            if sprite_list not in wanted:
+                sprite_list.remove(sprite)
+        for sprite_list in wanted:
+            if sprite_list not in sprite.sprite_lists:
+                sprite_list.append(sprite)
+
+    def write_survival(self, values, queued, random_state):
+        """ Puts the survival mode back into the wave it was in
+
+        Args:
+            values (np.ndarray): the SURVIVAL_FIELDS values
+            queued (tuple): difficulties of the tanks waiting for a free tile
+            random_state (tuple): state of the survival mode's random numbers
+        """
+        survival = self.simulation.survival
+        self.survival[:] = values
+        wave, spawned, peak_alive, wave_due, running, time_left = values
+        survival.wave = int(wave)
+        survival.spawned = int(spawned)
+        survival.peak_alive = int(peak_alive)
+        survival.wave_due = bool(wave_due)
+        survival.queued = deque(queued)
+        survival.random.setstate(random_state)
+        if running:
+            survival.wave_timer.start(max(time_left, 0))
+        else:
+            survival.wave_timer.stop()
+            survival.wave_timer.left = time_left
+
+    def attach(self, sprite, physics_object):
+        """ Puts a sprite's old physics object back into the physics engine
+
+        Args:
+            sprite (arcade.Sprite): the sprite
+            physics_object: the physics object the sprite had in the snapshot
+        """
+        engine = self.physics_engine
+        engine.sprites[sprite] = physics_object
+        if physics_object.body.body_type != engine.STATIC:
+            engine.non_static_sprite_list.append(sprite)
+        engine.space.add(physics_object.body, physics_object.shape)
+        sprite.register_physics_engine(engine)
+
+    def move_body(self, sprite, x, y, vx, vy):
+        """ Moves a sprite and its physics body
+
+        Args:
+            sprite (arcade.Sprite): the sprite to move
+            x (float): x coordinate
+            y (float): y coordinate
+            vx (float): x velocity
+            vy (float): y velocity
+        """
+        sprite.center_x = x
+        sprite.center_y = y
+        physics_object = self.physics_engine.sprites.get(sprite)
+        if physics_object is not None:
+            physics_object.body.position = (x, y)
+            physics_object.body.velocity = (vx, vy)
+
+    def write_tanks(self, paths):
+        """ Writes the tank table back onto the tank sprites
+
+        Args:
+            paths (list): AStar path of every tank slot
+        """
+        columns = self.tanks.columns
+        for tank, row, path in zip(self.tanks.sprites, self.tanks.data[:, :len(self.tanks)].T, paths):
+            self.move_body(tank, row[columns["x"]], row[columns["y"]], row[columns["vx"]], row[columns["vy"]])
+            tank.turret.center_x = tank.center_x
+            tank.turret.center_y = tank.center_y
+            tank.turret.angle = row[columns["turret_angle"]]
+            tank.cooldown = row[columns["cooldown"]]
+            tank.can_shoot = bool(row[columns["can_shoot"]])
+
+            if isinstance(tank, Tanks.EnemyTank):
+                tank.exploded.center_x = tank.center_x
+                tank.exploded.center_y = tank.center_y
+                tank.direction = value_to_direction(row[columns["direction"]])
+                if tank.direction != 0:
+                    tank.texture = tank.texture_list[tank.direction.value]
+                tank.reaction_time = row[columns["reaction_time"]]
+                tank.move_cooldown = row[columns["move_cooldown"]]
+                tank.move_rand_int = int(row[columns["move_rand_int"]])
+                tank.path = path
+                tank.path_idx = int(row[columns["path_idx"]])
+                tank.path_request = None
+                tank.think_time = row[columns["think_time"]]
+                tank.think_queued = False
+                tank.sees_player = bool(row[columns["sees_player"]])
+                tank.bank_angle = value_to_angle(row[columns["bank_angle"]])
+                tank.evading = bool(row[columns["evading"]])
+            else:
+                tank.target_x = row[columns["target_x"]]
+                tank.target_y = row[columns["target_y"]]
+                tank.mine_cooldown = row[columns["mine_cooldown"]]
+                tank.can_mine = bool(row[columns["can_mine"]])
+                tank.track_cooldown = row[columns["track_cooldown"]]
+                tank.can_track = bool(row[columns["can_track"]])
+
+    def write_bullets(self):
+        """ Writes the bullet table back onto the bullet sprites
+        """
+        for bullet, (x, y, vx, vy, angle, num_ricochets) in zip(self.bullets.sprites, self.bullets.data[1:7, :len(self.bullets)].T):
+            bullet.position = (x, y)
+            bullet.vx = vx
+            bullet.vy = vy
+            bullet.angle = angle
+            bullet.num_ricochets = int(num_ricochets)
@@ -0,0 +1,303 @@
+"""
+survival.py contains the endless survival mode, where ever larger waves of enemy tanks attack the player.
+
+Run `python survival.py` to measure how the frame time scales with the number of tanks.
+"""
+
+from collections import deque, namedtuple
+import argparse
+import random
+import time
+import numpy as np
+import Tanks
+from simulation import TankSimulation
+from tilegrid import EMPTY
+from timers import Timer
+
+# How many tanks of one difficulty a wave brings.
+#   first_wave: first wave with tanks of this difficulty
+#   count: number of tanks in that wave
+#   growth: factor the number grows by every wave after it
+WaveCurve = namedtuple("WaveCurve", ["first_wave", "count", "growth"])
+
+WAVE_CURVES = {Tanks.Difficulty.EASY: WaveCurve(1, 4, 1.25),
+               Tanks.Difficulty.MEDIUM: WaveCurve(2, 2, 1.35),
+               Tanks.Difficulty.HARD: WaveCurve(3, 1, 1.45)}
+
+# Performance of one wave.
+#   wave: number of the wave
+#   spawned: tanks the wave brought
+#   peak_alive: most enemy tanks alive at once during the wave
+#   frames: frames recorded during the wave
+#   mean_ms, p95_ms, max_ms: frame times in milliseconds
+#   over_budget: True if the 95th percentile frame time was over the frame budget
+WaveSummary = namedtuple("WaveSummary", ["wave", "spawned", "peak_alive", "frames", "mean_ms", "p95_ms", "max_ms", "over_budget"])
+
+def wave_size(curve, wave):
+    """ Gets the number of tanks of one difficulty in a wave
+
+    Args:
+        curve (WaveCurve): the curve of the difficulty
+        wave (int): number of the wave, starting at 1
+
+    Returns:
+        int: the number of tanks
+    """
+    if wave < curve.first_wave:
+        return 0
+    return round(curve.count * curve.growth ** (wave - curve.first_wave))
+
+class SurvivalMode:
+    """ Endless waves of enemy tanks on one of the level maps.
+
+    The tanks spawn on empty tiles without a tank, within spawn_radius tiles of
+    where the level's enemy tiles are. When every such tile is taken, the rest
+    of the wave is queued and comes in over the next updates as tiles free up.
+    A new wave comes once the last one is destroyed or after wave_time seconds,
+    so waves pile up until max_enemies tanks are alive. A wave that is due
+    while tanks of the last one are still queued waits until they have all
+    spawned. The run ends when the player is destroyed.
+
+    record() is given the work done every frame, and a WaveSummary of the frame
+    times is made at the end of every wave.
+    """
+    def __init__(self, simulation, curves=WAVE_CURVES, wave_time=Tanks.SURVIVAL_WAVE_TIME,
+                 max_enemies=Tanks.SURVIVAL_MAX_ENEMIES, spawn_radius=Tanks.SURVIVAL_SPAWN_RADIUS,
+                 budget=Tanks.FRAME_BUDGET, seed=None):
+        """ Constructor for the survival mode
+
+        Args:
+            simulation (TankSimulation): the simulation the waves are spawned in
+            curves (dict, optional): WaveCurve for every difficulty. Defaults to WAVE_CURVES.
+            wave_time (float, optional): seconds before the next wave comes. Defaults to Tanks.SURVIVAL_WAVE_TIME.
+            max_enemies (int, optional): most enemy tanks alive at once. Defaults to Tanks.SURVIVAL_MAX_ENEMIES.
+            spawn_radius (int, optional): tiles from a spawn point tanks can spawn at. Defaults to Tanks.SURVIVAL_SPAWN_RADIUS.
+            budget (float, optional): seconds of work per frame. Defaults to Tanks.FRAME_BUDGET.
+            seed (int, optional): seed for the spawn order. Defaults to None.
+        """
+        self.simulation = simulation
+        self.curves = curves
+        self.wave_time = wave_time
+        self.max_enemies = max_enemies
+        self.spawn_radius = spawn_radius
+        self.budget = budget
+        self.random = random.Random(seed)
+        self.wave_timer = Timer(simulation.timers, self.next_wave)
+        self.spawn_points = []
+        # Difficulties of the tanks waiting for a free tile
+        self.queued = deque()
+        # The wave timer ran out while tanks were queued
+        self.wave_due = False
+        self.wave = 0
+        self.spawned = 0
+        self.peak_alive = 0
+        self.frame_times = []
+        self.summaries = []
+
+    def start(self, spawn_points):
+        """ Starts a new run. Called by the simulation when the level is set up.
+
+        Args:
+            spawn_points (list): (x, y) of every place tanks can spawn
+        """
+        self.spawn_points = spawn_points
+        self.queued = deque()
+        self.wave_due = False
+        self.wave = 0
+        self.spawned = 0
+        self.peak_alive = 0
+        self.frame_times = []
+        # The first wave comes on the first update
+        self.wave_timer.start(0)
+
+    def update(self):
+        """ Sends the next wave once the current one is destroyed. Called every update.
+        """
+        simulation = self.simulation
+        if simulation.round_lost or simulation.round_over:
+            # The run is over, sum up the last wave
+            if len(self.frame_times) > 0:
+                self.summarize()
+            return
+        self.spawn_queued()
+        self.peak_alive = max(self.peak_alive, len(simulation.enemy_list))
+        if len(self.queued) == 0 and (self.wave_due or (self.wave > 0 and len(simulation.enemy_list) == 0)):
+            self.next_wave()
+
+    def next_wave(self):
+        """ Spawns the next wave. Called when the wave timer runs out or the wave is destroyed.
+        While tanks of the last wave are queued, the wave is only marked as due.
+        """
+        simulation = self.simulation
+        if simulation.round_lost or simulation.round_over or len(self.spawn_points) == 0:
+            return
+        if len(self.queued) > 0:
+            self.wave_due = True
+            return
+        self.wave_due = False
+        if self.wave > 0:
+            self.summarize()
+        self.wave += 1
+
+        difficulties = [difficulty for difficulty, curve in self.curves.items() for _ in range(wave_size(curve, self.wave))]
+        self.random.shuffle(difficulties)
+        self.spawned = 0
+        for difficulty in difficulties:
+            if len(simulation.enemy_list) + len(self.queued) >= self.max_enemies:
+                break
+            self.queued.append(difficulty)
+        self.spawn_queued()
+        self.peak_alive = len(simulation.enemy_list)
+        simulation.telemetry.emit("wave_start", wave=self.wave, spawned=self.spawned, alive=len(simulation.enemy_list),
+                                  queued=len(self.queued))
+
+        self.wave_timer.start(self.wave_time)
+
+    def spawn_queued(self):
+        """ Spawns the queued tanks in order, until one finds no free tile
+        """
+        if len(self.queued) == 0:
+            return
+        occupied = self.occupied_tiles()
+        while len(self.queued) > 0 and self.spawn(self.queued[0], occupied):
+            self.queued.popleft()
+
+    def spawn(self, difficulty, occupied):
+        """ Spawns one enemy tank on a free tile near the next spawn point that has one
+
+        Args:
+            difficulty (Tanks.Difficulty): difficulty of the tank
+            occupied (set): tiles with a tank on them, the new tank's tile is added
+
+        Returns:
+            bool: True if the tank was spawned, False if no spawn point has a free tile
+        """
+        tile_grid = self.simulation.tile_grid
+        for i in range(len(self.spawn_points)):
+            tile = self.free_tile(*self.spawn_points[(self.spawned + i) % len(self.spawn_points)], occupied)
+            if tile is None:
+                continue
+            occupied.add(tile)
+            row, column = tile
+            self.simulation.add_enemy_tank((column + 0.5) * tile_grid.tile_size, (row + 0.5) * tile_grid.tile_size, difficulty)
+            self.simulation.add_enemy_body(self.simulation.enemy_sprite)
+            self.spawned += 1
+            return True
+        return False
+
+    def free_tile(self, x, y, occupied):
+        """ Finds an empty tile without a tank near a spawn point. Closer tiles come first.
+
+        Args:
+            x (float): x coordinate of the spawn point
+            y (float): y coordinate of the spawn point
+            occupied (set): tiles with a tank on them
+
+        Returns:
+            tuple: (row, column) of the tile, or None if every tile within spawn_radius is taken
+        """
+        tile_grid = self.simulation.tile_grid
+        row, column = tile_grid.cell(x, y)
+        for radius in range(self.spawn_radius + 1):
+            ring = [(row + d_row, column + d_column) for d_row in range(-radius, radius + 1)
+                    for d_column in range(-radius, radius + 1) if max(abs(d_row), abs(d_column)) == radius]
+            self.random.shuffle(ring)
+            for tile in ring:
+                if tile_grid.in_bounds(*tile) and tile_grid.cells[tile] == EMPTY and tile not in occupied:
+                    return tile
+        return None
+
+    def occupied_tiles(self):
+        """ Gets the tiles the tanks are on
+
+        Returns:
+            set: (row, column) of every tile with a tank
+        """
+        simulation = self.simulation
+        return {simulation.tile_grid.cell(tank.center_x, tank.center_y)
+                for tanks in (simulation.enemy_list, simulation.player_list) for tank in tanks}
+
+    def record(self, frame_time):
+        """ Records the work done in a frame
+
+        Args:
+            frame_time (float): seconds spent on the frame. The window counts its own update and drawing,
+                not the ticks of a simulation thread, which are in the frame_times telemetry.
+                The headless benchmark only has the update.
+        """
+        if self.wave > 0 and not self.simulation.round_lost and not self.simulation.round_over:
+            self.frame_times.append(frame_time)
+
+    def summarize(self):
+        """ Sums up the frame times of the current wave, and emits the simulation's frame times
+
+        Returns:
+            WaveSummary: the summary
+        """
+        frame_times = np.array(self.frame_times if len(self.frame_times) > 0 else [0]) * 1000
+        p95_ms = float(np.percentile(frame_times, 95))
+        summary = WaveSummary(self.wave, self.spawned, self.peak_alive, len(self.frame_times), float(frame_times.mean()),
+                              p95_ms, float(frame_times.max()), p95_ms > self.budget * 1000)
+        self.summaries.append(summary)
+        self.simulation.telemetry.emit("wave_summary", **summary._asdict())
+        self.frame_times = []
+        # A survival level never ends, so its frame times are emitted wave by wave
+        self.simulation.emit_frame_times(wave=self.wave)
+        return summary
+
+    def format(self, summary):
+        """ Formats a wave summary
+
+        Args:
+            summary (WaveSummary): the summary
+
+        Returns:
+            str: readable summary
+        """
+        text = (f"Wave {summary.wave}: {summary.spawned} spawned, {summary.peak_alive} alive at most, "
+                f"{summary.frames} frames, mean {summary.mean_ms:.2f} ms, p95 {summary.p95_ms:.2f} ms, max {summary.max_ms:.2f} ms")
+        if summary.over_budget:
+            text += " (over budget)"
+        return text
+
+def main():
+    """
+    Runs survival waves without a window and prints the performance of every wave.
+    """
+    parser = argparse.ArgumentParser(description="Tank Game survival benchmark")
+    parser.add_argument("--level", type=int, default=1, help="level map the waves spawn on")
+    parser.add_argument("--waves", type=int, default=10, help="number of waves to run")
+    parser.add_argument("--wave-time", type=float, default=Tanks.SURVIVAL_WAVE_TIME, help="seconds between waves")
+    parser.add_argument("--max-enemies", type=int, default=Tanks.SURVIVAL_MAX_ENEMIES, help="most enemy tanks alive at once")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the spawn order")
+    args = parser.parse_args()
+
+    simulation = TankSimulation()
+    simulation.level_num = args.level
+    survival = SurvivalMode(simulation, wave_time=args.wave_time, max_enemies=args.max_enemies, seed=args.seed)
+    simulation.survival = survival
+    simulation.setup()
+
+    # Nobody plays, so the player tank sits out and the waves keep piling up
+    player = simulation.player_sprite
+    player.remove_from_sprite_lists()
+    player.turret.remove_from_sprite_lists()
+
+    printed = 0
+    while survival.wave <= args.waves:
+        update_start = time.perf_counter()
+        simulation.update_simulation(Tanks.PHYSICS_TIME_STEP)
+        survival.record(time.perf_counter() - update_start)
+        for summary in survival.summaries[printed:]:
+            print(survival.format(summary))
+        printed = len(survival.summaries)
+
+    over_budget = [summary for summary in survival.summaries if summary.over_budget]
+    if len(over_budget) > 0:
+        print(f"Frame time broke the budget at wave {over_budget[0].wave} with {over_budget[0].peak_alive} tanks alive")
+    else:
+        print("Frame time stayed within the budget")
+    simulation.path_pool.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+telemetry.py contains the gameplay event stream and its background file writer
+"""
+
+from collections import deque
+import json
+import os
+import threading
+import time
+import uuid
+import Tanks
+
+class Telemetry:
+    """ Structured gameplay events.
+
+    emit() only appends to an in-memory ring buffer, so the game loop never
+    waits on the disk. When started with a directory, a background thread
+    drains the buffer every few seconds and appends the events as json lines
+    to a log file, which is rotated once it grows too large. If the buffer
+    fills up before it is drained, the oldest events are dropped.
+    """
+    def __init__(self, directory=None, capacity=Tanks.TELEMETRY_BUFFER_SIZE, flush_interval=Tanks.TELEMETRY_FLUSH_INTERVAL,
+                 max_bytes=Tanks.TELEMETRY_MAX_BYTES, backup_count=Tanks.TELEMETRY_BACKUP_COUNT):
+        """ Constructor for the telemetry stream
+
+        Args:
+            directory (str, optional): folder for the log files. Defaults to None, which keeps
+                the events in memory only.
+            capacity (int, optional): most events buffered between flushes. Defaults to Tanks.TELEMETRY_BUFFER_SIZE.
+            flush_interval (float, optional): seconds between flushes. Defaults to Tanks.TELEMETRY_FLUSH_INTERVAL.
+            max_bytes (int, optional): size a log file is rotated at. Defaults to Tanks.TELEMETRY_MAX_BYTES.
+            backup_count (int, optional): rotated log files kept. Defaults to Tanks.TELEMETRY_BACKUP_COUNT.
+        """
+        self.directory = directory
+        self.events = deque(maxlen=capacity)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.session = uuid.uuid4().hex
+        self.start_time = time.perf_counter()
+        self.dropped = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def emit(self, event, **fields):
+        """ Records an event
+
+        Args:
+            event (str): kind of event
+            **fields: data of the event, must be json serializable
+        """
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append((time.perf_counter() - self.start_time, event, fields))
+
+    def start(self):
+        """ Starts the background writer if the events go to a directory
+        """
+        if self.directory is None or self.thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """ Stops the background writer after a last flush
+        """
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        """ Background thread. Flushes the buffer until the stream is closed
+        """
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def drain(self):
+        """ Takes every buffered event out of the ring buffer
+
+        Returns:
+            list: (seconds since start, event, fields) for every event
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.events.popleft())
+            except IndexError:
+                return events
+
+    def path(self, backup=0):
+        """ Gets the path of a log file
+
+        Args:
+            backup (int, optional): 0 for the current file, n for the n-th rotated file. Defaults to 0.
+
+        Returns:
+            str: the file path
+        """
+        file_name = "telemetry.jsonl" if backup == 0 else f"telemetry.jsonl.{backup}"
+        return os.path.join(self.directory, file_name)
+
+    def flush(self):
+        """ Writes the buffered events to the log file in one batch
+        """
+        events = self.drain()
+        if self.dropped:
+            events.append((time.perf_counter() - self.start_time, "dropped", {"count": self.dropped}))
+            self.dropped = 0
+        if len(events) == 0:
+            return
+
+        lines = "".join(json.dumps(dict(fields, t=round(t, 4), event=event, session=self.session)) + "\n"
+                        for t, event, fields in events)
+        with open(self.path(), "a") as log_file:
+            log_file.write(lines)
+            size = log_file.tell()
+        if size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        """ Moves the current log file to the first backup, shifting the older ones
+        """
+        for backup in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(self.path(backup)):
+                os.replace(self.path(backup), self.path(backup + 1))
+        if self.backup_count > 0:
+            os.replace(self.path(), self.path(1))
+        else:
+            os.remove(self.path())
@@ -0,0 +1,45 @@
+"""
+conftest.py sets up the tests. arcade runs without a window, and the tests run from the
+repository root so the game finds its assets.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("ARCADE_HEADLESS", "1")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import arcade
+import pytest
+import Tanks
+from tilegrid import TileGrid
+
+@pytest.fixture
+def center():
+    """ Gets the pixel center of a tile from its row and column
+    """
+    def make(row, column):
+        return (column + 0.5) * Tanks.TILE_SIZE, (row + 0.5) * Tanks.TILE_SIZE
+    return make
+
+@pytest.fixture
+def obstacle(center):
+    """ Makes obstacle sprites in the center of a tile
+    """
+    def make(row, column):
+        sprite = arcade.SpriteSolidColor(Tanks.TILE_SIZE, Tanks.TILE_SIZE, arcade.color.BLACK)
+        sprite.center_x, sprite.center_y = center(row, column)
+        return sprite
+    return make
+
+@pytest.fixture
+def make_tile_grid(obstacle):
+    """ Makes a tile grid from the (row, column) of every wall and explodable tile
+    """
+    def make(walls, explodables=(), rows=10, columns=10):
+        return TileGrid([obstacle(*wall) for wall in walls], [],
+                        [obstacle(*tile) for tile in explodables], columns=columns, rows=rows)
+    return make
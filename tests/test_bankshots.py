@@ -0,0 +1,104 @@
+"""
+test_bankshots.py tests the bank shot index against bullets moved by the bullet engine
+"""
+
+import math
+import numpy as np
+import pytest
+import Tanks
+from bankshots import BankShotIndex
+from bullets import BulletEngine
+
+ANGLES = 36
+
+@pytest.fixture
+def build(make_tile_grid):
+    """ Makes an 8x8 tile grid with the given walls, and a finished index of it
+    """
+    def make(walls):
+        tile_grid = make_tile_grid(walls, rows=8, columns=8)
+        index = BankShotIndex(tile_grid, angles=ANGLES)
+        index.finish()
+        return tile_grid, index
+    return make
+
+def fire(tile_grid, shooter, angles):
+    """ Moves a bullet for every angle like the index does, and gets the tiles each
+    bullet went through after its first ricochet, until it was destroyed
+    """
+    bullets = []
+    for angle in angles:
+        bullet = Tanks.Bullet("assets/bullet.png", 0.35)
+        bullet.position = (shooter[0] + math.cos(angle) * Tanks.BULLET_START_OFFSET,
+                           shooter[1] + math.sin(angle) * Tanks.BULLET_START_OFFSET)
+        bullet.vx = math.cos(angle) * Tanks.BULLET_RADIUS
+        bullet.vy = math.sin(angle) * Tanks.BULLET_RADIUS
+        bullets.append(bullet)
+
+    engine = BulletEngine(tile_grid)
+    banked = [set() for _ in bullets]
+    flying = list(bullets)
+    while flying:
+        for bullet in flying:
+            if bullet.num_ricochets > 0:
+                banked[bullets.index(bullet)].add(tile_grid.cell(bullet.center_x, bullet.center_y))
+        engine.step(flying, 1)
+        flying = [bullet for bullet in flying if bullet.num_ricochets <= Tanks.MAX_RICOCHETS]
+    return banked
+
+def test_bank_shots_match_bullets(build, center):
+    # A pillar stands on the direct line between the shooter and the target
+    tile_grid, index = build([(3, 3), (3, 4)])
+    shooter, target = center(3, 1), center(3, 6)
+    angles = index.angles_between(*shooter, *target)
+    assert len(angles) > 0
+
+    banked = fire(tile_grid, shooter, index.angles)
+    for angle, tiles in zip(index.angles, banked):
+        expected = (3, 6) in tiles and (3, 1) not in tiles
+        assert (angle in angles) == expected, math.degrees(angle)
+
+def test_best_angle_is_closest_to_the_direct_line(build, center):
+    tile_grid, index = build([(3, 3), (3, 4)])
+    shooter, target = center(3, 1), center(3, 6)
+    best = index.best_angle(*shooter, *target)
+    angles = index.angles_between(*shooter, *target)
+    assert best in angles
+    # The direct line points along the x axis
+    difference = np.abs((angles + math.pi) % (2 * math.pi) - math.pi)
+    assert abs((best + math.pi) % (2 * math.pi) - math.pi) == difference.min()
+
+def test_no_bank_shot_through_a_wall(build, center):
+    tile_grid, index = build([(row, 4) for row in range(8)])
+    assert len(index.angles_between(*center(3, 1), *center(3, 6))) == 0
+    assert index.best_angle(*center(3, 1), *center(3, 6)) is None
+    # Points outside of the level have no shots either
+    assert len(index.angles_between(-10, -10, *center(3, 1))) == 0
+
+def test_refresh_matches_a_new_index(build, center):
+    walls = [(row, 4) for row in range(8)]
+    tile_grid, index = build(walls)
+    for row in (2, 3):
+        tile_grid.remove(tile_grid.sprite_at(row, 4))
+    index.refresh()
+    index.finish()
+
+    _, fresh = build([wall for wall in walls if wall[0] not in (2, 3)])
+    assert np.array_equal(index.reach, fresh.reach)
+    assert len(index.angles_between(*center(3, 1), *center(3, 6))) > 0
+
+def test_change_during_a_trace_is_traced_again(build, make_tile_grid):
+    walls = [(row, 4) for row in range(8)]
+    tile_grid = make_tile_grid(walls, rows=8, columns=8)
+    index = BankShotIndex(tile_grid, angles=ANGLES)
+    # Part way through the first chunk
+    index.update(20)
+    assert not index.ready()
+
+    for row in (2, 3):
+        tile_grid.remove(tile_grid.sprite_at(row, 4))
+    index.refresh()
+    index.finish()
+
+    _, fresh = build([wall for wall in walls if wall[0] not in (2, 3)])
+    assert np.array_equal(index.reach, fresh.reach)
@@ -0,0 +1,56 @@
+"""
+test_bullets.py tests how the bullet engine moves bullets and bounces them off the tile grid
+"""
+
+import pytest
+import Tanks
+from bullets import BulletEngine
+
+TILE = Tanks.TILE_SIZE
+RADIUS = Tanks.BULLET_RADIUS
+
+def bullet(x, y, vx, vy):
+    sprite = Tanks.Bullet("assets/bullet.png", 0.35)
+    sprite.position = (x, y)
+    sprite.vx = vx
+    sprite.vy = vy
+    return sprite
+
+@pytest.fixture
+def tile_grid(make_tile_grid):
+    # A wall in column 5, and an explodable barrel in row 2 of it
+    return make_tile_grid([(row, 5) for row in range(10) if row != 2], [(2, 5)])
+
+def test_free_flight(tile_grid):
+    shot = bullet(100, 100, 300, -150)
+    assert BulletEngine(tile_grid).step([shot], 0.1) == []
+    assert shot.position == pytest.approx((130, 85))
+    assert (shot.vx, shot.vy, shot.num_ricochets) == (300, -150, 0)
+
+def test_ricochet_mirrors_about_the_wall(tile_grid):
+    face = 5 * TILE
+    shot = bullet(face - 30, 100, 300, 50)
+    engine = BulletEngine(tile_grid)
+    assert engine.step([shot], 0.1) == []
+    # The leading edge would end up at face + RADIUS, so it is mirrored back by as much
+    assert shot.center_x == pytest.approx(face - 2 * RADIUS)
+    assert shot.center_y == pytest.approx(105)
+    assert (shot.vx, shot.vy, shot.num_ricochets) == (-300, 50, 1)
+    assert engine.ricochets == [(shot, 1)]
+
+def test_fast_bullet_does_not_tunnel(tile_grid):
+    # Moves over two tiles in one step, which would take it through the wall
+    shot = bullet(4 * TILE, 100, 4000, 0)
+    BulletEngine(tile_grid).step([shot], 0.03)
+    assert shot.center_x == pytest.approx(2 * (5 * TILE - RADIUS) - 4 * TILE - 120)
+    assert shot.vx == -4000
+    assert shot.num_ricochets == 1
+
+def test_explodable_stops_the_bullet(tile_grid):
+    shot = bullet(5 * TILE - 20, 2.5 * TILE, 300, 0)
+    barrel = tile_grid.sprite_at(2, 5)
+    hits = BulletEngine(tile_grid).step([shot], 0.1)
+    assert hits == [(shot, barrel)]
+    assert shot.num_ricochets == 0
+    # It stops in the substep it reached the barrel in
+    assert 5 * TILE - RADIUS <= shot.center_x < 5 * TILE
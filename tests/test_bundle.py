@@ -0,0 +1,47 @@
+"""
+test_bundle.py tests that the asset bundle is only used while it matches the asset files
+"""
+
+import os
+import shutil
+import pytest
+import bundle
+
+@pytest.fixture
+def assets(tmp_path, monkeypatch):
+    """ Copies an image and a sound, and bundles only those
+    """
+    image = str(tmp_path / "tank.png")
+    sound = str(tmp_path / "shoot.wav")
+    shutil.copy("assets/tank_blue.png", image)
+    shutil.copy("sounds/shoot2.wav", sound)
+    monkeypatch.setattr(bundle, "bundled_files", lambda level_num_max=10: ([image], [sound]))
+    return image, sound, str(tmp_path / "assets.bundle")
+
+def test_bundle_matches_its_assets(assets):
+    image, sound, path = assets
+    assert bundle.build(path) == []
+    opened = bundle.open_bundle(path)
+    assert opened is not None
+    assert image in opened and sound in opened
+    assert opened.stale() == []
+    opened.close()
+
+def test_changed_asset_ignores_the_bundle(assets):
+    image, sound, path = assets
+    bundle.build(path)
+    stat = os.stat(sound)
+    os.utime(sound, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert bundle.open_bundle(path) is None
+
+    # Until it is rebuilt
+    bundle.build(path)
+    opened = bundle.open_bundle(path)
+    assert opened is not None
+    opened.close()
+
+def test_removed_asset_ignores_the_bundle(assets):
+    image, sound, path = assets
+    bundle.build(path)
+    os.remove(image)
+    assert bundle.open_bundle(path) is None
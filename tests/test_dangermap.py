@@ -0,0 +1,110 @@
+"""
+test_dangermap.py tests that the danger map counts every threat on a cell once, and clears it again
+"""
+
+import numpy as np
+import pytest
+import Tanks
+from dangermap import DangerMap
+
+TILE = Tanks.TILE_SIZE
+
+class Threat:
+    """ Stands in for a mine or a bullet, which the map only reads the position and velocity of
+    """
+    def __init__(self, x, y, vx=0, vy=0):
+        self.center_x = x
+        self.center_y = y
+        self.vx = vx
+        self.vy = vy
+
+@pytest.fixture
+def danger_map(make_tile_grid):
+    # A wall across column 7
+    return DangerMap(make_tile_grid([(row, 7) for row in range(10)]))
+
+def rebuilt(danger_map, mines, bullets):
+    """ Marks a new map from scratch
+    """
+    fresh = DangerMap(danger_map.tile_grid, danger_map.mine_radius, danger_map.lookahead)
+    fresh.reset(mines, bullets)
+    return fresh
+
+def test_mine_marks_its_blast_once(danger_map, center):
+    mine = Threat(*center(4, 4))
+    danger_map.add_mine(mine)
+    danger_map.add_mine(mine)
+    assert danger_map.danger(4, 4) == 1
+    assert danger_map.danger(4, 5) == 1
+    assert danger_map.danger(4, 6) == 0
+    assert danger_map.danger_at(*center(3, 3)) == 1
+    # The blast reaches the 3x3 block around the mine, the next cells are 84 px away
+    assert danger_map.mines.sum() == 9
+
+def test_overlapping_mines_count_and_unmark(danger_map, center):
+    first, second = Threat(*center(4, 4)), Threat(*center(4, 5))
+    danger_map.add_mine(first)
+    danger_map.add_mine(second)
+    assert danger_map.danger(4, 4) == 2
+    assert danger_map.danger(4, 6) == 1
+
+    danger_map.remove_mine(first)
+    assert danger_map.danger(4, 4) == 1
+    danger_map.remove_mine(first)
+    danger_map.remove_mine(Threat(0, 0))
+    assert danger_map.danger(4, 4) == 1
+    danger_map.remove_mine(second)
+    assert not danger_map.mines.any()
+
+def test_bullet_path_stops_at_the_wall(danger_map, center):
+    bullet = Threat(*center(2, 4), vx=300)
+    danger_map.update_bullets([bullet])
+    assert [danger_map.danger(2, column) for column in range(3, 9)] == [0, 1, 1, 1, 0, 0]
+    assert danger_map.bullets.sum() == 3
+
+def test_bullet_is_marked_again_only_in_a_new_cell(danger_map, center):
+    bullet = Threat(*center(2, 1), vx=300)
+    danger_map.update_bullets([bullet])
+    marked = danger_map.bullet_cells[bullet]
+    bullet.center_x += 10
+    danger_map.update_bullets([bullet])
+    assert danger_map.bullet_cells[bullet] is marked
+
+    bullet.center_x += TILE
+    danger_map.update_bullets([bullet])
+    assert danger_map.bullet_cells[bullet] is not marked
+    assert np.array_equal(danger_map.bullets, rebuilt(danger_map, [], [bullet]).bullets)
+
+    # A ricochet turns the bullet around in the same cell
+    bullet.vx = -300
+    danger_map.update_bullets([bullet])
+    assert danger_map.danger(2, 1) == 1
+    assert danger_map.danger(2, 3) == 0
+    assert np.array_equal(danger_map.bullets, rebuilt(danger_map, [], [bullet]).bullets)
+
+    danger_map.update_bullets([])
+    assert not danger_map.bullets.any()
+    assert danger_map.bullet_cells == {}
+
+def test_incremental_counts_match_reset(danger_map, center):
+    mines = [Threat(*center(1, 1)), Threat(*center(1, 2)), Threat(*center(8, 5))]
+    bullets = [Threat(*center(5, 0), vx=300), Threat(*center(0, 2), vy=300), Threat(*center(6, 6), vx=-200, vy=200)]
+    for mine in mines:
+        danger_map.add_mine(mine)
+    danger_map.update_bullets(bullets)
+    danger_map.remove_mine(mines.pop(1))
+    bullets.pop(0)
+    bullets[0].center_y += 2 * TILE
+    danger_map.update_bullets(bullets)
+
+    fresh = rebuilt(danger_map, mines, bullets)
+    assert np.array_equal(danger_map.mines, fresh.mines)
+    assert np.array_equal(danger_map.bullets, fresh.bullets)
+
+def test_safe_direction_avoids_danger(danger_map, center):
+    x, y = center(4, 6)
+    # 4 is right, into the wall, and 1 is up, into the blast
+    danger_map.add_mine(Threat(*center(6, 6)))
+    assert danger_map.safe_direction(x, y, 3) == 3
+    assert danger_map.safe_direction(x, y, 1) == 2
+    assert danger_map.safe_direction(x, y, 4) == 2
@@ -0,0 +1,39 @@
+"""
+test_env.py tests that the vectorized environment steps its games apart, and resets the ones whose episode ended
+"""
+
+import numpy as np
+import pytest
+import Tanks
+from env import TANK_COLUMNS, VecEnv
+
+X = TANK_COLUMNS.index("x")
+
+@pytest.fixture
+def vec_env():
+    vec_env = VecEnv(2, levels=(1,), max_steps=3, seed=1)
+    yield vec_env
+    vec_env.close()
+
+def test_step_through_a_reset(vec_env):
+    observations = vec_env.reset()
+    assert observations["tiles"].shape[0] == 2
+    assert observations["tanks"].shape == (2, Tanks.ENV_MAX_TANKS, len(TANK_COLUMNS))
+    start = observations["tanks"][:, 0, X].copy()
+
+    # The first game drives right, the second one stands still
+    actions = np.array([(4, 0, 0, 0, 0), (0, 0, 0, 0, 0)])
+    for _ in range(2):
+        observations, rewards, dones, infos = vec_env.step(actions)
+        assert not dones.any()
+    assert observations["tanks"][0, 0, X] > start[0]
+    assert observations["tanks"][1, 0, X] == start[1]
+
+    # Both episodes are cut off after max_steps, and start over
+    observations, rewards, dones, infos = vec_env.step(actions)
+    assert dones.tolist() == [True, True]
+    for info in infos:
+        assert info["truncated"] and info["steps"] == 3
+    assert infos[0]["final_observation"]["tanks"][0, X] > start[0]
+    assert np.array_equal(observations["tanks"][:, 0, X], start)
+    assert [env.steps for env in vec_env.envs] == [0, 0]
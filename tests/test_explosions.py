@@ -0,0 +1,72 @@
+"""
+test_explosions.py tests that the explosion resolver sets off the mines in range of an explosion, and only those
+"""
+
+import pytest
+from explosions import ExplosionResolver
+
+class Mine:
+    """ Stands in for a mine, which the resolver only reads the position and size of
+    """
+    def __init__(self, name, x, y):
+        self.name = name
+        self.center_x = x
+        self.center_y = y
+        self.width = 20
+        self.height = 20
+
+class Recorder:
+    """ Stands in for the simulation, and records what the resolver does to it in order
+    """
+    def __init__(self, tile_grid, mines):
+        self.tile_grid = tile_grid
+        self.mine_list = list(mines)
+        self.enemy_list = []
+        self.player_sprite = None
+        self.player_list = []
+        self.events = []
+        self.explosion_resolver = ExplosionResolver(self, radius=65)
+
+    def explosion_animation(self, x, y):
+        self.events.append(("explosion", x, y))
+        self.explosion_resolver.emit(x, y)
+
+    def detonate_mine(self, mine, cause="timer"):
+        self.events.append(("mine", mine.name, cause))
+        self.mine_list.remove(mine)
+        self.explosion_animation(mine.center_x, mine.center_y)
+
+    def destroy_enemy(self, enemy, cause):
+        self.events.append(("enemy", enemy, cause))
+
+    def destroy_player(self, cause):
+        self.events.append(("player", cause))
+
+    def destroy_obstacle(self, obstacle):
+        self.events.append(("obstacle", obstacle))
+
+@pytest.fixture
+def empty_grid(make_tile_grid):
+    return make_tile_grid([])
+
+def test_mine_sets_off_a_mine_in_range(empty_grid):
+    # The second mine is in range of the first, the third only of the second
+    first, second, third = Mine("first", 100, 100), Mine("second", 150, 100), Mine("third", 210, 100)
+    simulation = Recorder(empty_grid, [first, second, third])
+    simulation.detonate_mine(first)
+    simulation.explosion_resolver.resolve()
+
+    assert simulation.events == [("mine", "first", "timer"), ("explosion", 100, 100),
+                                 ("mine", "second", "explosion"), ("explosion", 150, 100),
+                                 ("mine", "third", "explosion"), ("explosion", 210, 100)]
+    assert simulation.mine_list == []
+    assert len(simulation.explosion_resolver.events) == 0
+
+def test_mine_out_of_range_is_not_set_off(empty_grid):
+    near, far = Mine("near", 100, 100), Mine("far", 300, 100)
+    simulation = Recorder(empty_grid, [near, far])
+    simulation.detonate_mine(near)
+    simulation.explosion_resolver.resolve()
+
+    assert simulation.events == [("mine", "near", "timer"), ("explosion", 100, 100)]
+    assert simulation.mine_list == [far]
@@ -0,0 +1,35 @@
+"""
+test_hitboxes.py tests that hit boxes read back from the cache file reach the sprites
+"""
+
+import arcade
+from hitboxes import CachedHitBoxTexture, HitBoxCache
+
+IMAGE = "assets/tankBody_blue0.png"
+
+def test_cached_hit_box_reaches_sprites(tmp_path):
+    path = str(tmp_path / "hitboxes.json")
+    computed = arcade.load_texture(IMAGE).hit_box_points
+    cache = HitBoxCache(path)
+    assert cache.apply(arcade.load_texture(IMAGE)) is arcade.load_texture(IMAGE)
+    cache.save()
+
+    # The next run reads the polygon back and replaces arcade's texture
+    arcade.cleanup_texture_cache()
+    texture = HitBoxCache(path).apply(arcade.load_texture(IMAGE))
+    assert isinstance(texture, CachedHitBoxTexture)
+    assert arcade.load_texture(IMAGE) is texture
+    sprite = arcade.Sprite(IMAGE)
+    assert sprite.texture is texture
+    assert sprite.get_hit_box() == computed
+    arcade.cleanup_texture_cache()
+
+def test_save_only_writes_new_hit_boxes(tmp_path):
+    path = tmp_path / "hitboxes.json"
+    cache = HitBoxCache(str(path))
+    cache.save()
+    assert not path.exists()
+    cache.apply(arcade.load_texture(IMAGE))
+    cache.save()
+    assert path.exists()
+    assert not (tmp_path / "hitboxes.json.tmp").exists()
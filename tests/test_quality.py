@@ -0,0 +1,48 @@
+"""
+test_quality.py tests how the quality governor steps through its stages and throttles sounds
+"""
+
+import pytest
+from quality import QUALITY_STAGES, QualityGovernor
+
+@pytest.fixture
+def governor():
+    return QualityGovernor(budget=0.01, window=4)
+
+def test_steps_down_over_budget_and_back_up(governor):
+    for _ in range(4):
+        governor.record(0.02)
+    assert governor.stage == 1
+    # The new stage is judged on its own frames
+    for _ in range(3):
+        governor.record(0.001)
+    assert governor.stage == 1
+    governor.record(0.001)
+    assert governor.stage == 0
+
+def test_lowest_stage_is_kept(governor):
+    for _ in range(4 * len(QUALITY_STAGES) + 8):
+        governor.record(1)
+    assert governor.stage == len(QUALITY_STAGES) - 1
+
+def test_sound_throttle_follows_the_simulation_clock(governor):
+    governor.stage = 2
+    interval = governor.settings.sound_interval
+    assert governor.allow_sound("shot", 10)
+    assert not governor.allow_sound("shot", 10 + interval / 2)
+    assert governor.allow_sound("boom", 10 + interval / 2)
+    assert governor.allow_sound("shot", 10 + interval * 1.5)
+    # A restored state sets the clock back
+    assert governor.allow_sound("shot", 1)
+
+def test_full_quality_never_throttles(governor):
+    assert all(governor.allow_sound("shot", 5) for _ in range(3))
+    assert all(governor.update_hud() for _ in range(3))
+
+def test_hud_updates_every_interval(governor):
+    governor.stage = len(QUALITY_STAGES) - 1
+    updates = 0
+    for _ in range(governor.settings.hud_interval * 3):
+        governor.frame += 1
+        updates += governor.update_hud()
+    assert updates == 3
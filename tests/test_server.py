@@ -0,0 +1,142 @@
+"""
+test_server.py tests the snapshot messages and the client connections of the game server
+"""
+
+import socket
+import struct
+import threading
+import time
+import pytest
+import server
+
+def make_snapshot(tanks, bullets=None, mines=None, destroyed=None, status=(1, 3, 0, 0)):
+    """ Builds a snapshot like capture_snapshot does
+    """
+    return status, [tanks, bullets or {}, mines or {}, destroyed or {}]
+
+class FakeSocket:
+    """ Socket that takes at most chunk bytes per send, or fails with error
+    """
+    def __init__(self, chunk=None, error=None):
+        self.chunk = chunk
+        self.error = error
+        self.sent = bytearray()
+
+    def send(self, data):
+        if self.error is not None:
+            raise self.error
+        data = bytes(data[:self.chunk]) if self.chunk is not None else bytes(data)
+        self.sent.extend(data)
+        return len(data)
+
+def test_full_snapshot_round_trip():
+    snapshot = make_snapshot({1: (400, 800, 900, 2, 0), 7: (-40, 12, -1800, -1, 3)},
+                             bullets={9: (100, 200, 450)}, mines={11: (4, 8)}, destroyed={4096 + 2: ()})
+    tick, base_tick, decoded = server.decode_snapshot(server.encode_snapshot(5, snapshot))
+    assert (tick, base_tick) == (5, server.FULL_SNAPSHOT)
+    assert decoded == snapshot
+
+def test_delta_only_sends_changes():
+    base = make_snapshot({1: (0, 0, 0, 0, 0), 2: (10, 10, 0, 0, 1)}, bullets={3: (5, 5, 0)})
+    snapshot = make_snapshot({1: (4, 0, 0, 0, 0), 2: (10, 10, 0, 0, 1)}, mines={8: (1, 1)})
+    delta = server.encode_snapshot(6, snapshot, 5, base)
+    assert len(delta) < len(server.encode_snapshot(6, snapshot))
+
+    tick, base_tick, decoded = server.decode_snapshot(delta, base)
+    assert (tick, base_tick) == (6, 5)
+    # The removed bullet is gone and the unchanged tank comes from the base
+    assert decoded == snapshot
+
+def test_quantize_clamps_to_the_wire_range():
+    assert server.quantize_position(1e9) == 32767
+    assert server.quantize_position(-1e9) == -32768
+    assert server.quantize_angle(90) == 900
+
+def test_read_frames_keeps_partial_messages():
+    buffer = bytearray(server.frame(b"one") + server.frame(b"two"))
+    buffer.extend(server.frame(b"three")[:5])
+    assert server.read_frames(buffer) == [b"one", b"two"]
+    buffer.extend(server.frame(b"three")[5:])
+    assert server.read_frames(buffer) == [b"three"]
+    assert buffer == bytearray()
+
+def test_drop_backlog_keeps_rest_of_partly_sent_frame():
+    client = server.ClientConnection(FakeSocket(chunk=3))
+    first, second = server.frame(b"abcdef"), server.frame(b"ghijkl")
+    client.queue(first)
+    client.queue(second)
+    assert client.flush()
+    client.drop_backlog()
+    client.sock.chunk = None
+    assert client.flush()
+    # The receiver gets whole frames only
+    assert client.sock.sent == bytearray(first)
+    assert client.outbox == bytearray()
+
+def test_flush_reports_broken_connection():
+    client = server.ClientConnection(FakeSocket(error=ConnectionResetError()))
+    client.queue(server.frame(b"x"))
+    assert not client.flush()
+    client = server.ClientConnection(FakeSocket(error=BlockingIOError()))
+    client.queue(server.frame(b"x"))
+    assert client.flush()
+
+@pytest.fixture
+def running_server():
+    tank_server = server.TankServer(port=0, max_matches=1)
+    thread = threading.Thread(target=tank_server.serve_forever, daemon=True)
+    thread.start()
+    yield tank_server
+    tank_server.running = False
+    thread.join()
+
+def connect(tank_server, *frames):
+    """ Opens a raw connection to the server and sends frames on it
+    """
+    sock = socket.create_connection(tank_server.listener.getsockname())
+    sock.settimeout(5)
+    for data in frames:
+        sock.sendall(data)
+    return sock
+
+def closed_by_server(sock):
+    """ Reads until the server closes the connection
+    """
+    try:
+        while sock.recv(65536):
+            pass
+    except ConnectionResetError:
+        pass
+    return True
+
+def snapshots_after(client, tick, timeout=5):
+    """ Polls a client until it has a snapshot newer than tick
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        client.poll()
+        if client.tick is not None and client.tick > tick:
+            return client.tick
+        time.sleep(0.01)
+    return None
+
+def test_bad_frames_only_drop_their_client(running_server):
+    good = server.TankClient(port=running_server.listener.getsockname()[1])
+    tick = snapshots_after(good, 0)
+    assert tick is not None
+
+    join = server.frame(server.JOIN.pack(server.MSG_JOIN, 0))
+    truncated = connect(running_server, join, server.frame(bytes([server.MSG_KEY_PRESS, 0])))
+    empty = connect(running_server, join, server.frame(b""))
+    unknown = connect(running_server, server.frame(bytes([99])))
+    huge = connect(running_server, struct.pack("<I", 1 << 30))
+    # Joins a match the full server can't make, then keeps sending
+    refused = connect(running_server, server.frame(server.JOIN.pack(server.MSG_JOIN, 1)),
+                      server.frame(server.ACK.pack(server.MSG_ACK, 1)))
+    for sock in (truncated, empty, unknown, huge, refused):
+        assert closed_by_server(sock)
+        sock.close()
+
+    assert snapshots_after(good, tick) is not None
+    assert len(running_server.clients) == 1
+    good.close()
@@ -0,0 +1,87 @@
+"""
+test_state.py tests that a state snapshot puts the simulation back the way it was
+"""
+
+import arcade
+import numpy as np
+import pytest
+import Tanks
+from simulation import TankSimulation
+from survival import SurvivalMode, WaveCurve
+
+@pytest.fixture
+def simulation():
+    simulation = TankSimulation()
+    simulation.level_num = 7
+    simulation.setup()
+    yield simulation
+    simulation.path_pool.shutdown()
+
+def fingerprint(simulation):
+    """ Gets the stored state of every entity and the counts of the sprite lists
+    """
+    state = simulation.state
+    state.sync()
+    tables = {name: table.data[:, :len(table)].copy() for name, table in state.tables.items()}
+    counts = tuple(len(getattr(simulation, name)) for name in ("enemy_list", "bullet_list", "mine_list", "explosions_list",
+                                                              "breakable_obstacle_list", "explodables_list", "tracks_list"))
+    return tables, state.scalars.copy(), counts
+
+def run(simulation, updates):
+    for _ in range(updates):
+        simulation.update_simulation(Tanks.PHYSICS_TIME_STEP)
+
+def test_restore_round_trip(simulation):
+    run(simulation, 30)
+    snapshot = simulation.state.snapshot()
+    before = fingerprint(simulation)
+
+    # Shoot, lay a mine and drive off, so there is something to undo
+    simulation.key_press(arcade.key.D)
+    for x in (0, 1120):
+        simulation.mouse_press(x, 420)
+    simulation.key_press(arcade.key.SPACE)
+    run(simulation, 90)
+    assert fingerprint(simulation)[2] != before[2]
+
+    simulation.state.restore(snapshot)
+    tables, scalars, counts = fingerprint(simulation)
+    assert counts == before[2]
+    assert np.allclose(scalars, before[1])
+    for name, data in before[0].items():
+        assert tables[name].shape == data.shape
+        # Tanks without a bank shot store NaN
+        assert np.allclose(tables[name], data, equal_nan=True), name
+
+    # The restored simulation keeps running
+    run(simulation, 30)
+
+def test_restore_survival_wave(simulation):
+    survival = SurvivalMode(simulation, curves={Tanks.Difficulty.EASY: WaveCurve(1, 30, 1)}, wave_time=1, spawn_radius=0, seed=1)
+    simulation.survival = survival
+    simulation.setup()
+    run(simulation, 2)
+    assert survival.wave == 1 and len(survival.queued) > 0
+    snapshot = simulation.state.snapshot()
+    before = fingerprint(simulation)
+    wave = (survival.wave, survival.spawned, survival.peak_alive, survival.wave_due, tuple(survival.queued))
+    time_left = survival.wave_timer.remaining()
+
+    # Destroy the wave and its queued tanks as they come, so the next wave comes
+    while survival.wave == 1:
+        for enemy in list(simulation.enemy_list):
+            simulation.destroy_enemy(enemy, "explosion")
+        run(simulation, 1)
+
+    simulation.state.restore(snapshot)
+    assert fingerprint(simulation)[2] == before[2]
+    assert (survival.wave, survival.spawned, survival.peak_alive, survival.wave_due, tuple(survival.queued)) == wave
+    assert survival.wave_timer.remaining() == pytest.approx(time_left)
+    run(simulation, 30)
+
+def test_restore_in_another_level_fails(simulation):
+    snapshot = simulation.state.snapshot()
+    simulation.level_num = 3
+    simulation.setup()
+    with pytest.raises(ValueError):
+        simulation.state.restore(snapshot)
@@ -0,0 +1,62 @@
+"""
+test_survival.py tests where survival tanks spawn and when the next wave comes
+"""
+
+import pytest
+import Tanks
+from simulation import TankSimulation
+from survival import SurvivalMode, WaveCurve
+
+# One wave of easy tanks, which never move, bigger than the number of spawn tiles
+WAVE = 12
+
+@pytest.fixture
+def survival():
+    simulation = TankSimulation()
+    simulation.level_num = 1
+    survival = SurvivalMode(simulation, curves={Tanks.Difficulty.EASY: WaveCurve(1, WAVE, 1)}, wave_time=1,
+                            spawn_radius=0, seed=1)
+    simulation.survival = survival
+    simulation.setup()
+    # Nobody plays, the player tank sits out
+    simulation.player_sprite.remove_from_sprite_lists()
+    simulation.player_sprite.turret.remove_from_sprite_lists()
+    yield survival
+    simulation.path_pool.shutdown()
+
+def run(simulation, seconds):
+    for _ in range(round(seconds / Tanks.PHYSICS_TIME_STEP)):
+        simulation.update_simulation(Tanks.PHYSICS_TIME_STEP)
+
+def tank_tiles(simulation):
+    return [simulation.tile_grid.cell(enemy.center_x, enemy.center_y) for enemy in simulation.enemy_list]
+
+def test_tanks_spawn_on_free_tiles_and_the_rest_queue(survival):
+    simulation = survival.simulation
+    run(simulation, 0.1)
+    tiles = tank_tiles(simulation)
+    spawn_tiles = {simulation.tile_grid.cell(x, y) for x, y in survival.spawn_points}
+    assert len(tiles) == len(set(tiles))
+    assert set(tiles) == spawn_tiles
+    assert len(survival.queued) == WAVE - len(spawn_tiles)
+
+def test_next_wave_waits_for_the_queued_tanks(survival):
+    simulation = survival.simulation
+    run(simulation, 3 * survival.wave_time)
+    assert survival.wave == 1
+    assert survival.wave_due
+
+    # Every destroyed tank frees a spawn tile for a queued one
+    for _ in range(WAVE):
+        assert len(survival.queued) > 0
+        for enemy in list(simulation.enemy_list):
+            simulation.destroy_enemy(enemy, "player_bullet")
+        simulation.update_simulation(Tanks.PHYSICS_TIME_STEP)
+        tiles = tank_tiles(simulation)
+        assert len(tiles) == len(set(tiles))
+        if survival.wave != 1:
+            break
+
+    # The wave that was due came as soon as the last queued tank of wave 1 spawned
+    assert survival.wave == 2
+    assert [(summary.wave, summary.spawned) for summary in survival.summaries] == [(1, WAVE)]
@@ -0,0 +1,101 @@
+"""
+test_timers.py tests the timer heap, and that stopped or restarted timers never fire from stale heap entries
+"""
+
+import pytest
+from timers import Timer, TimerHeap
+
+@pytest.fixture
+def timers():
+    return TimerHeap()
+
+def counting_timer(timers):
+    """ Makes a timer that counts how often it fired
+    """
+    fired = []
+    timer = Timer(timers, lambda: fired.append(timers.now))
+    return timer, fired
+
+def test_fires_once_when_it_expires(timers):
+    timer, fired = counting_timer(timers)
+    timer.start(1.0)
+    timers.advance(0.5)
+    assert fired == []
+    assert timer.remaining() == pytest.approx(0.5)
+    timers.advance(0.75)
+    assert fired == pytest.approx([1.25])
+    assert not timer.running
+    # It ran over by 0.25
+    assert timer.remaining() == pytest.approx(-0.25)
+    timers.advance(5)
+    assert fired == pytest.approx([1.25])
+
+def test_restart_ignores_the_old_entry(timers):
+    timer, fired = counting_timer(timers)
+    timer.start(1.0)
+    timers.advance(0.5)
+    timer.start(1.0)
+    # The first entry expires here and is stale
+    timers.advance(0.6)
+    assert fired == []
+    assert len(timers.heap) == 1
+    timers.advance(0.4)
+    assert fired == pytest.approx([1.5])
+
+def test_stop_and_resume_keep_the_time_left(timers):
+    timer, fired = counting_timer(timers)
+    timer.start(1.0)
+    timers.advance(0.25)
+    timer.stop()
+    timers.advance(10)
+    assert fired == []
+    assert timer.remaining() == pytest.approx(0.75)
+
+    timer.resume()
+    timers.advance(0.5)
+    assert fired == []
+    timers.advance(0.25)
+    assert fired == pytest.approx([11])
+
+def test_stop_then_restart_within_the_same_time(timers):
+    # The generation tells the entries apart even when they expire at the same time
+    timer, fired = counting_timer(timers)
+    timer.start(1.0)
+    timer.stop()
+    timer.start(1.0)
+    timers.advance(1.0)
+    assert fired == pytest.approx([1.0])
+
+def test_set_without_time_left_does_not_fire(timers):
+    timer, fired = counting_timer(timers)
+    timer.start(1.0)
+    timer.set(-0.5)
+    timers.advance(2)
+    assert fired == []
+    assert timer.remaining() == -0.5
+
+    timer.set(0.5)
+    timers.advance(0.5)
+    assert fired == pytest.approx([2.5])
+
+def test_timers_fire_in_expiry_order(timers):
+    order = []
+    for name, delay in (("c", 3), ("a", 1), ("b", 2)):
+        Timer(timers, lambda name=name: order.append(name)).start(delay)
+    timers.advance(5)
+    assert order == ["a", "b", "c"]
+
+def test_deadline_without_callback_stays_off_the_heap(timers):
+    deadline = Timer(timers)
+    deadline.start(1.0)
+    assert timers.heap == []
+    timers.advance(1.5)
+    assert deadline.running
+    assert deadline.remaining() == pytest.approx(-0.5)
+
+def test_clear_drops_queued_timers(timers):
+    timer, fired = counting_timer(timers)
+    timer.start(1.0)
+    timers.clear()
+    timers.advance(2)
+    assert fired == []
@@ -0,0 +1,111 @@
+"""
+tilegrid.py contains the grid of obstacle tiles for the current level
+"""
+
+import numpy as np
+import Tanks
+
+# Cell types
+EMPTY = 0
+WALL = 1
+BREAKABLE = 2
+EXPLODABLE = 3
+
+class TileGrid:
+    """ Grid with the type of obstacle in every tile of the level. Cells outside
+    of the level count as walls.
+    """
+    def __init__(self, obstacle_list, breakable_obstacle_list, explodables_list, tile_size=Tanks.TILE_SIZE,
+                 columns=Tanks.SCREEN_WIDTH // Tanks.TILE_SIZE, rows=Tanks.SCREEN_HEIGHT // Tanks.TILE_SIZE):
+        """ Constructor for the tile grid
+
+        Args:
+            obstacle_list: List of blocking sprites
+            breakable_obstacle_list: List of breakable blocking sprites
+            explodables_list: List of explodable sprites
+            tile_size (int, optional): Size of a tile in pixels. Defaults to Tanks.TILE_SIZE.
+            columns (int, optional): Number of tile columns. Defaults to the screen width in tiles.
+            rows (int, optional): Number of tile rows. Defaults to the screen height in tiles.
+        """
+        self.tile_size = tile_size
+        self.columns = columns
+        self.rows = rows
+        self.fill(obstacle_list, breakable_obstacle_list, explodables_list)
+
+    def fill(self, obstacle_list, breakable_obstacle_list, explodables_list):
+        """ Rebuilds the grid from the obstacle sprite lists
+
+        Args:
+            obstacle_list: List of blocking sprites
+            breakable_obstacle_list: List of breakable blocking sprites
+            explodables_list: List of explodable sprites
+        """
+        self.cells = np.zeros((self.rows, self.columns), dtype=np.int8)
+        self.sprites = {}
+        for sprite_list, cell_type in ((obstacle_list, WALL), (breakable_obstacle_list, BREAKABLE), (explodables_list, EXPLODABLE)):
+            for sprite in sprite_list:
+                cell = self.cell(sprite.center_x, sprite.center_y)
+                if self.in_bounds(*cell):
+                    self.cells[cell] = cell_type
+                    self.sprites[cell] = sprite
+
+    def cell(self, x, y):
+        """ Gets the tile that contains a point
+
+        Args:
+            x (float): x coordinate in pixels
+            y (float): y coordinate in pixels
+
+        Returns:
+            tuple: (row, column) of the tile
+        """
+        return int(y // self.tile_size), int(x // self.tile_size)
+
+    def in_bounds(self, row, column):
+        """ Checks if a tile is inside the level
+
+        Args:
+            row (int): tile row
+            column (int): tile column
+
+        Returns:
+            bool: True if the tile is inside the level
+        """
+        return 0 <= row < self.rows and 0 <= column < self.columns
+
+    def lookup(self, rows, columns):
+        """ Gets the cell type of many tiles at once
+
+        Args:
+            rows (np.ndarray): tile rows
+            columns (np.ndarray): tile columns
+
+        Returns:
+            np.ndarray: the cell types, WALL for tiles outside of the level
+        """
+        inside = (rows >= 0) & (rows < self.rows) & (columns >= 0) & (columns < self.columns)
+        cells = self.cells[np.clip(rows, 0, self.rows - 1), np.clip(columns, 0, self.columns - 1)]
+        return np.where(inside, cells, WALL)
+
+    def sprite_at(self, row, column):
+        """ Gets the obstacle sprite in a tile
+
+        Args:
+            row (int): tile row
+            column (int): tile column
+
+        Returns:
+            arcade.Sprite: the obstacle, or None if the tile is empty
+        """
+        return self.sprites.get((row, column))
+
+    def remove(self, sprite):
+        """ Clears the tile of an obstacle that was destroyed
+
+        Args:
+            sprite (arcade.Sprite): the destroyed obstacle
+        """
+        cell = self.cell(sprite.center_x, sprite.center_y)
+        if self.sprites.get(cell) is sprite:
+            del self.sprites[cell]
+            self.cells[cell] = EMPTY
@@ -0,0 +1,124 @@
+"""
+timers.py contains the timer heap that runs every cooldown in the game
+"""
+
+import heapq
+import itertools
+
+class TimerHeap:
+    """ Simulation clock with a heap of pending timers.
+
+    Instead of every cooldown being decremented by hand every frame, a timer
+    stores the time it expires at. advance() moves the clock and only pops the
+    timers that expire, so a frame where nothing expires costs one comparison.
+    """
+    def __init__(self):
+        """ Constructor for the timer heap
+        """
+        self.now = 0.0
+        self.heap = []
+        self.counter = itertools.count()
+
+    def push(self, timer):
+        """ Queues a started timer so its callback fires when it expires
+
+        Args:
+            timer (Timer): the timer
+        """
+        heapq.heappush(self.heap, (timer.expiry, next(self.counter), timer.generation, timer))
+
+    def advance(self, delta_time):
+        """ Moves the clock forward and fires every timer that expired
+
+        Args:
+            delta_time (float): time passed since last update
+        """
+        self.now += delta_time
+        while self.heap and self.heap[0][0] <= self.now:
+            _, _, generation, timer = heapq.heappop(self.heap)
+            # Timers that were stopped or restarted since they were queued leave stale entries behind
+            if timer.running and generation == timer.generation:
+                timer.fire()
+
+    def clear(self):
+        """ Drops every queued timer, e.g. when a new level is loaded
+        """
+        self.heap = []
+
+class Timer:
+    """ One cooldown. The time left is read from the clock instead of being
+    counted down every frame.
+
+    A timer with a callback is queued on the heap while it runs and fires the
+    callback when it expires. A timer without one is just a deadline that is
+    checked with remaining() when needed, and costs nothing while it runs.
+    """
+    def __init__(self, timers, callback=None, left=0):
+        """ Constructor for a timer
+
+        Args:
+            timers (TimerHeap): the clock the timer runs on
+            callback (callable, optional): called without arguments when the timer expires. Defaults to None.
+            left (float, optional): time left while the timer is not running. Defaults to 0.
+        """
+        self.timers = timers
+        self.callback = callback
+        self.running = False
+        self.expiry = 0.0
+        self.left = left
+        self.generation = 0
+
+    def remaining(self):
+        """ Gets the time left
+
+        Returns:
+            float: seconds until the timer expires, negative once a deadline has passed
+        """
+        if self.running:
+            return self.expiry - self.timers.now
+        return self.left
+
+    def start(self, delay):
+        """ Starts or restarts the timer
+
+        Args:
+            delay (float): seconds until the timer expires
+        """
+        self.generation += 1
+        self.running = True
+        self.expiry = self.timers.now + delay
+        if self.callback is not None:
+            self.timers.push(self)
+
+    def stop(self):
+        """ Stops the timer, keeping the time it had left
+        """
+        self.left = self.remaining()
+        self.generation += 1
+        self.running = False
+
+    def resume(self):
+        """ Starts a stopped timer again with the time it had left
+        """
+        self.start(self.left)
+
+    def set(self, value):
+        """ Sets the time left of a timer with a callback. It runs only while
+        time is left, so its callback does not fire for a value <= 0.
+
+        Args:
+            value (float): seconds left
+        """
+        if value > 0:
+            self.start(value)
+        else:
+            self.stop()
+            self.left = value
+
+    def fire(self):
+        """ Called by the heap when the timer expires
+        """
+        self.left = self.expiry - self.timers.now
+        self.running = False
+        if self.callback is not None:
+            self.callback()